@@ -60,6 +60,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'conexao_digital_api.timing.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -165,6 +166,10 @@ AUTH_USER_MODEL = 'conexao_digital_api.User'
 
 AUTH_JWT_ACCESS_TOKEN_LIFETIME = timedelta(minutes=int(os.environ.get('AUTH_JWT_ACCESS_TOKEN_LIFETIME')) or 5)
 AUTH_JWT_REFRESH_TOKEN_LIFETIME = timedelta(days=int(os.environ.get('AUTH_JWT_REFRESH_TOKEN_LIFETIME')) or 1)
+# Access tokens carry the permission flags and the user's profile_version, see conexao_digital_api/tokens.py
+AUTH_JWT_TOKEN_CLASSES = ('conexao_digital_api.tokens.ClaimsAccessToken',)
+AUTH_JWT_PAIR_SCHEMA = 'conexao_digital_api.tokens.ClaimsTokenPairInputSchema'
+AUTH_JWT_REFRESH_SCHEMA = 'conexao_digital_api.tokens.ClaimsTokenRefreshInputSchema'
 
 AUTH_PASSWORD_RESET_URL = os.environ.get('AUTH_PASSWORD_RESET_URL') or "http://localhost:8000/auth/reset-password"
 AUTH_USER_SCHEMA = 'conexao_digital_api.schemas.UserSchema'
@@ -176,3 +181,100 @@ EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS') or False
 EMAIL_USE_SSL = os.environ.get('EMAIL_USE_SSL') or False
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER') or 'dev@dev.com'
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD') or 'dev'
+
+CURSOR_PAGINATION_PAGE_SIZE = int(os.environ.get('CURSOR_PAGINATION_PAGE_SIZE') or 50)
+CURSOR_PAGINATION_MAX_PAGE_SIZE = int(os.environ.get('CURSOR_PAGINATION_MAX_PAGE_SIZE') or 200)
+
+# Users embedded in each interest of InteresseSchema, counted up to the limit, the whole list is paged by
+# /admin/users/interesses/{id}/users
+INTERESSE_USERS_PREVIEW_SIZE = int(os.environ.get('INTERESSE_USERS_PREVIEW_SIZE') or 10)
+INTERESSE_USERS_COUNT_LIMIT = int(os.environ.get('INTERESSE_USERS_COUNT_LIMIT') or 1000)
+
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL') or 'conexaodigital@gmail.com'
+EMAIL_DISPATCH_WORKERS = int(os.environ.get('EMAIL_DISPATCH_WORKERS') or 2)
+EMAIL_DISPATCH_CHUNK_SIZE = int(os.environ.get('EMAIL_DISPATCH_CHUNK_SIZE') or 2000)
+EMAIL_DISPATCH_BATCH_SIZE = int(os.environ.get('EMAIL_DISPATCH_BATCH_SIZE') or 100)
+EMAIL_DISPATCH_MODE = os.environ.get('EMAIL_DISPATCH_MODE') or 'individual'  # 'individual' or 'bcc'
+EMAIL_RATE_LIMIT_PER_MINUTE = int(os.environ.get('EMAIL_RATE_LIMIT_PER_MINUTE') or 0)  # 0 disables the limit
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.environ.get('EMAIL_QUEUE_MAX_ATTEMPTS') or 5)
+EMAIL_QUEUE_BACKOFF_SECONDS = int(os.environ.get('EMAIL_QUEUE_BACKOFF_SECONDS') or 30)
+EMAIL_QUEUE_LOCK_TIMEOUT = int(os.environ.get('EMAIL_QUEUE_LOCK_TIMEOUT') or 600)
+EMAIL_WORKER_CONCURRENCY = int(os.environ.get('EMAIL_WORKER_CONCURRENCY') or 2)
+EMAIL_WORKER_POLL_INTERVAL = float(os.environ.get('EMAIL_WORKER_POLL_INTERVAL') or 5)
+
+# Text search configuration used by the PostgreSQL talent search
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG') or 'portuguese'
+
+# Response cache of the read endpoints, e.g. API_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache with
+# API_CACHE_LOCATION=redis://localhost:6379 or django.core.cache.backends.filebased.FileBasedCache with a directory
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': os.environ.get('API_CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.environ.get('API_CACHE_LOCATION') or 'api-cache',
+    },
+}
+API_CACHE_ALIAS = 'api'
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT') or 300)
+# Seconds the versions of the cached responses are kept in a per-process cache (LocMemCache), the other processes
+# see a write once their copy expires. Shared caches keep them until bumped
+API_CACHE_VERSION_TIMEOUT = int(os.environ.get('API_CACHE_VERSION_TIMEOUT') or 30)
+
+# Serves the /me reads and the admin list/find_one routes with async views, for ASGI deployments
+API_ASYNC_READS = (os.environ.get('API_ASYNC_READS') or 'False').lower() in ('true', '1')
+
+# Avatar uploads, the thumbnails are written in WebP and JPEG for each size
+AVATAR_THUMBNAIL_SIZES = [int(size) for size in (os.environ.get('AVATAR_THUMBNAIL_SIZES') or '64,256,512').split(',')]
+AVATAR_MAX_UPLOAD_SIZE = int(os.environ.get('AVATAR_MAX_UPLOAD_SIZE') or 5 * 1024 * 1024)
+AVATAR_MAX_PIXELS = int(os.environ.get('AVATAR_MAX_PIXELS') or 40_000_000)
+AVATAR_WORKERS = int(os.environ.get('AVATAR_WORKERS') or 4)
+
+# Media serving: max-age of the content hashed files, and MEDIA_SENDFILE_BACKEND='x-accel-redirect' (nginx, with an
+# internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile' (Apache) to hand the
+# file to the web server, which then also takes care of ranges and precompressed copies. Production deployments
+# should put nginx in front and use x-accel-redirect: left empty, the files and the ranges are read and streamed by
+# the application workers, through the thread pool of the ASGI server (render.yaml runs uvicorn workers)
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE') or 365 * 24 * 60 * 60)
+MEDIA_SENDFILE_BACKEND = os.environ.get('MEDIA_SENDFILE_BACKEND') or ''
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX') or '/protected-media/'
+
+# Verified access tokens kept per process, so authenticated requests skip the users table
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE') or 10000)  # 0 disables the cache
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL') or 60)
+# Seconds the profile and principal versions revoking the tokens are kept in a per-process api cache (LocMemCache),
+# the other processes see a revocation once their copy expires. Shared caches (Redis, the database) keep them until
+# changed
+AUTH_REVOCATION_TIMEOUT = int(os.environ.get('AUTH_REVOCATION_TIMEOUT') or 30)
+
+# Password hashing: PASSWORD_HASHER (argon2, bcrypt, scrypt or pbkdf2) makes the new hashes, the others still verify
+# the existing ones, which are rehashed on the next login. `manage.py benchmark_hashers` recommends the costs below
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER') or 'argon2'
+PASSWORD_HASHER_PATHS = {
+    'argon2': 'conexao_digital_api.passwords.Argon2PasswordHasher',
+    'bcrypt': 'conexao_digital_api.passwords.BCryptSHA256PasswordHasher',
+    'scrypt': 'conexao_digital_api.passwords.ScryptPasswordHasher',
+    'pbkdf2': 'conexao_digital_api.passwords.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_PATHS[PASSWORD_HASHER],
+                    *(path for name, path in PASSWORD_HASHER_PATHS.items() if name != PASSWORD_HASHER)]
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST') or 2)
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST') or 19456)  # KiB
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM') or 1)
+PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS') or 12)
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR') or 2 ** 14)
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS') or 2)
+
+# Request timing: the REQUEST_TIMING_SAMPLE_RATE fraction (0 disables, 1 times all) of the requests get an INFO line
+# on the conexao_digital_api.timing logger and a sample in the per route histogram of the last REQUEST_TIMING_WINDOW
+# seconds, served at /admin/timings. REQUEST_TIMING_HEADER=True also sends them a Server-Timing header, which shows
+# the query count and timings to any client: for development
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE') or 0)
+REQUEST_TIMING_HEADER = (os.environ.get('REQUEST_TIMING_HEADER') or 'False').lower() in ('true', '1')
+REQUEST_TIMING_WINDOW = int(os.environ.get('REQUEST_TIMING_WINDOW') or 300)
+
+# Valid rows written per transaction by POST /admin/users/import, which hashes the passwords on the
+# PASSWORD_HASHING_WORKERS threads, a few at a time between the logins (the import_profiles command takes
+# --chunk-size and --workers processes)
+PROFILE_IMPORT_CHUNK_SIZE = int(os.environ.get('PROFILE_IMPORT_CHUNK_SIZE') or 500)
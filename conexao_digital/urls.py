@@ -14,15 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.conf.urls.static import static
 from django.conf import settings
-from django.urls import path
+from django.urls import path, re_path
 
 from conexao_digital_api.api import api
+from conexao_digital_api.views import serve_media
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', api.urls),
+    # Also outside DEBUG, unlike django.conf.urls.static
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media),
 ]
-
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -5,7 +5,6 @@ from semantic_forms.filters import SemanticFilterSet
 import django_filters
 
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.shortcuts import render
 from django.urls import path
 from django.http import HttpResponseRedirect
@@ -13,6 +12,7 @@ from django.http import HttpResponseRedirect
 from semantic_forms.forms import SemanticForm
 from semantic_forms.fields import SemanticCharField, SemanticTextareaField
 
+from .emails import send_bulk_email
 from .models import User, Interesse, FormacaoAcademica, ExperienciaProfissional, Habilidade, Projeto
 
 
@@ -128,17 +128,11 @@ class UserAdmin(SemanticModelAdmin):
             if form.is_valid():
                 subject = form.cleaned_data['subject']
                 message = form.cleaned_data['message']
-                recipients = queryset.values_list('email', flat=True)
 
-                # Send the email
-                send_mail(
-                    subject,
-                    message,
-                    'your_email@example.com',  # Sender's email address
-                    recipients,
-                )
+                # Send the email in the background
+                job = send_bulk_email(subject, message, user_ids=list(queryset.values_list('pk', flat=True)))
 
-                self.message_user(request, f"Emails enviados para {queryset.count()} usuários.")
+                self.message_user(request, f"Envio de emails iniciado (job {job.id}).")
                 return HttpResponseRedirect(request.get_full_path())
         else:
             form = EmailForm()
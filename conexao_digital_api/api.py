@@ -1,41 +1,78 @@
-from django.core.mail import send_mail
+from typing import Dict, List, Literal
 
-from ninja import Query
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from ninja import File, Query
+from ninja.files import UploadedFile
 
 from ninja_extra import (
     NinjaExtraAPI,
     api_controller,
     ControllerBase, route,
-    ModelConfig, ModelControllerBase, ModelSchemaConfig, ModelEndpointFactory,
-    permissions
+    ModelConfig, ModelControllerBase, ModelSchemaConfig, ModelEndpointFactory, ModelAsyncEndpointFactory,
+    ModelPagination,
+    paginate
 )
+from ninja_extra.exceptions import NotFound
+from ninja_extra.pagination import PageNumberPaginationExtra
+from ninja_extra.schemas import PaginatedResponseSchema
 
-from dj_ninja_auth.jwt.authentication import JWTAuth
 from dj_ninja_auth.jwt.controller import NinjaAuthJWTController
 
-from .models import User, Interesse, Habilidade, FormacaoAcademica, ExperienciaProfissional, Projeto
+from .models import User, Interesse, Habilidade, FormacaoAcademica, ExperienciaProfissional, Projeto, EmailJob
 from .schemas import (
-    UserSchema, CreateUserSchema, UpdateUserSchema,
+    UserSchema, CreateUserSchema, UpdateUserSchema, UpdateProfileSchema,
     HabilitadeSchema, CreateOrUpdateHabilidadeSchema,
     InteresseSchema, CreateOrUpdateInteresseSchema,
     FormacaoAcademicaSchema, CreateOrUpdateFormacaoAcademicaSchema,
     ExperienciaProfissionalSchema, CreateOrUpdateExperienciaProfissionalSchema,
-    ProjetoSchema, CreateOrUpdateProjetoSchema,
-    EmailRequestSchema, FilterEmailSchema
+    ProjetoSchema, CreateOrUpdateProjetoSchema, UserInteresseSchema, RelationshipUserSchema,
+    BulkHabilidadeSchema, BulkFormacaoAcademicaSchema, BulkExperienciaProfissionalSchema, BulkProjetoSchema,
+    EmailRequestSchema, FilterEmailSchema, EmailJobSchema, RouteTimingSchema, ProfileFieldsSchema, StatSchema,
+    ProfileImportReportSchema
 )
+from .auth import ASYNC_AUTH, CachedJWTAuth, use_async_auth
+from .avatars import set_avatar
+from .bulk import attach_interesses, save_profile_items, save_profile
+from .emails import send_bulk_email
+from .imports import import_format, import_profiles
+from .pagination import CursorPagination, CursorPaginatedResponseSchema, apaginate
+from .permissions import HasActiveClaim, HasStaffClaim
+from .response_cache import cache_response, global_scope, object_user_scope, path_user_scope, profiles_scope
+from .search import search_users
+from .serialization import ORJSONParser, ProfileRows, schema_values, trusted_response
+from .services import UserModelService, load_profile, profile_selection
+from .snapshots import profile_response, aprofile_response
+from .stats import DIMENSIONS, get_stats
+from .timing import TimedJSONRenderer, histogram
 
 api = NinjaExtraAPI(
     version='1.0.0',
     title='Conexao Digital API',
     description='API para o projeto Conexao Digital',
-    auth=[JWTAuth()],
+    auth=[CachedJWTAuth()],
+    renderer=TimedJSONRenderer(),
+    parser=ORJSONParser(),
 )
 
 api.register_controllers(NinjaAuthJWTController)
 
+# API_ASYNC_READS picks async views for the list/find_one routes below and for the /me reads
+ReadEndpointFactory = ModelAsyncEndpointFactory if settings.API_ASYNC_READS else ModelEndpointFactory
 
-@api_controller('/admin/users', tags=['admins'], permissions=[permissions.IsAdminUser])
+
+def get_object(queryset, pk: int):
+    # The async factory routes await the object getter
+    return queryset.aget(pk=pk) if settings.API_ASYNC_READS else queryset.get(pk=pk)
+
+
+def read_route(scope):
+    return lambda func: cache_response(scope=scope)(use_async_auth(func))
+
+
+@api_controller('/admin/users', tags=['admins'], permissions=[HasStaffClaim])
 class AdminUserModelController(ModelControllerBase):
+    service = UserModelService(User)
     model_config = ModelConfig(
         model=User,
         retrieve_schema=UserSchema,
@@ -43,26 +80,35 @@ class AdminUserModelController(ModelControllerBase):
             exclude=[
                 'groups', 'user_permissions',
                 'is_active', 'is_staff', 'is_superuser',
-                'last_login', 'date_joined',
+                'last_login', 'date_joined', 'profile_version',
+                # Set through /me/avatar, which writes the thumbnails
+                'avatar',
             ],
             read_only_fields=['id'],
             write_only_fields=['password'],
         ),
+        pagination=ModelPagination(klass=CursorPagination, pagination_schema=CursorPaginatedResponseSchema),
+        allowed_routes=['create', 'update', 'patch', 'delete', 'list'],
     )
 
+    @route.get('/{int:id}', response=UserSchema, url_name='user-get-item', summary='Get a specific item')
+    @cache_response(scope=path_user_scope('id'))
+    def get_user(self, id: int, query: ProfileFieldsSchema = Query(...)):
+        return profile_response(id, profile_selection(query))
+
     # Create SuperUser
     create_superuser = ModelEndpointFactory.create(
         path='/superuser',
-        schema_in=UserSchema,
+        schema_in=CreateUserSchema,
         schema_out=UserSchema,
         custom_handler=lambda self, data, **kw: self.handle_create_superuser(data, **kw),
         summary='Cria um super usuário',
     )
 
     @staticmethod
-    def handle_create_superuser(data: UserSchema, **kw: any) -> User:
+    def handle_create_superuser(data: CreateUserSchema, **kw: any) -> User:
         user = User.objects.create_superuser(**data.dict())
-        return user
+        return load_profile(user)
 
     # Interesses
     add_user_to_new_interesse = ModelEndpointFactory.create(
@@ -74,28 +120,40 @@ class AdminUserModelController(ModelControllerBase):
     )
 
     def handle_add_user_to_new_interesse(self, data: CreateOrUpdateInteresseSchema, **kw: any) -> Interesse:
-        user_id = self.service.get_one(pk=kw['user_id'])
-        interesse = Interesse.objects.filter(nome=data.nome).first()
-        if not interesse:
-            interesse = Interesse.objects.create(**data.dict())
-        interesse.users.add(user_id)
-        interesse.save()
-        return interesse
+        user = self.service.get_user(pk=kw['user_id'])
+        return attach_interesses(user, [data.nome])[0]
+
+    @route.post('/{int:user_id}/interesses/bulk', response=List[UserInteresseSchema],
+                summary='Adiciona vários interesses ao usuário')
+    def add_user_to_interesses(self, user_id: int, payload: List[CreateOrUpdateInteresseSchema]):
+        user = self.service.get_user(pk=user_id)
+        return attach_interesses(user, [item.nome for item in payload])
 
-    get_interesse = ModelEndpointFactory.find_one(
+    get_interesse = read_route(global_scope)(ReadEndpointFactory.find_one(
         path='/interesses/{int:interesse_id}',
         schema_out=InteresseSchema,
         lookup_param='interesse_id',
-        object_getter=lambda self, pk, **kw: Interesse.objects.get(pk=pk),
+        object_getter=lambda self, pk, **kw: get_object(Interesse.objects.with_users_preview(), pk),
         summary='Busca um interesse pelo id',
-    )
-
-    get_interesses_from_user = ModelEndpointFactory.list(
+    ))
+
+    @route.get('/interesses/{int:interesse_id}/users', response=CursorPaginatedResponseSchema[RelationshipUserSchema],
+               summary='Lista os usuários de um interesse')
+    @cache_response(scope=global_scope)
+    @trusted_response
+    @paginate(CursorPagination)
+    def get_interesse_users(self, interesse_id: int):
+        return schema_values(User.objects.filter(interesses__id=interesse_id), RelationshipUserSchema)
+
+    # The interests embed their other users, any membership change bumps the global scope
+    get_interesses_from_user = read_route(global_scope)(ReadEndpointFactory.list(
         path='/{int:user_id}/interesses',
         schema_out=InteresseSchema,
-        queryset_getter=lambda self, **kw: Interesse.objects.filter(users__id=kw['user_id']),
+        queryset_getter=lambda self, **kw: Interesse.objects.filter(users__id=kw['user_id']).with_users_preview(),
+        pagination_class=CursorPagination,
+        pagination_response_schema=CursorPaginatedResponseSchema,
         summary='Lista todos os interesses de um usuário',
-    )
+    ))
 
     update_interesse = ModelEndpointFactory.update(
         path='/interesses/{int:interesse_id}',
@@ -122,7 +180,7 @@ class AdminUserModelController(ModelControllerBase):
     )
 
     def handle_delete_user_from_interesse(self, instance: Interesse, **kw: any):
-        user_id = self.service.get_one(pk=kw['user_id'])
+        user_id = self.service.get_user(pk=kw['user_id'])
         instance.users.remove(user_id)
         instance.save()
         return instance
@@ -137,33 +195,35 @@ class AdminUserModelController(ModelControllerBase):
     )
 
     def handle_create_new_habilidade_to_user(self, data: CreateOrUpdateHabilidadeSchema, **kw: any) -> Habilidade:
-        user_id = self.service.get_one(pk=kw['user_id'])
+        user_id = self.service.get_user(pk=kw['user_id'])
         habilidade = Habilidade.objects.create(**data.dict())
         habilidade.user = user_id
         habilidade.save()
         return habilidade
 
-    get_habilidade = ModelEndpointFactory.find_one(
+    get_habilidade = read_route(object_user_scope(Habilidade, 'habilidade_id'))(ReadEndpointFactory.find_one(
         path='/habilidades/{int:habilidade_id}',
         schema_out=HabilitadeSchema,
         lookup_param='habilidade_id',
-        object_getter=lambda self, pk, **kw: Habilidade.objects.get(pk=pk),
+        object_getter=lambda self, pk, **kw: get_object(Habilidade.objects.select_related('user'), pk),
         summary='Busca uma habilidade pelo id',
-    )
+    ))
 
-    get_habilidades_from_user = ModelEndpointFactory.list(
+    get_habilidades_from_user = read_route(path_user_scope())(ReadEndpointFactory.list(
         path='/{int:user_id}/habilidades',
         schema_out=HabilitadeSchema,
-        queryset_getter=lambda self, **kw: Habilidade.objects.filter(user_id=kw['user_id']),
+        queryset_getter=lambda self, **kw: Habilidade.objects.filter(user_id=kw['user_id']).select_related('user'),
+        pagination_class=CursorPagination,
+        pagination_response_schema=CursorPaginatedResponseSchema,
         summary='Lista todas as habilidades de um usuário',
-    )
+    ))
 
     update_habilidade = ModelEndpointFactory.update(
         path='/habilidades/{int:habilidade_id}',
         lookup_param='habilidade_id',
         schema_in=CreateOrUpdateHabilidadeSchema,
         schema_out=HabilitadeSchema,
-        object_getter=lambda self, pk, **kw: Habilidade.objects.get(pk=pk),
+        object_getter=lambda self, pk, **kw: Habilidade.objects.select_related('user').get(pk=pk),
         summary='Atualiza uma habilidade pelo id',
     )
 
@@ -185,33 +245,39 @@ class AdminUserModelController(ModelControllerBase):
 
     def handle_create_new_formacao_academica_to_user(self, data: CreateOrUpdateFormacaoAcademicaSchema,
                                                      **kw: any) -> FormacaoAcademica:
-        user_id = self.service.get_one(pk=kw['user_id'])
+        user_id = self.service.get_user(pk=kw['user_id'])
         formacao_academica = FormacaoAcademica.objects.create(**data.dict())
         formacao_academica.user = user_id
         formacao_academica.save()
         return formacao_academica
 
-    get_formacao_academica = ModelEndpointFactory.find_one(
-        path='/formacoes-academicas/{int:formacao_academica_id}',
-        schema_out=FormacaoAcademicaSchema,
-        lookup_param='formacao_academica_id',
-        object_getter=lambda self, pk, **kw: FormacaoAcademica.objects.get(pk=pk),
-        summary='Busca uma formação acadêmica pelo id',
+    get_formacao_academica = read_route(object_user_scope(FormacaoAcademica, 'formacao_academica_id'))(
+        ReadEndpointFactory.find_one(
+            path='/formacoes-academicas/{int:formacao_academica_id}',
+            schema_out=FormacaoAcademicaSchema,
+            lookup_param='formacao_academica_id',
+            object_getter=lambda self, pk, **kw: get_object(FormacaoAcademica.objects.select_related('user'), pk),
+            summary='Busca uma formação acadêmica pelo id',
+        )
     )
 
-    get_formacoes_academicas_from_user = ModelEndpointFactory.list(
+    get_formacoes_academicas_from_user = read_route(path_user_scope())(ReadEndpointFactory.list(
         path='/{int:user_id}/formacoes-academicas',
         schema_out=FormacaoAcademicaSchema,
-        queryset_getter=lambda self, **kw: FormacaoAcademica.objects.filter(user_id=kw['user_id']),
+        queryset_getter=lambda self, **kw: (
+            FormacaoAcademica.objects.filter(user_id=kw['user_id']).select_related('user')
+        ),
+        pagination_class=CursorPagination,
+        pagination_response_schema=CursorPaginatedResponseSchema,
         summary='Lista todas as formações acadêmicas de um usuário',
-    )
+    ))
 
     update_formacao_academica_from_user = ModelEndpointFactory.update(
         path='/formacoes-academicas/{int:formacao_academica_id}',
         schema_in=CreateOrUpdateFormacaoAcademicaSchema,
         schema_out=FormacaoAcademicaSchema,
         lookup_param='formacao_academica_id',
-        object_getter=lambda self, pk, **kw: FormacaoAcademica.objects.get(pk=pk),
+        object_getter=lambda self, pk, **kw: FormacaoAcademica.objects.select_related('user').get(pk=pk),
         summary='Atualiza uma formação acadêmica pelo id',
     )
 
@@ -233,33 +299,41 @@ class AdminUserModelController(ModelControllerBase):
 
     def handle_create_new_experiencia_profissional_to_user(self, data: CreateOrUpdateExperienciaProfissionalSchema,
                                                            **kw: any) -> ExperienciaProfissional:
-        user_id = self.service.get_one(pk=kw['user_id'])
+        user_id = self.service.get_user(pk=kw['user_id'])
         experiencia_profissional = ExperienciaProfissional.objects.create(**data.dict())
         experiencia_profissional.user = user_id
         experiencia_profissional.save()
         return experiencia_profissional
 
-    get_experiencia_profissional = ModelEndpointFactory.find_one(
-        path='/experiencias-profissionais/{int:experiencia_profissional_id}',
-        schema_out=ExperienciaProfissionalSchema,
-        lookup_param='experiencia_profissional_id',
-        object_getter=lambda self, pk, **kw: ExperienciaProfissional.objects.get(pk=pk),
-        summary='Busca uma experiência profissional pelo id',
+    get_experiencia_profissional = read_route(
+        object_user_scope(ExperienciaProfissional, 'experiencia_profissional_id')
+    )(
+        ReadEndpointFactory.find_one(
+            path='/experiencias-profissionais/{int:experiencia_profissional_id}',
+            schema_out=ExperienciaProfissionalSchema,
+            lookup_param='experiencia_profissional_id',
+            object_getter=lambda self, pk, **kw: get_object(ExperienciaProfissional.objects.select_related('user'), pk),
+            summary='Busca uma experiência profissional pelo id',
+        )
     )
 
-    get_experiencias_profissionais_from_user = ModelEndpointFactory.list(
+    get_experiencias_profissionais_from_user = read_route(path_user_scope())(ReadEndpointFactory.list(
         path='/{int:user_id}/experiencias-profissionais',
         schema_out=ExperienciaProfissionalSchema,
-        queryset_getter=lambda self, **kw: ExperienciaProfissional.objects.filter(user_id=kw['user_id']),
+        queryset_getter=lambda self, **kw: (
+            ExperienciaProfissional.objects.filter(user_id=kw['user_id']).select_related('user')
+        ),
+        pagination_class=CursorPagination,
+        pagination_response_schema=CursorPaginatedResponseSchema,
         summary='Lista todas as experiências profissionais de um usuário',
-    )
+    ))
 
     update_experiencia_profissional_from_user = ModelEndpointFactory.update(
         path='/experiencias-profissionais/{int:experiencia_profissional_id}',
         schema_in=CreateOrUpdateExperienciaProfissionalSchema,
         schema_out=ExperienciaProfissionalSchema,
         lookup_param='experiencia_profissional_id',
-        object_getter=lambda self, pk, **kw: ExperienciaProfissional.objects.get(pk=pk),
+        object_getter=lambda self, pk, **kw: ExperienciaProfissional.objects.select_related('user').get(pk=pk),
         summary='Atualiza uma experiência profissional pelo id',
     )
 
@@ -280,33 +354,35 @@ class AdminUserModelController(ModelControllerBase):
     )
 
     def handle_create_new_projeto_to_user(self, data: CreateOrUpdateProjetoSchema, **kw: any) -> Projeto:
-        user_id = self.service.get_one(pk=kw['user_id'])
+        user_id = self.service.get_user(pk=kw['user_id'])
         projeto = Projeto.objects.create(**data.dict())
         projeto.user = user_id
         projeto.save()
         return projeto
 
-    get_projeto = ModelEndpointFactory.find_one(
+    get_projeto = read_route(object_user_scope(Projeto, 'projeto_id'))(ReadEndpointFactory.find_one(
         path='/projetos/{int:projeto_id}',
         schema_out=ProjetoSchema,
         lookup_param='projeto_id',
-        object_getter=lambda self, pk, **kw: Projeto.objects.get(pk=pk),
+        object_getter=lambda self, pk, **kw: get_object(Projeto.objects.select_related('user'), pk),
         summary='Busca um projeto pelo id',
-    )
+    ))
 
-    get_projetos_from_user = ModelEndpointFactory.list(
+    get_projetos_from_user = read_route(path_user_scope())(ReadEndpointFactory.list(
         path='/{int:user_id}/projetos',
         schema_out=ProjetoSchema,
-        queryset_getter=lambda self, **kw: Projeto.objects.filter(user_id=kw['user_id']),
+        queryset_getter=lambda self, **kw: Projeto.objects.filter(user_id=kw['user_id']).select_related('user'),
+        pagination_class=CursorPagination,
+        pagination_response_schema=CursorPaginatedResponseSchema,
         summary='Lista todos os projetos de um usuário',
-    )
+    ))
 
     update_projeto = ModelEndpointFactory.update(
         path='/projetos/{int:projeto_id}',
         schema_in=CreateOrUpdateProjetoSchema,
         schema_out=ProjetoSchema,
         lookup_param='projeto_id',
-        object_getter=lambda self, pk, **kw: Projeto.objects.get(pk=pk),
+        object_getter=lambda self, pk, **kw: Projeto.objects.select_related('user').get(pk=pk),
         summary='Atualiza um projeto pelo id',
     )
 
@@ -321,37 +397,189 @@ class AdminUserModelController(ModelControllerBase):
 api.register_controllers(AdminUserModelController)
 
 
-@api_controller('/me', tags=['users'], permissions=[permissions.IsAuthenticated])
-class MeController(ControllerBase):
+@api_controller('/admin/timings', tags=['admins'], permissions=[HasStaffClaim])
+class AdminTimingController(ControllerBase):
+    @route.get('', response=Dict[str, RouteTimingSchema])
+    def get_timings(self):
+        """Tempos das requisições amostradas deste processo, por rota, nos últimos REQUEST_TIMING_WINDOW segundos."""
+        return histogram.snapshot()
+
+
+api.register_controllers(AdminTimingController)
+
+
+@api_controller('/admin/stats', tags=['admins'], permissions=[HasStaffClaim])
+class AdminStatsController(ControllerBase):
+    @route.get('/{dimension}', response=List[StatSchema])
+    @trusted_response
+    def get_stats(self, dimension: Literal[tuple(DIMENSIONS)], limit: int = Query(20, ge=1, le=100)):
+        """
+        Usuários ativos (sem administradores) por valor da dimensão: os `limit` valores mais comuns, ou todos em
+        ordem para idade, deficiência, níveis e semestres.
+        """
+        return get_stats(DIMENSIONS[dimension], limit)
+
+
+api.register_controllers(AdminStatsController)
+
+
+@api_controller('/admin/users/import', tags=['admins'], permissions=[HasStaffClaim])
+class AdminProfileImportController(ControllerBase):
+    @route.post('', response=ProfileImportReportSchema)
+    def import_profiles(self, file: UploadedFile = File(...)):
+        """
+        Cria os usuários de um arquivo .csv ou .jsonl com interesses, habilidades, formações, experiências e projetos.
+        As linhas inválidas ficam de fora e são listadas com seus erros.
+        """
+        # No process pool forked from the web worker, the passwords are hashed on the threads of passwords.py
+        return import_profiles(file, import_format(file.name), chunk_size=settings.PROFILE_IMPORT_CHUNK_SIZE)
+
+
+api.register_controllers(AdminProfileImportController)
+
+
+# The /me item lists, shared by the sync and the async read routes
+ME_ITEM_SCHEMAS = {
+    Habilidade: HabilitadeSchema,
+    FormacaoAcademica: FormacaoAcademicaSchema,
+    ExperienciaProfissional: ExperienciaProfissionalSchema,
+    Projeto: ProjetoSchema,
+}
+
+
+def me_interesses(request):
+    return Interesse.objects.filter(users__id=request.user.id).with_users_preview()
+
+
+def me_items(request, model):
+    return schema_values(model.objects.filter(user=request.user), ME_ITEM_SCHEMAS[model])
+
+
+class MeReadController(ControllerBase):
     @route.get('', response=UserSchema)
-    def get_me(self, request):
-        return request.user
+    @cache_response()
+    def get_me(self, request, query: ProfileFieldsSchema = Query(...)):
+        return profile_response(request.user.pk, profile_selection(query))
+
+    @route.get('/interesses', response=CursorPaginatedResponseSchema[InteresseSchema])
+    # Global, the interests embed their other users
+    @cache_response(scope=global_scope)
+    @paginate(CursorPagination)
+    def get_interesses(self, request):
+        return me_interesses(request)
+
+    @route.get('/habilidades', response=CursorPaginatedResponseSchema[HabilitadeSchema])
+    @cache_response()
+    @trusted_response
+    @paginate(CursorPagination)
+    def get_habilidades(self, request):
+        return me_items(request, Habilidade)
+
+    @route.get('/formacoes-academicas', response=CursorPaginatedResponseSchema[FormacaoAcademicaSchema])
+    @cache_response()
+    @trusted_response
+    @paginate(CursorPagination)
+    def get_formacoes_academicas(self, request):
+        return me_items(request, FormacaoAcademica)
 
+    @route.get('/experiencias-profissionais', response=CursorPaginatedResponseSchema[ExperienciaProfissionalSchema])
+    @cache_response()
+    @trusted_response
+    @paginate(CursorPagination)
+    def get_experiencias_profissionais(self, request):
+        return me_items(request, ExperienciaProfissional)
+
+    @route.get('/projetos', response=CursorPaginatedResponseSchema[ProjetoSchema])
+    @cache_response()
+    @trusted_response
+    @paginate(CursorPagination)
+    def get_projetos(self, request):
+        return me_items(request, Projeto)
+
+
+class AsyncMeReadController(ControllerBase):
+    # Same routes as MeReadController, the querysets are only evaluated by the async pagination
+    @route.get('', response=UserSchema, auth=ASYNC_AUTH)
+    @cache_response()
+    async def get_me(self, request, query: ProfileFieldsSchema = Query(...)):
+        return await aprofile_response(request.user.pk, profile_selection(query))
+
+    @route.get('/interesses', response=CursorPaginatedResponseSchema[InteresseSchema], auth=ASYNC_AUTH)
+    @cache_response(scope=global_scope)
+    @apaginate(CursorPagination)
+    async def get_interesses(self, request):
+        return me_interesses(request)
+
+    @route.get('/habilidades', response=CursorPaginatedResponseSchema[HabilitadeSchema], auth=ASYNC_AUTH)
+    @cache_response()
+    @trusted_response
+    @apaginate(CursorPagination)
+    async def get_habilidades(self, request):
+        return me_items(request, Habilidade)
+
+    @route.get('/formacoes-academicas', response=CursorPaginatedResponseSchema[FormacaoAcademicaSchema],
+               auth=ASYNC_AUTH)
+    @cache_response()
+    @trusted_response
+    @apaginate(CursorPagination)
+    async def get_formacoes_academicas(self, request):
+        return me_items(request, FormacaoAcademica)
+
+    @route.get('/experiencias-profissionais', response=CursorPaginatedResponseSchema[ExperienciaProfissionalSchema],
+               auth=ASYNC_AUTH)
+    @cache_response()
+    @trusted_response
+    @apaginate(CursorPagination)
+    async def get_experiencias_profissionais(self, request):
+        return me_items(request, ExperienciaProfissional)
+
+    @route.get('/projetos', response=CursorPaginatedResponseSchema[ProjetoSchema], auth=ASYNC_AUTH)
+    @cache_response()
+    @trusted_response
+    @apaginate(CursorPagination)
+    async def get_projetos(self, request):
+        return me_items(request, Projeto)
+
+
+@api_controller('/me', tags=['users'], permissions=[HasActiveClaim])
+class MeController(AsyncMeReadController if settings.API_ASYNC_READS else MeReadController):
     @route.put('', response=UserSchema)
     def update_me(self, request, payload: UpdateUserSchema):
         user = request.user
         for attr, value in payload.dict(exclude_unset=True).items():
             setattr(user, attr, value)
         user.save()
-        return user
+        return load_profile(user)
+
+    @route.put('/profile', response=UserSchema)
+    def update_profile(self, request, payload: UpdateProfileSchema):
+        # The whole profile editor in one request
+        save_profile(request.user, payload)
+        return profile_response(request.user.pk)
 
     @route.delete('')
     def delete_me(self, request):
         request.user.delete()
         return None
 
+    @route.post('/avatar', response=UserSchema)
+    def upload_avatar(self, request, file: UploadedFile = File(...)):
+        # Stores a copy without metadata and the thumbnails listed in UserSchema.avatar
+        set_avatar(request.user, file.read())
+        return profile_response(request.user.pk)
+
+    @route.delete('/avatar', response=UserSchema)
+    def delete_avatar(self, request):
+        set_avatar(request.user, None)
+        return profile_response(request.user.pk)
+
     @route.post('/interesses', response=InteresseSchema)
     def create_interesse(self, request, payload: CreateOrUpdateInteresseSchema):
-        interesse = Interesse.objects.filter(nome=payload.nome).first()
-        if not interesse:
-            interesse = Interesse.objects.create(**payload.dict())
-        interesse.users.add(request.user)
-        interesse.save()
-        return interesse
+        return attach_interesses(request.user, [payload.nome])[0]
 
-    @route.get('/interesses', response=InteresseSchema)
-    def get_interesses(self, request):
-        return Interesse.objects.filter(users__id=request.user.id)
+    @route.post('/interesses/bulk', response=List[UserInteresseSchema])
+    def create_interesses(self, request, payload: List[CreateOrUpdateInteresseSchema]):
+        return attach_interesses(request.user, [item.nome for item in payload])
 
     @route.delete('/interesses/{int:interesse_id}')
     def delete_user_from_interesse(self, request, interesse_id: int):
@@ -367,14 +595,19 @@ class MeController(ControllerBase):
         habilidade.save()
         return habilidade
 
-    @route.get('/habilidades', response=HabilitadeSchema)
-    def get_habilidades(self, request):
-        return Habilidade.objects.filter(user=request.user)
+    # Batches of items, PUT replaces the whole collection
+    @route.post('/habilidades/bulk', response=List[HabilitadeSchema])
+    def bulk_save_habilidades(self, request, payload: List[BulkHabilidadeSchema]):
+        return save_profile_items(request.user, Habilidade, payload)
+
+    @route.put('/habilidades/bulk', response=List[HabilitadeSchema])
+    def replace_habilidades(self, request, payload: List[BulkHabilidadeSchema]):
+        return save_profile_items(request.user, Habilidade, payload, replace=True)
 
     @route.put('/habilidades/{int:habilidade_id}', response=HabilitadeSchema)
     def update_habilidade(self, request, habilidade_id: int, payload: CreateOrUpdateHabilidadeSchema):
-        habilidade = Habilidade.objects.get(pk=habilidade_id)
-        if habilidade.user == request.user:
+        habilidade = Habilidade.objects.select_related('user').get(pk=habilidade_id)
+        if habilidade.user_id == request.user.pk:
             for attr, value in payload.dict(exclude_unset=True).items():
                 setattr(habilidade, attr, value)
             habilidade.save()
@@ -383,7 +616,7 @@ class MeController(ControllerBase):
     @route.delete('/habilidades/{int:habilidade_id}')
     def delete_habilidade(self, request, habilidade_id: int):
         habilidade = Habilidade.objects.get(pk=habilidade_id)
-        if habilidade.user == request.user:
+        if habilidade.user_id == request.user.pk:
             habilidade.delete()
         return None
 
@@ -394,15 +627,19 @@ class MeController(ControllerBase):
         formacao_academica.save()
         return formacao_academica
 
-    @route.get('/formacoes-academicas', response=FormacaoAcademicaSchema)
-    def get_formacoes_academicas(self, request):
-        return FormacaoAcademica.objects.filter(user=request.user)
+    @route.post('/formacoes-academicas/bulk', response=List[FormacaoAcademicaSchema])
+    def bulk_save_formacoes_academicas(self, request, payload: List[BulkFormacaoAcademicaSchema]):
+        return save_profile_items(request.user, FormacaoAcademica, payload)
+
+    @route.put('/formacoes-academicas/bulk', response=List[FormacaoAcademicaSchema])
+    def replace_formacoes_academicas(self, request, payload: List[BulkFormacaoAcademicaSchema]):
+        return save_profile_items(request.user, FormacaoAcademica, payload, replace=True)
 
     @route.put('/formacoes-academicas/{int:formacao_academica_id}', response=FormacaoAcademicaSchema)
     def update_formacao_academica(self, request, formacao_academica_id: int,
                                   payload: CreateOrUpdateFormacaoAcademicaSchema):
-        formacao_academica = FormacaoAcademica.objects.get(pk=formacao_academica_id)
-        if formacao_academica.user == request.user:
+        formacao_academica = FormacaoAcademica.objects.select_related('user').get(pk=formacao_academica_id)
+        if formacao_academica.user_id == request.user.pk:
             for attr, value in payload.dict(exclude_unset=True).items():
                 setattr(formacao_academica, attr, value)
             formacao_academica.save()
@@ -411,7 +648,7 @@ class MeController(ControllerBase):
     @route.delete('/formacoes-academicas/{int:formacao_academica_id}')
     def delete_formacao_academica(self, request, formacao_academica_id: int):
         formacao_academica = FormacaoAcademica.objects.get(pk=formacao_academica_id)
-        if formacao_academica.user == request.user:
+        if formacao_academica.user_id == request.user.pk:
             formacao_academica.delete()
         return None
 
@@ -422,15 +659,21 @@ class MeController(ControllerBase):
         experiencia_profissional.save()
         return experiencia_profissional
 
-    @route.get('/experiencias-profissionais', response=ExperienciaProfissionalSchema)
-    def get_experiencias_profissionais(self, request):
-        return ExperienciaProfissional.objects.filter(user=request.user)
+    @route.post('/experiencias-profissionais/bulk', response=List[ExperienciaProfissionalSchema])
+    def bulk_save_experiencias_profissionais(self, request, payload: List[BulkExperienciaProfissionalSchema]):
+        return save_profile_items(request.user, ExperienciaProfissional, payload)
+
+    @route.put('/experiencias-profissionais/bulk', response=List[ExperienciaProfissionalSchema])
+    def replace_experiencias_profissionais(self, request, payload: List[BulkExperienciaProfissionalSchema]):
+        return save_profile_items(request.user, ExperienciaProfissional, payload, replace=True)
 
     @route.put('/experiencias-profissionais/{int:experiencia_profissional_id}', response=ExperienciaProfissionalSchema)
     def update_experiencia_profissional(self, request, experiencia_profissional_id: int,
                                         payload: CreateOrUpdateExperienciaProfissionalSchema):
-        experiencia_profissional = ExperienciaProfissional.objects.get(pk=experiencia_profissional_id)
-        if experiencia_profissional.user == request.user:
+        experiencia_profissional = ExperienciaProfissional.objects.select_related('user').get(
+            pk=experiencia_profissional_id
+        )
+        if experiencia_profissional.user_id == request.user.pk:
             for attr, value in payload.dict(exclude_unset=True).items():
                 setattr(experiencia_profissional, attr, value)
             experiencia_profissional.save()
@@ -439,7 +682,7 @@ class MeController(ControllerBase):
     @route.delete('/experiencias-profissionais/{int:experiencia_profissional_id}')
     def delete_experiencia_profissional(self, request, experiencia_profissional_id: int):
         experiencia_profissional = ExperienciaProfissional.objects.get(pk=experiencia_profissional_id)
-        if experiencia_profissional.user == request.user:
+        if experiencia_profissional.user_id == request.user.pk:
             experiencia_profissional.delete()
         return None
 
@@ -450,14 +693,18 @@ class MeController(ControllerBase):
         projeto.save()
         return projeto
 
-    @route.get('/projetos', response=ProjetoSchema)
-    def get_projetos(self, request):
-        return Projeto.objects.filter(user=request.user)
+    @route.post('/projetos/bulk', response=List[ProjetoSchema])
+    def bulk_save_projetos(self, request, payload: List[BulkProjetoSchema]):
+        return save_profile_items(request.user, Projeto, payload)
+
+    @route.put('/projetos/bulk', response=List[ProjetoSchema])
+    def replace_projetos(self, request, payload: List[BulkProjetoSchema]):
+        return save_profile_items(request.user, Projeto, payload, replace=True)
 
     @route.put('/projetos/{int:projeto_id}', response=ProjetoSchema)
     def update_projeto(self, request, projeto_id: int, payload: CreateOrUpdateProjetoSchema):
-        projeto = Projeto.objects.get(pk=projeto_id)
-        if projeto.user == request.user:
+        projeto = Projeto.objects.select_related('user').get(pk=projeto_id)
+        if projeto.user_id == request.user.pk:
             for attr, value in payload.dict(exclude_unset=True).items():
                 setattr(projeto, attr, value)
             projeto.save()
@@ -466,7 +713,7 @@ class MeController(ControllerBase):
     @route.delete('/projetos/{int:projeto_id}')
     def delete_projeto(self, request, projeto_id: int):
         projeto = Projeto.objects.get(pk=projeto_id)
-        if projeto.user == request.user:
+        if projeto.user_id == request.user.pk:
             projeto.delete()
         return None
 
@@ -475,23 +722,40 @@ api.register_controllers(MeController)
 
 
 @api.post('/create', tags=['auth'], auth=None, response=UserSchema)
-def create_user(request, payload: CreateUserSchema):
-    user = User.objects.create_user(**payload.dict())
-    return user
-
-
-@api.post('/send-email', tags=['admins'])
-def send_emails_to_filtered_users(request, payload: EmailRequestSchema, filters: FilterEmailSchema = Query(...)):
-    # Filter the users based on the filter schema
-    users = User.objects.filter(filters.get_filter_expression(), is_superuser=False, is_staff=False)
-    emails = list(users.values_list('email', flat=True)) + payload.emails
-
-    # Send the email to the filtered users
-    send_mail(
-        payload.subject,
-        payload.message,
-        'conexaodigital@gmail.com',
-        emails,
-    )
+async def create_user(request, payload: CreateUserSchema):
+    user = await User.objects.acreate_user(**payload.dict())
+    return await sync_to_async(load_profile)(user)
+
+
+# The results carry the contact and deficiencia fields, for the recruiters only
+@api_controller('/search', tags=['users'], permissions=[HasStaffClaim])
+class SearchController(ControllerBase):
+    @route.get('/users', response=PaginatedResponseSchema[UserSchema])
+    @cache_response(scope=profiles_scope)
+    @trusted_response
+    @paginate(PageNumberPaginationExtra)
+    def search_talents(self, q: str, query: ProfileFieldsSchema = Query(...)):
+        # Ranked by relevance, so paginated by page instead of by cursor
+        return ProfileRows(search_users(q), profile_selection(query))
+
+
+api.register_controllers(SearchController)
+
+
+@api_controller('/send-email', tags=['admins'], permissions=[HasStaffClaim])
+class EmailController(ControllerBase):
+    @route.post('', response=EmailJobSchema)
+    def send_emails_to_filtered_users(self, payload: EmailRequestSchema, filters: FilterEmailSchema = Query(...)):
+        # The users are filtered and the emails sent by the queue workers, the job can be followed on
+        # /send-email/{job_id}
+        return send_bulk_email(payload.subject, payload.message, filters=filters.dict(), extra_emails=payload.emails)
+
+    @route.get('/{int:job_id}', response=EmailJobSchema)
+    def get_email_job(self, job_id: int):
+        job = EmailJob.objects.filter(pk=job_id).first()
+        if not job:
+            raise NotFound()
+        return job
+
 
-    return {"message": "Email enviado com sucesso! para {} usuários".format(len(emails))}
+api.register_controllers(EmailController)
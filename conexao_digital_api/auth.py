@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import router
+from dj_ninja_auth.jwt import app_settings
+from dj_ninja_auth.jwt.authentication import JWTBaseAuthentication
+from dj_ninja_auth.jwt.exceptions import AuthenticationFailed
+from ninja_extra.constants import ROUTE_FUNCTION
+from ninja_extra.controllers.route.route_functions import AsyncRouteFunction
+from ninja_extra.security import AsyncHttpBearer, HttpBearer
+
+from .models import User
+from .response_cache import bump_version, get_versions
+from .tokens import CLAIM_FIELDS, get_current_profile_version, revocation_timeout
+
+# The User columns kept for a verified token, enough for the permission classes and the querysets filtering by user
+PRINCIPAL_FIELDS = ('id', 'is_staff', 'is_superuser', 'is_active')
+
+
+def principal_scope(user_id: int) -> str:
+    # Bumped on user saves and deletes (see signals.py), not on profile changes
+    return f'principal:{user_id}'
+
+
+def invalidate_principal(user_id: int):
+    bump_version(principal_scope(user_id), revocation_timeout())
+
+
+class PrincipalCache:
+    """
+    Bounded LRU of verified access tokens, per process.
+
+    An entry lives for AUTH_TOKEN_CACHE_TTL seconds at most and never past the token's expiry. AUTH_TOKEN_CACHE_SIZE=0
+    disables the cache.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[tuple]:
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self.entries[token]
+                return None
+            self.entries.move_to_end(token)
+            return entry[1:]
+
+    def set(self, token: str, expires_at: float, *value):
+        max_size = settings.AUTH_TOKEN_CACHE_SIZE
+        if not max_size:
+            return
+        with self.lock:
+            self.entries[token] = (min(expires_at, time.time() + settings.AUTH_TOKEN_CACHE_TTL), *value)
+            self.entries.move_to_end(token)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+def build_principal(values: tuple) -> User:
+    # A User with only PRINCIPAL_FIELDS loaded, the other columns are read in one query when first accessed
+    user = User.from_db(router.db_for_read(User), PRINCIPAL_FIELDS, values)
+    user._load_deferred_together = True
+    return user
+
+
+def is_current(values: tuple, claims: Optional[dict], version) -> bool:
+    # Tokens with claims are current while their profile_version is, the others while the user isn't saved
+    if claims is not None:
+        return get_current_profile_version(values[0]) == claims['profile_version']
+    return get_versions([principal_scope(values[0])], revocation_timeout()) == [version]
+
+
+class CachedJWTAuthentication(JWTBaseAuthentication):
+    """
+    Authenticates without touching the users table for tokens with claims (see tokens.py) or verified recently.
+
+    Sets `request.auth_claims` to the token's claims, None for tokens minted before them. Those are checked against
+    the database once and then cached until the user is saved or deleted, through a version kept in the api cache.
+    """
+
+    def jwt_authenticate(self, request, token: str) -> User:
+        request.user = AnonymousUser()
+        request.auth_claims = None
+        cached = principal_cache.get(token)
+        if cached is not None and is_current(*cached):
+            values, request.auth_claims, _ = cached
+            request.user = build_principal(values)
+            return request.user
+
+        validated_token = self.get_validated_token(token)
+        user_id = validated_token[app_settings.USER_ID_CLAIM]
+        if 'profile_version' in validated_token:
+            claims = {field: validated_token[field] for field in CLAIM_FIELDS}
+            if get_current_profile_version(user_id) != claims['profile_version']:
+                raise AuthenticationFailed('Token has been revoked')
+            values = (user_id, *(claims[field] for field in PRINCIPAL_FIELDS[1:]))
+            principal_cache.set(token, validated_token['exp'], values, claims, None)
+            request.auth_claims = claims
+            request.user = build_principal(values)
+            return request.user
+
+        # Read before the checks, a change during them makes the entry stale rather than cached with the old state
+        version = get_versions([principal_scope(user_id)], revocation_timeout())[0]
+        user = self.get_user(validated_token)
+        principal_cache.set(token, validated_token['exp'], tuple(getattr(user, field) for field in PRINCIPAL_FIELDS),
+                            None, version)
+        request.user = user
+        return user
+
+
+class CachedJWTAuth(CachedJWTAuthentication, HttpBearer):
+    def authenticate(self, request, token: str):
+        return self.jwt_authenticate(request, token)
+
+
+class AsyncJWTAuth(CachedJWTAuthentication, AsyncHttpBearer):
+    """JWTAuth for async routes, the sync one would query the database inside the event loop."""
+
+    async def authenticate(self, request, token: str):
+        # The token validation and the user lookup are sync queries of dj_ninja_auth
+        return await sync_to_async(self.jwt_authenticate)(request, token)
+
+
+ASYNC_AUTH = [AsyncJWTAuth()]
+
+
+def use_async_auth(func):
+    # For the routes built by ModelEndpointFactory, which take no `auth` argument. Sync routes are left as they are
+    route_function = getattr(func, ROUTE_FUNCTION)
+    if isinstance(route_function, AsyncRouteFunction):
+        route_function.route.route_params.auth = ASYNC_AUTH
+    return func
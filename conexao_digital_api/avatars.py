@@ -0,0 +1,143 @@
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from ninja_extra.exceptions import ParseError
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import User
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+# (format, extension, save options), the WebP variants are served first, the JPEG ones to older clients
+VARIANT_FORMATS = (
+    ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+)
+# avatars/<content hash>.jpg, the variants sit next to it as avatars/<content hash>-<size>.<extension>
+AVATAR_NAME = re.compile(r'^avatars/(?P<digest>[0-9a-f]{32})\.jpg$')
+# Any file of a processed avatar, its content never changes
+AVATAR_FILE = re.compile(r'^avatars/[0-9a-f]{32}(-\d+\.(webp|jpg)|\.jpg)$')
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Pillow releases the GIL while encoding, the variants of an upload are written in parallel
+        _executor = ThreadPoolExecutor(max_workers=settings.AVATAR_WORKERS, thread_name_prefix='avatar')
+    return _executor
+
+
+def variant_name(digest: str, size: int, extension: str) -> str:
+    return f'avatars/{digest}-{size}.{extension}'
+
+
+def avatar_names(name: str) -> List[str]:
+    # Every file of a processed avatar, or just `name` for the ones uploaded before the variants existed
+    match = AVATAR_NAME.match(name)
+    if not match:
+        return [name]
+    return [name] + [variant_name(match['digest'], size, extension)
+                     for size in settings.AVATAR_THUMBNAIL_SIZES for _, extension, _ in VARIANT_FORMATS]
+
+
+def avatar_urls(name: Optional[str]) -> Optional[dict]:
+    """The URLs of the original and of each thumbnail, in the shape of AvatarSchema."""
+    if not name:
+        return None
+    match = AVATAR_NAME.match(name)
+    thumbnails = []
+    if match:
+        thumbnails = [{'size': size, **{extension: default_storage.url(variant_name(match['digest'], size, extension))
+                                        for _, extension, _ in VARIANT_FORMATS}}
+                      for size in settings.AVATAR_THUMBNAIL_SIZES]
+    return {'url': default_storage.url(name), 'thumbnails': thumbnails}
+
+
+def decode(data: bytes) -> Image.Image:
+    try:
+        image = Image.open(BytesIO(data))
+        if image.format not in ALLOWED_FORMATS:
+            raise ParseError('Formato de imagem não suportado.')
+        # Checked before decoding the pixels, a small file can declare a huge image
+        if image.width * image.height > settings.AVATAR_MAX_PIXELS:
+            raise ParseError('Imagem muito grande.')
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ParseError('Arquivo de imagem inválido.')
+    # Applies the EXIF orientation to the pixels, the metadata itself isn't written to the new files
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+
+def encode(image: Image.Image, image_format: str, options: dict, size: Optional[int] = None) -> bytes:
+    if size:
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha, transparent areas become white
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    output = BytesIO()
+    image.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def save_file(file_name: str, content: bytes):
+    # The names are content hashes, a file written meanwhile by an upload of the same image has the same bytes.
+    # The storage saves the second one under a suffixed name, which is deleted.
+    saved = default_storage.save(file_name, ContentFile(content))
+    if saved != file_name:
+        default_storage.delete(saved)
+
+
+def process_avatar(data: bytes) -> str:
+    """
+    Decodes the upload and writes the original and the thumbnails, returning the name stored in User.avatar.
+
+    The files are named after the upload's hash, so the same image is processed once and the names can be cached
+    forever.
+    """
+    if len(data) > settings.AVATAR_MAX_UPLOAD_SIZE:
+        raise ParseError('Imagem muito grande.')
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    name = f'avatars/{digest}.jpg'
+    if all(default_storage.exists(file_name) for file_name in avatar_names(name)):
+        return name
+
+    image = decode(data)
+    executor = get_executor()
+    jobs = {name: executor.submit(encode, image, 'JPEG', VARIANT_FORMATS[1][2])}
+    for size in settings.AVATAR_THUMBNAIL_SIZES:
+        for image_format, extension, options in VARIANT_FORMATS:
+            jobs[variant_name(digest, size, extension)] = executor.submit(encode, image, image_format, options, size)
+
+    for file_name, job in jobs.items():
+        content = job.result()
+        if not default_storage.exists(file_name):
+            save_file(file_name, content)
+    return name
+
+
+def delete_avatar_files(name: str):
+    # Files are shared by the users that uploaded the same image
+    if name and not User.objects.filter(avatar=name).exists():
+        for file_name in avatar_names(name):
+            default_storage.delete(file_name)
+
+
+def set_avatar(user: User, data: Optional[bytes]) -> User:
+    # `data=None` removes the avatar
+    old_name = user.avatar.name if user.avatar else None
+    user.avatar = process_avatar(data) if data is not None else None
+    user.save(update_fields=['avatar'])
+    if old_name and old_name != user.avatar.name:
+        transaction.on_commit(lambda: delete_avatar_files(old_name))
+    return user
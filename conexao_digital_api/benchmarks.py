@@ -0,0 +1,401 @@
+import itertools
+import json
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from ninja.responses import NinjaJSONEncoder
+from PIL import Image
+
+from .api import api
+from .models import User, Interesse, Habilidade, FormacaoAcademica, ExperienciaProfissional, Projeto, EmailJob
+from .schemas import UserSchema
+from .seeding import INTERESSES, SEED_PASSWORD, seed_email
+from .serialization import dumps, profile_values
+from .services import profile_queryset
+from .tokens import ClaimsRefreshToken
+
+API_PREFIX = '/api/v1'
+
+# Payloads of the routes creating or updating profile items, keyed by the path segment of the model
+ITEMS = {
+    'habilidades': (Habilidade, {'nome': 'Python', 'nivel': 2}),
+    'formacoes-academicas': (FormacaoAcademica, {'curso': 'Computação', 'instituicao': 'USP', 'ano_inicio': 2020,
+                                                 'ano_conclusao': 2024, 'semestre': 4}),
+    'experiencias-profissionais': (ExperienciaProfissional, {'cargo': 'Dev', 'empresa': 'ACME', 'ano_inicio': 2021,
+                                                             'ano_fim': 2023, 'descricao': 'Backend.'}),
+    'projetos': (Projeto, {'nome': 'Portfolio', 'descricao': 'Site pessoal.', 'link': 'https://example.com'}),
+}
+# Items sent to the bulk routes
+BULK_SIZE = 5
+
+
+class Call(NamedTuple):
+    path: str
+    user: Optional[User] = None
+    data: Any = None
+    # 'json' or 'multipart'
+    format: str = 'json'
+
+
+def route_keys() -> List[str]:
+    """'METHOD /path' of every route of the API, as declared in api.py."""
+    keys = []
+    for prefix, router in api._routers:
+        for path, path_view in router.path_operations.items():
+            for operation in path_view.operations:
+                keys += [f'{method} {prefix}{path}' for method in operation.methods]
+    return keys
+
+
+def user_payload(user: User) -> dict:
+    return {'nome': user.nome, 'email': user.email, 'idade': user.idade, 'genero': user.genero,
+            'telefone': user.telefone, 'deficiencia': user.deficiencia, 'resumo': user.resumo or ''}
+
+
+def avatar_bytes() -> bytes:
+    buffer = BytesIO()
+    Image.new('RGB', (800, 600), (40, 120, 200)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def import_file(prefix: str) -> bytes:
+    # BULK_SIZE profiles with one item of each kind, as uploaded to /admin/users/import
+    items = {segment.replace('-', '_'): [payload] for segment, (model, payload) in ITEMS.items()}
+    return b''.join(
+        json.dumps({'email': f'import{prefix}-{number}@example.com', 'nome': f'Import {prefix}-{number}',
+                    'password': SEED_PASSWORD, 'idade': 30, 'genero': 'O', 'telefone': '11999999999',
+                    'interesses': [{'nome': INTERESSES[0]}], **items}).encode() + b'\n'
+        for number in range(BULK_SIZE)
+    )
+
+
+class BenchmarkContext:
+    """
+    The seeded users the calls act on, and the objects they need, created before each measured request.
+
+    Reads go to `reader`, a seeded user kept as generated. Writes go to `writer`, and the calls deleting users or
+    revoking their tokens get a new user each.
+    """
+
+    def __init__(self):
+        self.client = Client()
+        # Names of the created objects are unique across runs on a kept database
+        self.run = f'{time.time_ns():x}'
+        self.counter = itertools.count()
+        self.password_hash = make_password(SEED_PASSWORD)
+        self.reader = User.objects.get(email=seed_email(0))
+        self.writer = User.objects.get(email=seed_email(1))
+        self.admin = User.objects.filter(email='benchmark-admin@example.com').first() or self.new_user(
+            email='benchmark-admin@example.com', is_staff=True, is_superuser=True
+        )
+        # The most popular interest of the generated data
+        self.interesse = Interesse.objects.get(nome=INTERESSES[0])
+        self.tokens = {}
+        self.avatar = avatar_bytes()
+
+    def unique(self) -> str:
+        return f'{self.run}-{next(self.counter)}'
+
+    def headers(self, user: Optional[User]) -> dict:
+        if user is None:
+            return {}
+        # Minted as /auth/login does, once per user
+        if user.pk not in self.tokens:
+            self.tokens[user.pk] = str(ClaimsRefreshToken.for_user(user).access_token)
+        return {'HTTP_AUTHORIZATION': f'Bearer {self.tokens[user.pk]}'}
+
+    def new_user(self, **fields) -> User:
+        number = self.unique()
+        fields = {'email': f'benchmark{number}@example.com', 'nome': f'Benchmark {number}', 'idade': 30,
+                  'genero': 'O', 'telefone': '11999999999', **fields}
+        return User.objects.create(password=self.password_hash, **fields)
+
+    def new_item(self, segment: str, user: Optional[User] = None):
+        model, payload = ITEMS[segment]
+        return model.objects.create(user=user or self.writer, **payload)
+
+    def new_interesse(self, user: Optional[User] = None) -> Interesse:
+        interesse = Interesse.objects.create(nome=f'Benchmark {self.unique()}')
+        interesse.users.add(user or self.writer)
+        return interesse
+
+    def bulk_items(self, segment: str) -> list:
+        payload = ITEMS[segment][1]
+        return [{**payload, list(payload)[0]: f'{list(payload.values())[0]} {number}'} for number in range(BULK_SIZE)]
+
+    def profile_payload(self) -> dict:
+        return {**user_payload(self.writer), 'interesses': [{'nome': nome} for nome in INTERESSES[:5]],
+                **{segment.replace('-', '_'): self.bulk_items(segment) for segment in ITEMS}}
+
+
+def item_calls() -> Dict[str, Callable[[BenchmarkContext], Call]]:
+    # The routes repeated for each profile item model
+    calls = {}
+    for segment in ITEMS:
+        param = {'habilidades': 'habilidade_id', 'formacoes-academicas': 'formacao_academica_id',
+                 'experiencias-profissionais': 'experiencia_profissional_id', 'projetos': 'projeto_id'}[segment]
+        payload = ITEMS[segment][1]
+        calls.update({
+            f'GET /me/{segment}': lambda ctx, s=segment: Call(f'/me/{s}', ctx.reader),
+            f'POST /me/{segment}': lambda ctx, s=segment, p=payload: Call(f'/me/{s}', ctx.writer, p),
+            f'POST /me/{segment}/bulk': lambda ctx, s=segment: Call(f'/me/{s}/bulk', ctx.writer, ctx.bulk_items(s)),
+            f'PUT /me/{segment}/bulk': lambda ctx, s=segment: Call(f'/me/{s}/bulk', ctx.writer, ctx.bulk_items(s)),
+            f'PUT /me/{segment}/{{int:{param}}}':
+                lambda ctx, s=segment, p=payload: Call(f'/me/{s}/{ctx.new_item(s).pk}', ctx.writer, p),
+            f'DELETE /me/{segment}/{{int:{param}}}':
+                lambda ctx, s=segment: Call(f'/me/{s}/{ctx.new_item(s).pk}', ctx.writer),
+            f'POST /admin/users/{{int:user_id}}/{segment}':
+                lambda ctx, s=segment, p=payload: Call(f'/admin/users/{ctx.writer.pk}/{s}', ctx.admin, p),
+            f'GET /admin/users/{{int:user_id}}/{segment}':
+                lambda ctx, s=segment: Call(f'/admin/users/{ctx.reader.pk}/{s}', ctx.admin),
+            f'GET /admin/users/{segment}/{{int:{param}}}':
+                lambda ctx, s=segment: Call(f'/admin/users/{s}/{ctx.new_item(s).pk}', ctx.admin),
+            f'PUT /admin/users/{segment}/{{int:{param}}}':
+                lambda ctx, s=segment, p=payload: Call(f'/admin/users/{s}/{ctx.new_item(s).pk}', ctx.admin, p),
+            f'DELETE /admin/users/{segment}/{{int:{param}}}':
+                lambda ctx, s=segment: Call(f'/admin/users/{s}/{ctx.new_item(s).pk}', ctx.admin),
+        })
+    return calls
+
+
+def password_reset_confirm(ctx: BenchmarkContext) -> Call:
+    user = ctx.new_user()
+    return Call('/auth/password/reset/confirm', None, {
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)), 'token': default_token_generator.make_token(user),
+        'new_password1': 'outra-senha-segura-456', 'new_password2': 'outra-senha-segura-456',
+    })
+
+
+def password_change(ctx: BenchmarkContext) -> Call:
+    user = ctx.new_user()
+    return Call('/auth/password/change', user, {
+        'username': user.email, 'old_password': SEED_PASSWORD,
+        'new_password1': 'outra-senha-segura-456', 'new_password2': 'outra-senha-segura-456',
+    })
+
+
+def admin_update(ctx: BenchmarkContext, user: User) -> Call:
+    return Call(f'/admin/users/{user.pk}', ctx.admin, {**user_payload(user), 'password': 'senha-segura-123'})
+
+
+# Every route of the API, 'METHOD /path' as in route_keys() -> the request to measure
+CALLS: Dict[str, Callable[[BenchmarkContext], Call]] = {
+    'POST /create': lambda ctx: Call('/create', None, {
+        'nome': f'Cadastro {ctx.unique()}', 'email': f'cadastro{ctx.unique()}@example.com',
+        'password': 'senha-segura-123', 'idade': 25, 'genero': 'F', 'telefone': '11999999999', 'deficiencia': False,
+    }),
+    'GET /search/users': lambda ctx: Call('/search/users?q=Python', ctx.admin),
+    'POST /send-email': lambda ctx: Call('/send-email?curso=Computação&deficiencia=true', ctx.admin,
+                                         {'subject': 'Vagas', 'message': 'Novas vagas abertas.'}),
+    'GET /send-email/{int:job_id}': lambda ctx: Call(
+        f'/send-email/{EmailJob.objects.create(subject="Vagas", message="Novas vagas.").pk}', ctx.admin
+    ),
+
+    'GET /auth/me': lambda ctx: Call('/auth/me', ctx.reader),
+    'POST /auth/verify': lambda ctx: Call('/auth/verify', ctx.reader,
+                                          {'token': ctx.headers(ctx.reader)['HTTP_AUTHORIZATION'][7:]}),
+    'POST /auth/refresh': lambda ctx: Call('/auth/refresh', None,
+                                           {'refresh': str(ClaimsRefreshToken.for_user(ctx.reader))}),
+    'POST /auth/password/change': password_change,
+    'POST /auth/password/reset/request': lambda ctx: Call('/auth/password/reset/request', None,
+                                                          {'email': ctx.reader.email}),
+    'POST /auth/password/reset/confirm': password_reset_confirm,
+    'POST /auth/login': lambda ctx: Call('/auth/login', None,
+                                         {'username': ctx.reader.email, 'password': SEED_PASSWORD}),
+    'POST /auth/logout': lambda ctx: Call('/auth/logout', ctx.reader),
+
+    'POST /admin/users/': lambda ctx: Call('/admin/users/', ctx.admin, {
+        **user_payload(ctx.reader), 'nome': f'Admin cadastro {ctx.unique()}',
+        'email': f'admin-cadastro{ctx.unique()}@example.com', 'password': 'senha-segura-123',
+    }),
+    'GET /admin/users/': lambda ctx: Call('/admin/users/', ctx.admin),
+    'GET /admin/timings': lambda ctx: Call('/admin/timings', ctx.admin),
+    'GET /admin/stats/{dimension}': lambda ctx: Call('/admin/stats/habilidades', ctx.admin),
+    'POST /admin/users/import': lambda ctx: Call('/admin/users/import', ctx.admin, {
+        'file': SimpleUploadedFile('perfis.jsonl', import_file(ctx.unique())),
+    }, 'multipart'),
+    # Setting the password revokes the user's tokens
+    'PUT /admin/users/{int:id}': lambda ctx: admin_update(ctx, ctx.new_user()),
+    'PATCH /admin/users/{int:id}': lambda ctx: Call(f'/admin/users/{ctx.writer.pk}', ctx.admin,
+                                                    {'resumo': f'Atualizado {ctx.unique()}'}),
+    'DELETE /admin/users/{int:id}': lambda ctx: Call(f'/admin/users/{ctx.new_user().pk}', ctx.admin),
+    'GET /admin/users/{int:id}': lambda ctx: Call(f'/admin/users/{ctx.reader.pk}', ctx.admin),
+    'POST /admin/users/superuser': lambda ctx: Call('/admin/users/superuser', ctx.admin, {
+        **user_payload(ctx.reader), 'nome': f'Super {ctx.unique()}', 'email': f'super{ctx.unique()}@example.com',
+        'password': 'senha-segura-123',
+    }),
+    'POST /admin/users/{int:user_id}/interesses': lambda ctx: Call(f'/admin/users/{ctx.writer.pk}/interesses',
+                                                                   ctx.admin, {'nome': INTERESSES[1]}),
+    'GET /admin/users/{int:user_id}/interesses': lambda ctx: Call(f'/admin/users/{ctx.reader.pk}/interesses',
+                                                                  ctx.admin),
+    'POST /admin/users/{int:user_id}/interesses/bulk': lambda ctx: Call(
+        f'/admin/users/{ctx.writer.pk}/interesses/bulk', ctx.admin, [{'nome': nome} for nome in INTERESSES[:5]]
+    ),
+    # The most popular interest, with its subscribers
+    'GET /admin/users/interesses/{int:interesse_id}': lambda ctx: Call(f'/admin/users/interesses/{ctx.interesse.pk}',
+                                                                       ctx.admin),
+    'GET /admin/users/interesses/{int:interesse_id}/users': lambda ctx: Call(
+        f'/admin/users/interesses/{ctx.interesse.pk}/users', ctx.admin
+    ),
+    'PUT /admin/users/interesses/{int:interesse_id}': lambda ctx: Call(
+        f'/admin/users/interesses/{ctx.new_interesse().pk}', ctx.admin, {'nome': f'Renomeado {ctx.unique()}'}
+    ),
+    'DELETE /admin/users/interesses/{int:interesse_id}': lambda ctx: Call(
+        f'/admin/users/interesses/{ctx.new_interesse().pk}', ctx.admin
+    ),
+    'DELETE /admin/users/{int:user_id}/interesses/{int:interesse_id}': lambda ctx: Call(
+        f'/admin/users/{ctx.writer.pk}/interesses/{ctx.new_interesse().pk}', ctx.admin
+    ),
+
+    'GET /me': lambda ctx: Call('/me', ctx.reader),
+    'PUT /me': lambda ctx: Call('/me', ctx.writer, user_payload(ctx.writer)),
+    'DELETE /me': lambda ctx: Call('/me', ctx.new_user()),
+    'PUT /me/profile': lambda ctx: Call('/me/profile', ctx.writer, ctx.profile_payload()),
+    'POST /me/avatar': lambda ctx: Call('/me/avatar', ctx.writer, {
+        'file': SimpleUploadedFile('avatar.jpg', ctx.avatar, content_type='image/jpeg'),
+    }, 'multipart'),
+    'DELETE /me/avatar': lambda ctx: Call('/me/avatar', ctx.writer),
+    'GET /me/interesses': lambda ctx: Call('/me/interesses', ctx.reader),
+    'POST /me/interesses': lambda ctx: Call('/me/interesses', ctx.writer, {'nome': INTERESSES[2]}),
+    'POST /me/interesses/bulk': lambda ctx: Call('/me/interesses/bulk', ctx.writer,
+                                                 [{'nome': nome} for nome in INTERESSES[:5]]),
+    'DELETE /me/interesses/{int:interesse_id}': lambda ctx: Call(f'/me/interesses/{ctx.new_interesse().pk}',
+                                                                 ctx.writer),
+    **item_calls(),
+}
+
+
+def percentile(values: list, percent: int) -> float:
+    return statistics.quantiles(values, n=100)[percent - 1] if len(values) > 1 else values[0]
+
+
+class QueryCounter:
+    # connection.execute_wrapper callback, cheaper than CaptureQueriesContext which keeps the SQL
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def send(ctx: BenchmarkContext, method: str, call: Call):
+    kwargs = ctx.headers(call.user)
+    if call.format == 'json':
+        kwargs['content_type'] = 'application/json'
+    data = call.data if call.data is not None or method != 'GET' else None
+    return getattr(ctx.client, method.lower())(API_PREFIX + call.path, data, **kwargs)
+
+
+def measure(ctx: BenchmarkContext, key: str, repeat: int) -> dict:
+    """Median and p95 latency, query count and peak traced memory of `repeat` requests to the route `key`."""
+    method = key.split(' ', 1)[0]
+    timings, queries, statuses = [], 0, set()
+    # The first request warms up the caches of the route (schemas, snapshots, compiled queries)
+    for number in range(repeat + 1):
+        call = CALLS[key](ctx)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            response = send(ctx, method, call)
+            elapsed = time.perf_counter() - start
+        statuses.add(response.status_code)
+        if number:
+            timings.append(elapsed)
+            queries = max(queries, counter.count)
+
+    # Traced apart, tracemalloc slows down every allocation
+    call = CALLS[key](ctx)
+    tracemalloc.start()
+    try:
+        send(ctx, method, call)
+        memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'queries': queries,
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'memory_kib': round(memory / 1024, 1),
+        'errors': sorted(status for status in statuses if status >= 400),
+    }
+
+
+def run_benchmarks(repeat: int = 20, only: Optional[List[str]] = None) -> Dict[str, dict]:
+    """Measures the routes of CALLS, the ones starting with a prefix of `only` when given, on the seeded data."""
+    ctx = BenchmarkContext()
+    results = {}
+    for key in CALLS:
+        if only and not any(key.split(' ', 1)[1].startswith(prefix) for prefix in only):
+            continue
+        results[key] = measure(ctx, key, max(repeat, 1))
+    return results
+
+
+def compare(baseline: Dict[str, dict], results: Dict[str, dict], threshold: float, min_ms: float = 1.0,
+            min_kib: float = 64) -> List[str]:
+    """
+    Regressions of `results` against `baseline`, as messages.
+
+    Any extra query is a regression. Latency and memory regress above `threshold` (0.2 for 20%) of the baseline
+    and above `min_ms`/`min_kib`, so the noise of fast routes isn't reported.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result['errors'] and not base['errors']:
+            regressions.append(f'{key}: respostas com erro {result["errors"]}')
+        if result['queries'] > base['queries']:
+            regressions.append(f'{key}: {base["queries"]} -> {result["queries"]} queries')
+        for field, unit, floor in (('p95_ms', 'ms', min_ms), ('memory_kib', 'KiB', min_kib)):
+            if result[field] > base[field] * (1 + threshold) and result[field] - base[field] > floor:
+                regressions.append(f'{key}: {field} {base[field]} -> {result[field]} {unit}')
+    return regressions
+
+
+def schema_profiles(user_ids: List[int]) -> List[dict]:
+    # What the routes with response=UserSchema do: prefetched instances validated by the schema
+    return [UserSchema.from_orm(user).model_dump() for user in profile_queryset().filter(pk__in=user_ids)]
+
+
+# Ways to load and serialize a list of profiles, the first one is the default of the routes
+PROFILE_SERIALIZERS: Dict[str, Callable[[List[int]], bytes]] = {
+    'schema + json': lambda user_ids: json.dumps(schema_profiles(user_ids), cls=NinjaJSONEncoder).encode(),
+    'schema + orjson': lambda user_ids: dumps(schema_profiles(user_ids)),
+    'values + orjson': lambda user_ids: dumps(list(profile_values(user_ids).values())),
+}
+
+
+def run_serialization_benchmark(user_ids: List[int], repeat: int = 5) -> Dict[str, dict]:
+    """Best and median time, throughput and speedup over the first of each PROFILE_SERIALIZERS, queries included."""
+    results = {}
+    for name, serialize in PROFILE_SERIALIZERS.items():
+        # The first run warms up the schemas and the compiled queries
+        serialize(user_ids)
+        timings = []
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            serialize(user_ids)
+            timings.append(time.perf_counter() - start)
+        results[name] = {
+            'best_ms': round(min(timings) * 1000, 2),
+            'median_ms': round(statistics.median(timings) * 1000, 2),
+            'profiles_per_s': round(len(user_ids) / min(timings)),
+        }
+    default = next(iter(results.values()))['best_ms']
+    for result in results.values():
+        result['speedup'] = round(default / result['best_ms'], 2) if result['best_ms'] else None
+    return results
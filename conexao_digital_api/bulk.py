@@ -0,0 +1,146 @@
+from typing import List
+
+from django.db import models, transaction
+from ninja import Schema
+from ninja_extra.exceptions import NotFound, ParseError
+
+from .models import User, Interesse
+from .schemas import UpdateProfileSchema
+from .services import PROFILE_RELATIONS
+from .signals import MEMBER_FIELDS, defer_profile_changes, interest_members_changed, profile_changed
+
+
+def item_fields(model) -> List[str]:
+    # The columns the bulk schemas write, everything but the pk and the owner
+    return [field.attname for field in model._meta.concrete_fields if not field.primary_key and field.name != 'user']
+
+
+def save_profile_items(user: User, model, items: List[Schema], replace: bool = False) -> List[models.Model]:
+    """
+    Writes a batch of profile items of `user` in one transaction, returning them in the order received.
+
+    Items with `id` update that row when a value changed, the others are created. With `replace` the batch is the
+    whole collection: rows left out are deleted and items without `id` equal to a row left out keep that row.
+    """
+    ids = [item.id for item in items if item.id is not None]
+    if len(ids) != len(set(ids)):
+        raise ParseError('Itens com id repetido.')
+
+    fields = item_fields(model)
+    with defer_profile_changes(), transaction.atomic():
+        existing = {}
+        if replace or ids:
+            existing = {obj.pk: obj for obj in model.objects.filter(user=user)}
+        unknown = set(ids) - existing.keys()
+        if unknown:
+            raise NotFound(f'Itens não encontrados: {sorted(unknown)}.')
+
+        kept_ids = set(ids)
+        unclaimed = {}
+        if replace:
+            for pk, obj in existing.items():
+                if pk not in kept_ids:
+                    unclaimed.setdefault(tuple(getattr(obj, field) for field in fields), []).append(obj)
+
+        result, to_create, to_update, updated_fields = [], [], [], set()
+        for item in items:
+            # Fields left out keep their value, or the model default on new rows
+            data = item.dict(exclude={'id'}, exclude_unset=True)
+            if item.id is not None:
+                obj = existing[item.id]
+                changed = [field for field, value in data.items() if getattr(obj, field) != value]
+                if changed:
+                    for field in changed:
+                        setattr(obj, field, data[field])
+                    to_update.append(obj)
+                    updated_fields.update(changed)
+            else:
+                obj = model(user=user, **data)
+                if matches := unclaimed.get(tuple(getattr(obj, field) for field in fields)):
+                    obj = matches.pop()
+                    kept_ids.add(obj.pk)
+                else:
+                    to_create.append(obj)
+            obj.user = user
+            result.append(obj)
+
+        model.objects.bulk_create(to_create)
+        if to_update:
+            model.objects.bulk_update(to_update, sorted(updated_fields))
+        stale_ids = existing.keys() - kept_ids if replace else set()
+        if stale_ids:
+            model.objects.filter(pk__in=stale_ids).delete()
+
+        # bulk_create and bulk_update send no signals
+        if to_create or to_update or stale_ids:
+            profile_changed(user.pk)
+    return result
+
+
+def attach_interesses(user: User, nomes: List[str]) -> List[Interesse]:
+    """
+    Links `user` to the interests named `nomes`, creating the missing ones, in three queries for any batch size.
+    The interests are returned in the order of `nomes`, without the repeated names.
+
+    Both inserts ignore conflicts, so concurrent requests attaching the same names neither fail on the unique
+    `nome` nor link twice.
+    """
+    nomes = list(dict.fromkeys(nomes))
+    if not nomes:
+        return []
+
+    through = Interesse.users.through
+    with defer_profile_changes(), transaction.atomic():
+        Interesse.objects.bulk_create([Interesse(nome=nome) for nome in nomes], ignore_conflicts=True)
+        # The pks aren't returned for ignored conflicts, the rows may also come from another request
+        by_nome = {interesse.nome: interesse for interesse in Interesse.objects.filter(nome__in=nomes)}
+        interesses = [by_nome[nome] for nome in nomes]
+        through.objects.bulk_create([through(user=user, interesse=interesse) for interesse in interesses],
+                                    ignore_conflicts=True)
+        # The through rows are written directly, without m2m_changed
+        profile_changed(user.pk)
+        interest_members_changed()
+    return interesses
+
+
+def set_interesses(user: User, nomes: List[str]):
+    # Links the user to exactly these interests by name
+    wanted = set(nomes)
+    with defer_profile_changes(), transaction.atomic():
+        current = dict(user.interesses.values_list('nome', 'id'))
+        removed = [pk for nome, pk in current.items() if nome not in wanted]
+        if removed:
+            Interesse.users.through.objects.filter(user=user, interesse_id__in=removed).delete()
+            profile_changed(user.pk)
+            interest_members_changed()
+        attach_interesses(user, [nome for nome in nomes if nome not in current])
+
+
+def save_profile(user: User, payload: UpdateProfileSchema) -> User:
+    """
+    Applies a full profile document to `user` in one transaction, writing only what differs from the database.
+
+    The number of queries depends on which collections changed, not on their size.
+    """
+    relations = {related_name: model for related_name, model, *_ in PROFILE_RELATIONS}
+    with defer_profile_changes(), transaction.atomic():
+        changed = {attr: value for attr, value in payload.dict(exclude=relations.keys()).items()
+                   if getattr(user, attr) != value}
+        if changed:
+            # Through update() so the signals don't rebuild the profile before the relations are saved
+            User.objects.filter(pk=user.pk).update(**changed)
+            for attr, value in changed.items():
+                setattr(user, attr, value)
+            profile_changed(user.pk)
+            if changed.keys() & set(MEMBER_FIELDS):
+                interest_members_changed()
+
+        for related_name, model in relations.items():
+            items = getattr(payload, related_name)
+            if items is None:
+                continue
+            if model is Interesse:
+                set_interesses(user, [item.nome for item in items])
+            else:
+                save_profile_items(user, model, items, replace=True)
+    return user
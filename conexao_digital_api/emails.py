@@ -0,0 +1,215 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, connection as db_connection, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .models import User, EmailJob, EmailBatch
+from .utils import batched
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.EMAIL_DISPATCH_WORKERS,
+                                       thread_name_prefix='email-dispatch')
+    return _executor
+
+
+class RateLimiter:
+    """Token bucket shared by the worker threads, `per_minute=0` disables it."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: int):
+        if not self.per_minute:
+            return
+        # More than the bucket holds is taken a bucketful at a time
+        while amount > self.per_minute:
+            self.take(self.per_minute)
+            amount -= self.per_minute
+        self.take(amount)
+
+    def take(self, amount: int):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.per_minute, self.tokens + (now - self.updated) * self.per_minute / 60)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) * 60 / self.per_minute
+            time.sleep(wait)
+
+
+def send_bulk_email(subject: str, message: str, filters: Optional[dict] = None, user_ids: Optional[list] = None,
+                    extra_emails: Iterable[str] = ()) -> EmailJob:
+    # Only records the job, the recipients are resolved and sent by the queue workers
+    job = EmailJob.objects.create(subject=subject, message=message, filters=filters, user_ids=user_ids,
+                                  extra_emails=list(extra_emails))
+    if settings.EMAIL_DISPATCH_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(process_queue))
+    return job
+
+
+def get_recipients_queryset(job: EmailJob):
+    # Imported here since schemas imports the models module
+    from .schemas import FilterEmailSchema
+
+    if job.user_ids is not None:
+        return User.objects.filter(pk__in=job.user_ids)
+    if job.filters is not None:
+        filters = FilterEmailSchema(**job.filters)
+        return User.objects.filter(filters.get_filter_expression(), is_superuser=False, is_staff=False)
+    return None
+
+
+def iter_recipients(queryset=None, extra_emails: Iterable[str] = ()) -> Iterator[str]:
+    # Streams the emails without loading the whole queryset, skipping duplicates
+    seen = set()
+    sources = [extra_emails]
+    if queryset is not None:
+        emails = queryset.order_by().values_list('email', flat=True)
+        sources.insert(0, emails.iterator(chunk_size=settings.EMAIL_DISPATCH_CHUNK_SIZE))
+    for source in sources:
+        for email in source:
+            key = email.strip().lower()
+            if key and key not in seen:
+                seen.add(key)
+                yield email.strip()
+
+
+def claim(queryset, limit: int) -> list:
+    """
+    Marks up to `limit` rows of `queryset` as running and returns their ids.
+
+    Uses SELECT ... FOR UPDATE SKIP LOCKED where the database supports it, the conditional
+    UPDATE keeps the claim exclusive on the others (e.g. SQLite).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = queryset
+        if db_connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('pk', flat=True)[:limit])
+        claimed = []
+        for pk in ids:
+            if queryset.filter(pk=pk).update(status='running', locked_at=now):
+                claimed.append(pk)
+    return claimed
+
+
+def stale_before():
+    return timezone.now() - timedelta(seconds=settings.EMAIL_QUEUE_LOCK_TIMEOUT)
+
+
+def expand_job(job: EmailJob):
+    # Splits the job recipients into batches, atomically so a crash leaves the job pending
+    queryset = get_recipients_queryset(job)
+    now = timezone.now()
+    total = 0
+    with transaction.atomic():
+        batches = (EmailBatch(job=job, recipients=recipients, run_after=now)
+                   for recipients in batched(iter_recipients(queryset, job.extra_emails),
+                                             settings.EMAIL_DISPATCH_BATCH_SIZE))
+        for chunk in batched(batches, 500):
+            EmailBatch.objects.bulk_create(chunk)
+            total += sum(len(batch.recipients) for batch in chunk)
+        EmailJob.objects.filter(pk=job.pk).update(recipients=total, locked_at=None)
+    finish_job(job.pk)
+
+
+def finish_job(job_id: int):
+    pending = EmailBatch.objects.filter(job_id=job_id, status__in=['pending', 'running'])
+    if not pending.exists():
+        status = Case(When(failed=0, then=Value('finished')), When(sent=0, then=Value('failed')),
+                      default=Value('partial'))
+        EmailJob.objects.filter(pk=job_id, status='running').update(status=status, finished_at=timezone.now())
+
+
+def build_messages(job: EmailJob, recipients: List[str], connection) -> List[EmailMessage]:
+    from_email = settings.DEFAULT_FROM_EMAIL
+    if settings.EMAIL_DISPATCH_MODE == 'bcc':
+        return [EmailMessage(job.subject, job.message, from_email, bcc=recipients, connection=connection)]
+    return [EmailMessage(job.subject, job.message, from_email, [email], connection=connection)
+            for email in recipients]
+
+
+def send_batch(batch: EmailBatch, connection, rate_limiter: RateLimiter):
+    messages = build_messages(batch.job, batch.recipients, connection)
+    # Per recipient, a bcc message counts as many sends for the provider's limits
+    rate_limiter.acquire(len(batch.recipients))
+    try:
+        # No-op while the connection is still open from the previous batch
+        connection.open()
+        connection.send_messages(messages)
+    except Exception as exc:
+        logger.exception('Falha ao enviar lote %s do job %s', batch.pk, batch.job_id)
+        # The connection may be broken, it is reopened on the next batch
+        connection.close()
+        attempts = batch.attempts + 1
+        if attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+            EmailBatch.objects.filter(pk=batch.pk).update(status='failed', attempts=attempts, error=str(exc))
+            EmailJob.objects.filter(pk=batch.job_id).update(failed=F('failed') + len(batch.recipients),
+                                                             error=str(exc))
+        else:
+            delay = settings.EMAIL_QUEUE_BACKOFF_SECONDS * 2 ** (attempts - 1)
+            EmailBatch.objects.filter(pk=batch.pk).update(
+                status='pending', attempts=attempts, error=str(exc), locked_at=None,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+    else:
+        EmailBatch.objects.filter(pk=batch.pk).update(status='sent', attempts=batch.attempts + 1, locked_at=None)
+        EmailJob.objects.filter(pk=batch.job_id).update(sent=F('sent') + len(batch.recipients))
+    finish_job(batch.job_id)
+
+
+def claim_jobs(limit: int = 1) -> list:
+    queryset = EmailJob.objects.filter(
+        Q(status='pending') | Q(status='running', locked_at__lt=stale_before())
+    ).order_by('created_at')
+    return claim(queryset, limit)
+
+
+def claim_batches(limit: int = 1) -> list:
+    queryset = EmailBatch.objects.filter(
+        Q(status='pending', run_after__lte=timezone.now()) | Q(status='running', locked_at__lt=stale_before())
+    ).order_by('run_after')
+    return claim(queryset, limit)
+
+
+def process_queue(rate_limiter: Optional[RateLimiter] = None) -> int:
+    """Works until no job or batch is due, returns the number of batches processed."""
+    rate_limiter = rate_limiter or RateLimiter(settings.EMAIL_RATE_LIMIT_PER_MINUTE)
+    connection = get_connection()
+    processed = 0
+    try:
+        while True:
+            for job in EmailJob.objects.filter(pk__in=claim_jobs()):
+                expand_job(job)
+            batch_ids = claim_batches()
+            if not batch_ids:
+                break
+            for batch in EmailBatch.objects.select_related('job').filter(pk__in=batch_ids):
+                send_batch(batch, connection, rate_limiter)
+                processed += 1
+    finally:
+        connection.close()
+        close_old_connections()
+    return processed
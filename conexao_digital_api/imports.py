@@ -0,0 +1,234 @@
+import codecs
+import csv
+import multiprocessing
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import django
+import orjson
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError as ModelValidationError
+from django.db import IntegrityError, transaction
+from ninja_extra.exceptions import ParseError
+from pydantic import ValidationError
+
+from .models import User, Interesse, Habilidade, FormacaoAcademica, ExperienciaProfissional, Projeto
+from .passwords import get_executor as get_hashing_executor
+from .response_cache import GLOBAL_SCOPE, PROFILES_SCOPE, bump_version
+from .schemas import ImportProfileSchema
+from .search import update_search_documents
+from .snapshots import rebuild_snapshots
+from .stats import update_user_stats
+from .utils import batched
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+ITEM_MODELS = {
+    'habilidades': Habilidade,
+    'formacoes_academicas': FormacaoAcademica,
+    'experiencias_profissionais': ExperienciaProfissional,
+    'projetos': Projeto,
+}
+# The CSV columns of these hold JSON arrays, in the shape of the JSONL rows
+LIST_FIELDS = ('interesses', *ITEM_MODELS)
+
+
+class ImportRow(NamedTuple):
+    line: int
+    password: str
+    user: User
+    interesses: List[str]
+    items: Dict[str, list]
+
+
+def import_format(filename: str) -> str:
+    extension = filename.rsplit('.', 1)[-1].lower()
+    return 'jsonl' if extension == 'ndjson' else extension
+
+
+def read_csv(lines: Iterable[bytes]) -> Iterator[Tuple[int, dict, List[str]]]:
+    reader = csv.DictReader(codecs.iterdecode(lines, 'utf-8-sig'))
+    for row in reader:
+        if None in row:
+            yield reader.line_num, {}, ['Mais valores que colunas.']
+            continue
+        # Empty cells are left out, the fields get their default
+        data = {key: value for key, value in row.items() if value not in ('', None)}
+        messages = []
+        for field in LIST_FIELDS:
+            if field in data:
+                try:
+                    data[field] = orjson.loads(data[field])
+                except orjson.JSONDecodeError:
+                    messages.append(f'{field}: JSON inválido.')
+        yield reader.line_num, data, messages
+
+
+def read_jsonl(lines: Iterable[bytes]) -> Iterator[Tuple[int, dict, List[str]]]:
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield number, {}, ['JSON inválido.']
+            continue
+        yield number, data, [] if isinstance(data, dict) else ['A linha não é um objeto JSON.']
+
+
+def read_rows(lines: Iterable[bytes], format: str) -> Iterator[Tuple[int, dict, List[str]]]:
+    """The line, data and parsing errors of each row of a CSV or JSONL file, read one line at a time."""
+    if format not in IMPORT_FORMATS:
+        raise ParseError(f'Formato desconhecido: {format}, use {" ou ".join(IMPORT_FORMATS)}.')
+    rows = read_csv(lines) if format == 'csv' else read_jsonl(lines)
+    try:
+        yield from rows
+    except UnicodeDecodeError:
+        raise ParseError('O arquivo não está em UTF-8.')
+
+
+def field_errors(obj, prefix: str, exclude: List[str]) -> List[str]:
+    # The model's own validators, the schemas only check types and lengths
+    try:
+        obj.clean_fields(exclude=exclude)
+    except ModelValidationError as exc:
+        return [f'{prefix}{field}: {message}' for field, messages in exc.message_dict.items() for message in messages]
+    return []
+
+
+def build_row(line: int, data: dict) -> Tuple[Optional[ImportRow], List[str]]:
+    """Validates a row with ImportProfileSchema and the model fields, returns its unsaved objects or its errors."""
+    try:
+        profile = ImportProfileSchema.model_validate(data)
+    except ValidationError as exc:
+        return None, [f'{".".join(map(str, error["loc"]))}: {error["msg"]}' for error in exc.errors()]
+
+    fields = profile.dict(exclude=set(LIST_FIELDS))
+    password = fields.pop('password')
+    # Like create_user
+    fields['email'] = User.objects.normalize_email(fields['email'])
+    user = User(**fields)
+    messages = field_errors(user, '', ['password'])
+
+    interesses = list(dict.fromkeys(item.nome for item in profile.interesses))
+    for index, nome in enumerate(interesses):
+        messages += field_errors(Interesse(nome=nome), f'interesses.{index}.', [])
+    items = {}
+    for related_name, model in ITEM_MODELS.items():
+        items[related_name] = [model(**item.dict()) for item in getattr(profile, related_name)]
+        for index, obj in enumerate(items[related_name]):
+            messages += field_errors(obj, f'{related_name}.{index}.', ['user'])
+    if messages:
+        return None, messages
+    return ImportRow(line, password, user, interesses, items), []
+
+
+def write_chunk(rows: List[ImportRow], pool, errors: List[dict]) -> List[int]:
+    """Creates the users of `rows` and their relations in one transaction, returns their ids."""
+    # The emails and nomes taken by the users already in the database
+    taken_emails = set(User.objects.filter(email__in=[row.user.email for row in rows])
+                       .values_list('email', flat=True))
+    taken_nomes = set(User.objects.filter(nome__in=[row.user.nome for row in rows]).values_list('nome', flat=True))
+    valid = []
+    for row in rows:
+        messages = []
+        if row.user.email in taken_emails:
+            messages.append('email: Já existe um usuário com este email.')
+        if row.user.nome in taken_nomes:
+            messages.append('nome: Já existe um usuário com este nome.')
+        if messages:
+            errors.append({'line': row.line, 'messages': messages})
+        else:
+            valid.append(row)
+    if not valid:
+        return []
+
+    passwords = [row.password for row in valid]
+    if pool:
+        hashes = pool.map(make_password, passwords)
+    else:
+        # The threads hashing the passwords of the logins, a slice at a time so the logins queued meanwhile run
+        # before the next one instead of after the whole chunk
+        hashes, executor = [], get_hashing_executor()
+        for passwords_slice in batched(passwords, settings.PASSWORD_HASHING_WORKERS):
+            hashes += executor.map(make_password, passwords_slice)
+    for row, password in zip(valid, hashes):
+        row.user.password = password
+
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create([row.user for row in valid])
+            for row, user in zip(valid, users):
+                for items in row.items.values():
+                    for obj in items:
+                        obj.user = user
+            for related_name, model in ITEM_MODELS.items():
+                model.objects.bulk_create([obj for row in valid for obj in row.items[related_name]])
+
+            nomes = {nome for row in valid for nome in row.interesses}
+            Interesse.objects.bulk_create([Interesse(nome=nome) for nome in nomes], ignore_conflicts=True)
+            interesse_ids = dict(Interesse.objects.filter(nome__in=nomes).values_list('nome', 'id'))
+            through = Interesse.users.through
+            through.objects.bulk_create([through(user_id=user.pk, interesse_id=interesse_ids[nome])
+                                         for row, user in zip(valid, users) for nome in row.interesses])
+
+            # bulk_create sends no signals
+            user_ids = [user.pk for user in users]
+            update_search_documents(user_ids)
+            rebuild_snapshots(user_ids)
+            update_user_stats(user_ids)
+    except IntegrityError:
+        # A user with the same email or nome created meanwhile, the whole chunk is rolled back
+        errors.extend({'line': row.line, 'messages': ['Conflito com um usuário criado durante a importação.']}
+                      for row in valid)
+        return []
+    return user_ids
+
+
+def import_profiles(lines: Iterable[bytes], format: str, chunk_size: int = 500, workers: int = 1,
+                    on_chunk: Optional[Callable[[int], None]] = None) -> dict:
+    """
+    Creates the users of a CSV or JSONL file with their interests and items, `chunk_size` valid rows per transaction.
+
+    The file is read one line at a time. Each row is validated on its own and the invalid ones are left out of the
+    import, reported with their line. With `workers` > 1 the passwords are hashed on that many processes, else on the
+    PASSWORD_HASHING_WORKERS threads.
+    """
+    created, errors = 0, []
+    seen_emails, seen_nomes = set(), set()
+
+    def valid_rows() -> Iterator[ImportRow]:
+        for line, data, messages in read_rows(lines, format):
+            row = None
+            if not messages:
+                row, messages = build_row(line, data)
+            if row:
+                if row.user.email in seen_emails:
+                    messages.append('email: Repetido no arquivo.')
+                if row.user.nome in seen_nomes:
+                    messages.append('nome: Repetido no arquivo.')
+                seen_emails.add(row.user.email)
+                seen_nomes.add(row.user.nome)
+            if messages:
+                errors.append({'line': line, 'messages': messages})
+            else:
+                yield row
+
+    pool = None
+    if workers > 1:
+        # django.setup for the spawned processes, the models module is imported by this one
+        pool = multiprocessing.Pool(workers, initializer=django.setup)
+    try:
+        for chunk in batched(valid_rows(), chunk_size):
+            count = len(write_chunk(chunk, pool, errors))
+            created += count
+            if on_chunk:
+                on_chunk(count)
+    finally:
+        if pool:
+            pool.terminate()
+
+    if created:
+        # The lists spanning several users: the interest members and the search
+        bump_version(GLOBAL_SCOPE)
+        bump_version(PROFILES_SCOPE)
+    return {'created': created, 'errors': sorted(errors, key=lambda error: error['line'])}
@@ -0,0 +1,110 @@
+import json
+import logging
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from conexao_digital_api.benchmarks import compare, run_benchmarks
+from conexao_digital_api.models import User
+from conexao_digital_api.seeding import seed_profiles
+
+
+class Command(BaseCommand):
+    help = ('Mede queries, latência (p50/p95) e memória de todas as rotas da API sobre uma base de teste com dados '
+            'sintéticos, e compara com um baseline em JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Usuários gerados na base de teste.')
+        parser.add_argument('--seed', type=int, default=0, help='Semente dos dados gerados.')
+        parser.add_argument('--repeat', type=int, default=20, help='Requisições medidas por rota.')
+        parser.add_argument('--only', action='append', help='Mede só as rotas que começam com este caminho.')
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmark-baseline.json'),
+                            help='Arquivo JSON do baseline.')
+        parser.add_argument('--save', action='store_true', help='Grava o resultado como o novo baseline.')
+        parser.add_argument('--check', action='store_true',
+                            help='Falha quando alguma rota piora além de --threshold em relação ao baseline.')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Piora tolerada de latência e memória, 0.25 para 25%%.')
+        parser.add_argument('--cache', action='store_true', help='Mantém o cache de respostas ligado.')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Mantém a base de teste entre execuções, sem gerar os dados de novo.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['check']:
+            try:
+                with open(options['baseline']) as file:
+                    baseline = json.load(file)
+            except FileNotFoundError:
+                raise CommandError(f'Baseline {options["baseline"]} não encontrado, gere-o com --save.')
+
+        # The test database, the locmem email backend and the testserver host of the test runner
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False,
+                                                      keepdb=options['keepdb'])
+        try:
+            result = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.write_results(result['endpoints'], baseline['endpoints'] if baseline else {})
+        if options['save']:
+            with open(options['baseline'], 'w') as file:
+                json.dump(result, file, indent=2, ensure_ascii=False)
+                file.write('\n')
+            self.stdout.write(f'Baseline gravado em {options["baseline"]}.')
+
+        errors = [key for key, endpoint in result['endpoints'].items() if endpoint['errors']]
+        if errors:
+            self.stdout.write(f'Rotas com respostas de erro: {", ".join(errors)}')
+        if baseline:
+            if baseline['meta']['users'] != result['meta']['users']:
+                self.stdout.write(f'Aviso: baseline medido com {baseline["meta"]["users"]} usuários.')
+            regressions = compare(baseline['endpoints'], result['endpoints'], options['threshold'])
+            if regressions:
+                raise CommandError('Regressões de desempenho:\n' + '\n'.join(regressions))
+            self.stdout.write('Nenhuma regressão em relação ao baseline.')
+
+    def run(self, options) -> dict:
+        caches = settings.CACHES
+        if not options['cache']:
+            # Otherwise the repeated reads would measure the cache hits
+            caches = {**caches, settings.API_CACHE_ALIAS: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        # The queue workers would send the /send-email jobs in the background while other routes are measured
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(CACHES=caches, MEDIA_ROOT=media_root, EMAIL_DISPATCH_WORKERS=0):
+            if User.objects.filter(email__startswith='seed').count() < options['users']:
+                start = time.perf_counter()
+                seed_profiles(options['users'], seed=options['seed'])
+                self.stdout.write(f'{options["users"]} perfis gerados em {time.perf_counter() - start:.1f} s.')
+            # The request logs would be timed too, the errors are reported from the status codes
+            logging.disable(logging.CRITICAL)
+            try:
+                endpoints = run_benchmarks(options['repeat'], options['only'])
+            finally:
+                logging.disable(logging.NOTSET)
+
+        return {
+            'meta': {
+                'users': options['users'],
+                'seed': options['seed'],
+                'repeat': options['repeat'],
+                'vendor': connection.vendor,
+                'async_reads': settings.API_ASYNC_READS,
+                'cache': options['cache'],
+            },
+            'endpoints': endpoints,
+        }
+
+    def write_results(self, endpoints: dict, baseline: dict):
+        self.stdout.write(f'{"rota":<80} {"queries":>7} {"p50 ms":>8} {"p95 ms":>8} {"KiB":>8}')
+        for key, endpoint in endpoints.items():
+            base = baseline.get(key)
+            queries = f'{endpoint["queries"]}' + (f' ({base["queries"]})' if base else '')
+            self.stdout.write(f'{key:<80} {queries:>7} {endpoint["p50_ms"]:>8.2f} {endpoint["p95_ms"]:>8.2f} '
+                              f'{endpoint["memory_kib"]:>8.1f}')
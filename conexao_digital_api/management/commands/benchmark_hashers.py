@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand, CommandError
+
+# Candidate costs per hasher, from the weakest to the strongest (memory first for Argon2), and their settings
+CANDIDATES = {
+    'argon2': (
+        hashers.Argon2PasswordHasher,
+        [{'memory_cost': memory, 'time_cost': time_cost, 'parallelism': 1}
+         for memory in (19456, 47104, 65536, 102400) for time_cost in (1, 2, 3, 4)],
+        {'memory_cost': 'PASSWORD_ARGON2_MEMORY_COST', 'time_cost': 'PASSWORD_ARGON2_TIME_COST',
+         'parallelism': 'PASSWORD_ARGON2_PARALLELISM'},
+    ),
+    'bcrypt': (
+        hashers.BCryptSHA256PasswordHasher,
+        [{'rounds': rounds} for rounds in range(10, 15)],
+        {'rounds': 'PASSWORD_BCRYPT_ROUNDS'},
+    ),
+    'scrypt': (
+        hashers.ScryptPasswordHasher,
+        # maxmem as in passwords.ScryptPasswordHasher, OpenSSL refuses work factors above 2 ** 14 with its default
+        [{'work_factor': 2 ** exponent, 'maxmem': 256 * 2 ** exponent * 8} for exponent in range(14, 18)],
+        {'work_factor': 'PASSWORD_SCRYPT_WORK_FACTOR'},
+    ),
+}
+
+
+def measure(hasher_class, params: dict, samples: int) -> float:
+    # The plain Django hashers, without the pool, so only the hash itself is timed
+    hasher = type(hasher_class.__name__, (hasher_class,), dict(params))()
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.encode('senha-de-teste-123', hasher.salt())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Mede o custo dos hashers de senha nesta máquina e recomenda os parâmetros para um tempo alvo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=100, help='Tempo máximo de um hash, em ms.')
+        parser.add_argument('--samples', type=int, default=3, help='Hashes medidos por combinação.')
+        parser.add_argument('--hasher', choices=sorted(CANDIDATES), action='append',
+                            help='Hashers medidos, todos por padrão.')
+
+    def handle(self, *args, **options):
+        recommendations = {}
+        for name in options['hasher'] or sorted(CANDIDATES):
+            hasher_class, candidates, setting_names = CANDIDATES[name]
+            try:
+                hasher_class().encode('senha', hasher_class().salt())
+            except ValueError as e:
+                # The library isn't installed
+                self.stdout.write(f'{name}: indisponível ({e})')
+                continue
+
+            best = None
+            for params in candidates:
+                elapsed = measure(hasher_class, params, max(options['samples'], 1))
+                fits = elapsed <= options['target_ms']
+                self.stdout.write(f'{name:<7} {params!s:<62} {elapsed:>8.1f} ms{"" if fits else "  acima do alvo"}')
+                # The last one under the target is the strongest
+                if fits:
+                    best = (params, elapsed)
+                elif elapsed > 4 * options['target_ms']:
+                    break
+            if best:
+                recommendations[name] = best
+            else:
+                self.stdout.write(f'{name}: nenhuma combinação abaixo de {options["target_ms"]} ms')
+
+        if not recommendations:
+            raise CommandError('Nenhum hasher recomendado, aumente --target-ms.')
+
+        self.stdout.write('\nRecomendado (.env):')
+        for name, (params, elapsed) in recommendations.items():
+            setting_names = CANDIDATES[name][2]
+            settings_line = ' '.join(f'{setting_names[param]}={value}' for param, value in params.items()
+                                     if param in setting_names)
+            self.stdout.write(f'  {name} ({elapsed:.1f} ms): PASSWORD_HASHER={name} {settings_line}')
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from conexao_digital_api.benchmarks import run_serialization_benchmark
+from conexao_digital_api.models import User
+from conexao_digital_api.seeding import seed_profiles
+
+
+class Command(BaseCommand):
+    help = ('Compara a serialização de uma lista grande de perfis: validação pelo UserSchema com json ou orjson, e '
+            'os dicts montados com .values() com orjson. Roda sobre uma base de teste com dados sintéticos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Perfis da lista serializada.')
+        parser.add_argument('--seed', type=int, default=0, help='Semente dos dados gerados.')
+        parser.add_argument('--repeat', type=int, default=5, help='Execuções medidas de cada serialização.')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Mantém a base de teste entre execuções, sem gerar os dados de novo.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False,
+                                                      keepdb=options['keepdb'])
+        try:
+            seeded = User.objects.filter(email__startswith='seed').count()
+            if seeded < options['users']:
+                seed_profiles(options['users'] - seeded, seed=options['seed'], start=seeded, derived=False)
+            user_ids = list(User.objects.filter(email__startswith='seed').order_by('pk')
+                            .values_list('pk', flat=True)[:options['users']])
+            results = run_serialization_benchmark(user_ids, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.stdout.write(f'{len(user_ids)} perfis, melhor de {options["repeat"]} execuções')
+        self.stdout.write(f'{"serialização":<20} {"melhor ms":>10} {"mediana ms":>10} {"perfis/s":>10} {"ganho":>7}')
+        for name, result in results.items():
+            self.stdout.write(f'{name:<20} {result["best_ms"]:>10.1f} {result["median_ms"]:>10.1f} '
+                              f'{result["profiles_per_s"]:>10} {result["speedup"]:>6.2f}x')
@@ -0,0 +1,26 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from conexao_digital_api.views import SIDECARS, compressor
+
+
+class Command(BaseCommand):
+    help = 'Escreve as cópias .br e .gz dos arquivos de mídia compressíveis, servidas pela view de mídia.'
+
+    def handle(self, *args, **options):
+        written = 0
+        suffixes = tuple(suffix for _, suffix in SIDECARS)
+        for root, _, files in os.walk(settings.MEDIA_ROOT):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(suffixes) or not compressor.should_compress(name):
+                    continue
+                mtime = os.stat(path).st_mtime
+                # Sidecars keep the mtime of the file, older ones are stale
+                if any(os.path.exists(path + suffix) and os.stat(path + suffix).st_mtime >= mtime
+                       for suffix in suffixes):
+                    continue
+                written += len(list(compressor.compress(path)))
+        self.stdout.write(f'{written} arquivos comprimidos.')
@@ -0,0 +1,34 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from conexao_digital_api.emails import RateLimiter, process_queue
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de envio de emails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.EMAIL_WORKER_CONCURRENCY,
+                            help='Número de threads enviando lotes ao mesmo tempo.')
+        parser.add_argument('--poll-interval', type=float, default=settings.EMAIL_WORKER_POLL_INTERVAL,
+                            help='Segundos de espera quando a fila está vazia.')
+        parser.add_argument('--once', action='store_true', help='Esvazia a fila e termina.')
+
+    def handle(self, *args, **options):
+        # The rate limit is per process, shared by every thread
+        rate_limiter = RateLimiter(settings.EMAIL_RATE_LIMIT_PER_MINUTE)
+        concurrency = max(options['concurrency'], 1)
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='email-worker') as executor:
+            while True:
+                futures = [executor.submit(process_queue, rate_limiter) for _ in range(concurrency)]
+                processed = sum(future.result() for future in futures)
+                if processed:
+                    self.stdout.write(f'{processed} lotes processados.')
+                if options['once']:
+                    break
+                if not processed:
+                    time.sleep(options['poll_interval'])
@@ -0,0 +1,43 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from ninja_extra.exceptions import ParseError
+
+from conexao_digital_api.imports import IMPORT_FORMATS, import_format, import_profiles
+
+
+class Command(BaseCommand):
+    help = ('Importa perfis de um arquivo CSV ou JSONL, um usuário por linha com os campos de /create e as listas '
+            'interesses, habilidades, formacoes_academicas, experiencias_profissionais e projetos (no CSV, colunas '
+            'com arrays JSON). As linhas inválidas são puladas e listadas com seus erros.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo .csv ou .jsonl.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Formato do arquivo, por padrão pela extensão.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Usuários por lote e transação.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processos que calculam os hashes das senhas.')
+
+    def handle(self, *args, **options):
+        begin = time.perf_counter()
+        written = 0
+
+        def progress(count: int):
+            nonlocal written
+            written += count
+            self.stdout.write(f'\r{written} perfis importados', ending='')
+            self.stdout.flush()
+
+        try:
+            with open(options['path'], 'rb') as file:
+                report = import_profiles(file, options['format'] or import_format(options['path']),
+                                         chunk_size=max(options['chunk_size'], 1), workers=max(options['workers'], 1),
+                                         on_chunk=progress)
+        except (OSError, ParseError) as exc:
+            raise CommandError(getattr(exc, 'detail', exc))
+
+        for error in report['errors']:
+            self.stderr.write(f'linha {error["line"]}: {"; ".join(error["messages"])}')
+        self.stdout.write(f'\n{report["created"]} perfis importados, {len(report["errors"])} linhas com erro, em '
+                          f'{time.perf_counter() - begin:.1f} s.')
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from dj_ninja_auth.jwt.tokens import RefreshToken
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+
+from conexao_digital_api.models import User
+
+READ_PATHS = (
+    '/api/v1/me',
+    '/api/v1/me/interesses',
+    '/api/v1/me/habilidades',
+    '/api/v1/me/formacoes-academicas',
+    '/api/v1/me/experiencias-profissionais',
+    '/api/v1/me/projetos',
+)
+
+
+def percentile(values: list, percent: int) -> float:
+    return statistics.quantiles(values, n=100)[percent - 1] if len(values) > 1 else values[0]
+
+
+async def run_load(tokens: list, total: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        # One client per worker, AsyncClient serves the requests through the ASGI handler in this process
+        client = AsyncClient()
+        for i in counter:
+            headers = {'Authorization': f'Bearer {tokens[i % len(tokens)]}'}
+            start = time.perf_counter()
+            response = await client.get(READ_PATHS[i % len(READ_PATHS)], headers=headers)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'mode': 'async' if settings.API_ASYNC_READS else 'sync',
+        'requests': total,
+        'concurrency': concurrency,
+        'throughput': total / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'errors': errors,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mede a latência das leituras de /me sob concorrência, com um cliente ASGI no próprio processo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=600, help='Total de requisições.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requisições simultâneas.')
+        parser.add_argument('--users', type=int, default=20, help='Usuários existentes usados no teste.')
+        parser.add_argument('--cache', action='store_true', help='Mantém o cache de respostas ligado.')
+        parser.add_argument('--compare', action='store_true',
+                            help='Roda o teste com API_ASYNC_READS desligado e ligado e compara os resultados.')
+        parser.add_argument('--json', action='store_true', help='Escreve o resultado em JSON.')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(options)
+
+        users = list(User.objects.filter(is_staff=False, is_superuser=False, is_active=True)[:options['users']])
+        if not users:
+            raise CommandError('Nenhum usuário para o teste, crie perfis antes.')
+        tokens = [str(RefreshToken.for_user(user).access_token) for user in users]
+
+        caches = settings.CACHES
+        if not options['cache']:
+            # Otherwise every request after the first would be a cache hit, for both modes
+            caches = {**caches, settings.API_CACHE_ALIAS: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        # AsyncClient sends Host: testserver
+        with override_settings(CACHES=caches, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            result = asyncio.run(run_load(tokens, options['requests'], max(options['concurrency'], 1)))
+
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+        else:
+            self.write_results([result])
+
+    def compare(self, options):
+        arguments = ['--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+                     '--users', str(options['users']), '--json']
+        if options['cache']:
+            arguments.append('--cache')
+
+        results = []
+        for mode in ('False', 'True'):
+            # The mode is read on import, so each one runs in its own process
+            env = {**os.environ, 'API_ASYNC_READS': mode}
+            output = subprocess.run([sys.executable, '-m', 'django', 'loadtest_reads', *arguments], env=env,
+                                    capture_output=True, text=True)
+            if output.returncode:
+                raise CommandError(output.stderr)
+            results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+        self.write_results(results)
+        sync, async_ = results
+        self.stdout.write(f'p50 async/sync: {async_["p50_ms"] / sync["p50_ms"]:.2f}x, '
+                          f'vazão async/sync: {async_["throughput"] / sync["throughput"]:.2f}x')
+
+    def write_results(self, results: list):
+        self.stdout.write(f'{"modo":<6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"erros":>6}')
+        for result in results:
+            self.stdout.write(f'{result["mode"]:<6} {result["throughput"]:>8.1f} {result["p50_ms"]:>8.1f} '
+                              f'{result["p95_ms"]:>8.1f} {result["errors"]:>6}')
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from conexao_digital_api.utils import batched
+from conexao_digital_api.models import User
+from conexao_digital_api.snapshots import current_snapshots, rebuild_snapshots
+
+
+def rebuild_chunk(user_ids: list) -> int:
+    try:
+        rebuild_snapshots(user_ids)
+    finally:
+        # Each thread has its own connection
+        connection.close()
+    return len(user_ids)
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os snapshots de perfil de todos os usuários.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Usuários por lote.')
+        parser.add_argument('--workers', type=int, default=4, help='Lotes processados ao mesmo tempo.')
+        parser.add_argument('--stale', action='store_true',
+                            help='Só os snapshots ausentes ou de uma versão anterior do UserSchema.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by()
+        if options['stale']:
+            users = users.exclude(pk__in=current_snapshots().values('pk'))
+        user_ids = users.values_list('id', flat=True).iterator(chunk_size=options['chunk_size'])
+        chunks = batched(user_ids, options['chunk_size'])
+        total = 0
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                total = sum(executor.map(rebuild_chunk, chunks))
+        else:
+            for chunk in chunks:
+                rebuild_snapshots(chunk)
+                total += len(chunk)
+        self.stdout.write(f'{total} perfis reconstruídos.')
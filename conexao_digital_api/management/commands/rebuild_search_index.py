@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from conexao_digital_api.utils import batched
+from conexao_digital_api.models import User
+from conexao_digital_api.search import update_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os documentos da busca de talentos de todos os usuários.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Usuários por lote.')
+
+    def handle(self, *args, **options):
+        total = 0
+        user_ids = User.objects.order_by().values_list('id', flat=True).iterator(chunk_size=options['chunk_size'])
+        for chunk in batched(user_ids, options['chunk_size']):
+            with transaction.atomic():
+                update_search_documents(chunk)
+            total += len(chunk)
+        self.stdout.write(f'{total} documentos reconstruídos.')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from conexao_digital_api.stats import reconcile_stats
+
+
+class Command(BaseCommand):
+    help = ('Recalcula os contadores de /admin/stats a partir dos perfis e corrige os que divergirem. Para rodar '
+            'periodicamente e depois de escritas que não passam pelos sinais.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Usuários por lote.')
+
+    def handle(self, *args, **options):
+        wrong = reconcile_stats(max(options['chunk_size'], 1))
+        self.stdout.write(f'{wrong} contadores corrigidos.')
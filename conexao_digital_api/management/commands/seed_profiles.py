@@ -0,0 +1,54 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from conexao_digital_api.models import User
+from conexao_digital_api.seeding import seed_email, seed_profiles
+
+
+class Command(BaseCommand):
+    help = ('Gera perfis sintéticos e determinísticos (usuários, interesses, habilidades, formações, experiências e '
+            'projetos) para testes de carga. A senha de todos é "senha-segura-123".')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, required=True, help='Usuários gerados.')
+        parser.add_argument('--seed', type=int, default=0, help='Semente, a mesma semente gera os mesmos perfis.')
+        parser.add_argument('--start', type=int,
+                            help='Índice do primeiro usuário gerado, por padrão continua depois dos já gerados.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Usuários por lote e transação.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processos que geram os dados enquanto este grava.')
+        parser.add_argument('--no-derived', action='store_true',
+                            help='Não grava os documentos de busca, os snapshots nem as estatísticas, os passos mais '
+                                 'lentos (reconstrua-os depois com rebuild_search_index, rebuild_profiles e '
+                                 'reconcile_stats).')
+
+    def handle(self, *args, **options):
+        start = options['start']
+        if start is None:
+            # The generated users are seed<index>@example.com, created from index 0 on
+            start = User.objects.filter(email__regex=r'^seed[0-9]+@example\.com$').count()
+        elif User.objects.filter(email__in=[seed_email(start), seed_email(start + options['users'] - 1)]).exists():
+            raise CommandError(f'Já existem usuários gerados a partir do índice {start}.')
+
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                # Only for this connection, a crash can lose the last chunks but the database stays consistent
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        begin = time.perf_counter()
+        written = 0
+
+        def progress(count: int):
+            nonlocal written
+            written += count
+            elapsed = time.perf_counter() - begin
+            self.stdout.write(f'\r{written}/{options["users"]} perfis, {written / elapsed:.0f}/s', ending='')
+            self.stdout.flush()
+
+        seed_profiles(options['users'], seed=options['seed'], start=start, chunk_size=max(options['chunk_size'], 1),
+                      workers=max(options['workers'], 1), derived=not options['no_derived'], on_chunk=progress)
+        self.stdout.write(f'\n{options["users"]} perfis gerados (índices {start} a {start + options["users"] - 1}) '
+                          f'em {time.perf_counter() - begin:.1f} s.')
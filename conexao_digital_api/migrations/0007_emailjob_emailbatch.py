@@ -0,0 +1,57 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conexao_digital_api', '0006_rename_ano_nascimento_user_idade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('filters', models.JSONField(blank=True, null=True)),
+                ('user_ids', models.JSONField(blank=True, null=True)),
+                ('extra_emails', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Enviando'), ('finished', 'Finalizado')], default='pending', max_length=10)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('recipients', models.IntegerField(default=0)),
+                ('sent', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'envio de email',
+                'verbose_name_plural': 'envios de email',
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='EmailBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipients', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Enviando'), ('sent', 'Enviado'), ('failed', 'Falhou')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('run_after', models.DateTimeField()),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='conexao_digital_api.emailjob')),
+            ],
+            options={
+                'verbose_name': 'lote de emails',
+                'verbose_name_plural': 'lotes de emails',
+                'ordering': ('run_after',),
+                'indexes': [models.Index(fields=['status', 'run_after'], name='conexao_dig_status_64bf57_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:32
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX conexao_dig_usersearch_vector_gin ON conexao_digital_api_usersearchdocument USING GIN (vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute('CREATE VIRTUAL TABLE conexao_digital_api_usersearch_fts USING fts5(document)')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS conexao_dig_usersearch_vector_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS conexao_digital_api_usersearch_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conexao_digital_api', '0007_emailjob_emailbatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchDocument',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('document', models.TextField(blank=True, default='')),
+                ('vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+            ],
+            options={
+                'verbose_name': 'documento de busca',
+                'verbose_name_plural': 'documentos de busca',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conexao_digital_api', '0008_usersearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProfileSnapshot',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='profile_snapshot', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('data', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'snapshot de perfil',
+                'verbose_name_plural': 'snapshots de perfil',
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+# Columns filtered with icontains, which PostgreSQL runs as UPPER(column::text) LIKE UPPER('%...%')
+TRIGRAM_COLUMNS = (
+    ('conexao_digital_api_formacaoacademica', 'curso'),
+    ('conexao_digital_api_formacaoacademica', 'instituicao'),
+    ('conexao_digital_api_projeto', 'nome'),
+    ('conexao_digital_api_projeto', 'link'),
+    ('conexao_digital_api_user', 'nome'),
+)
+
+
+def trigram_index_name(table: str, column: str) -> str:
+    return f'{table.removeprefix("conexao_digital_api_")}_{column}_trgm'
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'CREATE INDEX {trigram_index_name(table, column)} ON {table} '
+                              f'USING GIN (UPPER({column}::text) gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {trigram_index_name(table, column)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('conexao_digital_api', '0010_user_profile_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='experienciaprofissional',
+            index=models.Index(fields=['user', 'cargo', 'id'], name='experiencia_user_cargo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='formacaoacademica',
+            index=models.Index(fields=['user', 'curso', 'id'], name='formacao_user_curso_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='formacaoacademica',
+            index=models.Index(fields=['semestre'], name='formacao_semestre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habilidade',
+            index=models.Index(fields=['user', 'nome', 'id'], name='habilidade_user_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habilidade',
+            index=models.Index(fields=['nome', 'nivel'], name='habilidade_nome_nivel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projeto',
+            index=models.Index(fields=['user', 'nome', 'id'], name='projeto_user_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_staff', False), ('is_superuser', False)), fields=['nome', 'id'], name='user_regular_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_staff', False), ('is_superuser', False)), fields=['idade'], name='user_regular_idade_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
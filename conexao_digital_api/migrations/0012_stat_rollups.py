@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conexao_digital_api', '0011_filter_and_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStatKeys',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('keys', models.JSONField(default=list)),
+                ('deficiencia', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'chaves de estatística do usuário',
+                'verbose_name_plural': 'chaves de estatística dos usuários',
+            },
+        ),
+        migrations.CreateModel(
+            name='StatRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=200)),
+                ('subkey', models.CharField(blank=True, default='', max_length=200)),
+                ('users', models.IntegerField(default=0)),
+                ('users_deficiencia', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'contador de estatística',
+                'verbose_name_plural': 'contadores de estatística',
+                'indexes': [models.Index(fields=['dimension', 'subkey', '-users'], name='stat_rollup_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key', 'subkey'), name='stat_rollup_unique')],
+            },
+        ),
+    ]
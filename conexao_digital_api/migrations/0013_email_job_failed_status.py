@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conexao_digital_api', '0012_stat_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendente'), ('running', 'Enviando'), ('finished', 'Finalizado'), ('partial', 'Parcial'), ('failed', 'Falhou')], default='pending', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conexao_digital_api', '0013_email_job_failed_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofilesnapshot',
+            name='schema_version',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+    ]
@@ -1,7 +1,14 @@
+from typing import List, Tuple
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import OuterRef, Prefetch, Q, Subquery
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 
+from .passwords import amake_password
+
 
 # Create your models here.
 
@@ -17,6 +24,17 @@ class UserManager(BaseUserManager):
         user.save()
         return user
 
+    async def acreate_user(self, email, password=None, **extra_fields):
+        # For async views, the password is hashed on the pool of passwords.py while the event loop keeps serving
+        if not email:
+            raise ValueError('O email é obrigatório.')
+        if not password:
+            raise ValueError('A senha é obrigatória.')
+        user = self.model(email=self.normalize_email(email), **extra_fields)
+        user.password = await amake_password(password)
+        await user.asave()
+        return user
+
     def create_superuser(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError('O email é obrigatório.')
@@ -48,6 +66,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    # Bumped when the permission flags or the password change, tokens minted with an older value are refused
+    profile_version = models.PositiveIntegerField(default=0)
     USERNAME_FIELD = 'email'
     EMAIL_FIELD = 'email'
     REQUIRED_FIELDS = ['nome', 'idade', 'genero', 'telefone']
@@ -56,20 +76,70 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.nome
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # The users built from the token cache (see auth.py) load all the other columns on the first one touched
+        if fields is not None and getattr(self, '_load_deferred_together', False):
+            fields = set(fields) | self.get_deferred_fields()
+        super().refresh_from_db(using, fields, from_queryset)
+
     class Meta:
         ordering = ("nome",)
+        indexes = [
+            # The email recipients, the talent search and the admin list only see users without admin flags
+            models.Index(fields=['nome', 'id'], condition=Q(is_superuser=False, is_staff=False),
+                         name='user_regular_nome_idx'),
+            models.Index(fields=['idade'], condition=Q(is_superuser=False, is_staff=False),
+                         name='user_regular_idade_idx'),
+        ]
         verbose_name = "pessoa"
         verbose_name_plural = "pessoas"
 
 
+class CappedCount(Subquery):
+    # COUNT(*) of the rows of a sliced subquery, stops counting at the slice's end
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) AS capped)'
+    output_field = models.IntegerField()
+
+
+# The User columns of RelationshipUserSchema
+RELATIONSHIP_USER_FIELDS = ('id', 'nome', 'email')
+
+
+class InteresseQuerySet(models.QuerySet):
+    def with_users_preview(self):
+        """
+        Annotates `users_count`, counted up to INTERESSE_USERS_COUNT_LIMIT + 1, and prefetches the first
+        INTERESSE_USERS_PREVIEW_SIZE users by nome as `users_preview`, instead of every user of the interests.
+        """
+        through = self.model.users.through.objects.filter(interesse_id=OuterRef('pk'))
+        return self.annotate(
+            users_count=CappedCount(through.values('pk')[:settings.INTERESSE_USERS_COUNT_LIMIT + 1])
+        ).prefetch_related(Prefetch(
+            'users', to_attr='users_preview',
+            queryset=User.objects.only(*RELATIONSHIP_USER_FIELDS)[:settings.INTERESSE_USERS_PREVIEW_SIZE],
+        ))
+
+
 class Interesse(models.Model):
     nome = models.CharField(max_length=100, unique=True)
 
     users = models.ManyToManyField(User, related_name='interesses', blank=True)
 
+    objects = InteresseQuerySet.as_manager()
+
     def __str__(self):
         return self.nome
 
+    def get_users_preview(self) -> Tuple[int, List[User]]:
+        # From with_users_preview when the instance came from it, else read here
+        count = getattr(self, 'users_count', None)
+        if count is None:
+            count = self.users.through.objects.filter(interesse=self)[:settings.INTERESSE_USERS_COUNT_LIMIT + 1].count()
+        preview = getattr(self, 'users_preview', None)
+        if preview is None:
+            preview = list(self.users.only(*RELATIONSHIP_USER_FIELDS)[:settings.INTERESSE_USERS_PREVIEW_SIZE])
+        return count, preview
+
     class Meta:
         ordering = ("nome",)
         verbose_name = "interesse"
@@ -93,6 +163,11 @@ class Habilidade(models.Model):
 
     class Meta:
         ordering = ("nome",)
+        indexes = [
+            # A user's rows in the order of the cursor pagination, (ordering key, id)
+            models.Index(fields=['user', 'nome', 'id'], name='habilidade_user_nome_idx'),
+            models.Index(fields=['nome', 'nivel'], name='habilidade_nome_nivel_idx'),
+        ]
         verbose_name = "habilidade"
         verbose_name_plural = "habilidades"
 
@@ -112,6 +187,10 @@ class FormacaoAcademica(models.Model):
 
     class Meta:
         ordering = ("curso",)
+        indexes = [
+            models.Index(fields=['user', 'curso', 'id'], name='formacao_user_curso_idx'),
+            models.Index(fields=['semestre'], name='formacao_semestre_idx'),
+        ]
         verbose_name = "formação acadêmica"
         verbose_name_plural = "formações acadêmicas"
 
@@ -131,6 +210,9 @@ class ExperienciaProfissional(models.Model):
 
     class Meta:
         ordering = ("cargo",)
+        indexes = [
+            models.Index(fields=['user', 'cargo', 'id'], name='experiencia_user_cargo_idx'),
+        ]
         verbose_name = "experiência profissional"
         verbose_name_plural = "experiências profissionais"
 
@@ -147,5 +229,124 @@ class Projeto(models.Model):
 
     class Meta:
         ordering = ("nome",)
+        indexes = [
+            models.Index(fields=['user', 'nome', 'id'], name='projeto_user_nome_idx'),
+        ]
         verbose_name = "projeto"
         verbose_name_plural = "projetos"
+
+
+class UserSearchDocument(models.Model):
+    """Text indexed by the talent search, kept up to date by the signals in signals.py."""
+    user = models.OneToOneField(User, related_name='search_document', primary_key=True, on_delete=models.CASCADE)
+    document = models.TextField(blank=True, default='')
+    # Only filled on PostgreSQL, SQLite indexes the document in an FTS5 table instead
+    vector = SearchVectorField(null=True)
+
+    class Meta:
+        verbose_name = "documento de busca"
+        verbose_name_plural = "documentos de busca"
+
+
+class UserProfileSnapshot(models.Model):
+    """UserSchema JSON of the user, rebuilt by the signals in signals.py when the profile changes."""
+    user = models.OneToOneField(User, related_name='profile_snapshot', primary_key=True, on_delete=models.CASCADE)
+    data = models.BinaryField()
+    # SNAPSHOT_VERSION of snapshots.py when `data` was built, the other versions are rebuilt on read
+    schema_version = models.CharField(max_length=16, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "snapshot de perfil"
+        verbose_name_plural = "snapshots de perfil"
+
+
+class StatRollup(models.Model):
+    """Users counted per value of a profile dimension for /admin/stats, kept by stats.py (see signals.py)."""
+    dimension = models.CharField(max_length=20)
+    key = models.CharField(max_length=200)
+    # Breakdown of the key, like the nivel of a habilidade or the instituicao of a curso, '' for the key's total
+    subkey = models.CharField(max_length=200, blank=True, default='')
+    users = models.IntegerField(default=0)
+    users_deficiencia = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key', 'subkey'], name='stat_rollup_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['dimension', 'subkey', '-users'], name='stat_rollup_top_idx'),
+        ]
+        verbose_name = "contador de estatística"
+        verbose_name_plural = "contadores de estatística"
+
+
+class UserStatKeys(models.Model):
+    """The StatRollup rows a user is counted in, so a profile change only applies its difference."""
+    # Not a foreign key, the row outlives the user until its counts are removed
+    user_id = models.BigIntegerField(primary_key=True)
+    keys = models.JSONField(default=list)
+    deficiencia = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "chaves de estatística do usuário"
+        verbose_name_plural = "chaves de estatística dos usuários"
+
+
+class EmailJob(models.Model):
+    status_choices = [
+        ('pending', 'Pendente'),
+        ('running', 'Enviando'),
+        ('finished', 'Finalizado'),
+        # Finished with some recipients in failed batches, or all of them
+        ('partial', 'Parcial'),
+        ('failed', 'Falhou'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    # Recipient selection, resolved by the worker: FilterEmailSchema values or selected user ids
+    filters = models.JSONField(blank=True, null=True)
+    user_ids = models.JSONField(blank=True, null=True)
+    extra_emails = models.JSONField(default=list, blank=True)
+
+    status = models.CharField(max_length=10, choices=status_choices, default='pending')
+    locked_at = models.DateTimeField(blank=True, null=True)
+    recipients = models.IntegerField(default=0)
+    sent = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return self.subject
+
+    class Meta:
+        ordering = ("-created_at",)
+        verbose_name = "envio de email"
+        verbose_name_plural = "envios de email"
+
+
+class EmailBatch(models.Model):
+    status_choices = [
+        ('pending', 'Pendente'),
+        ('running', 'Enviando'),
+        ('sent', 'Enviado'),
+        ('failed', 'Falhou'),
+    ]
+
+    job = models.ForeignKey(EmailJob, related_name='batches', on_delete=models.CASCADE)
+    recipients = models.JSONField()
+
+    status = models.CharField(max_length=10, choices=status_choices, default='pending')
+    attempts = models.IntegerField(default=0)
+    run_after = models.DateTimeField()
+    locked_at = models.DateTimeField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        ordering = ("run_after",)
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        verbose_name = "lote de emails"
+        verbose_name_plural = "lotes de emails"
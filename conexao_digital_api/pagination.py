@@ -0,0 +1,146 @@
+import base64
+import json
+from typing import Any, Callable, Generic, List, Optional, Type, TypeVar
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from ninja import Schema, Field
+from ninja.pagination import PaginationBase
+from ninja_extra.exceptions import ParseError
+from ninja_extra.pagination.operations import PaginatorOperation
+
+T = TypeVar('T')
+
+
+class CursorPaginatedResponseSchema(Schema, Generic[T]):
+    next: Optional[str] = None
+    previous: Optional[str] = None
+    results: List[T]
+
+
+def encode_cursor(key: Any, pk: int, reverse: bool = False) -> str:
+    payload = json.dumps([key, pk, int(reverse)], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key, pk, reverse = json.loads(base64.urlsafe_b64decode(padded))
+        return key, int(pk), bool(reverse)
+    except (ValueError, TypeError):
+        raise ParseError('Cursor inválido.')
+
+
+def cursor_key(row, field: str) -> tuple:
+    # Model instances, or the dicts of serialization.schema_values, which hold the ordering field and the id
+    if isinstance(row, dict):
+        return row['id' if field == 'pk' else field], row['id']
+    return getattr(row, field), row.pk
+
+
+class CursorPagination(PaginationBase):
+    """
+    Keyset pagination over (ordering key, id).
+
+    The ordering key defaults to the first field of the model's Meta.ordering, so a page is a
+    range scan on that key instead of an OFFSET, and rows inserted between requests never shift
+    the following pages.
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = None
+        page_size: Optional[int] = None
+
+    def __init__(self, ordering_field: Optional[str] = None, page_size: Optional[int] = None,
+                 max_page_size: Optional[int] = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.ordering_field = ordering_field
+        self.page_size = page_size or settings.CURSOR_PAGINATION_PAGE_SIZE
+        self.max_page_size = max_page_size or settings.CURSOR_PAGINATION_MAX_PAGE_SIZE
+        self.Input = self.create_input()
+
+    def create_input(self):
+        class DynamicInput(CursorPagination.Input):
+            page_size: int = Field(self.page_size, gt=0, le=self.max_page_size)
+
+        return DynamicInput
+
+    def get_ordering_field(self, queryset: QuerySet) -> str:
+        if self.ordering_field:
+            return self.ordering_field
+        ordering = queryset.model._meta.ordering
+        return ordering[0].lstrip('-') if ordering else 'pk'
+
+    def filter_queryset(self, queryset: QuerySet, pagination: Input) -> tuple:
+        # The page query, fetching one extra row to know whether there is a following page
+        field = self.get_ordering_field(queryset)
+        reverse = False
+
+        if pagination.cursor:
+            key, pk, reverse = decode_cursor(pagination.cursor)
+            if reverse:
+                queryset = queryset.filter(Q(**{f'{field}__lt': key}) | Q(**{field: key, 'pk__lt': pk}))
+            else:
+                queryset = queryset.filter(Q(**{f'{field}__gt': key}) | Q(**{field: key, 'pk__gt': pk}))
+
+        if reverse:
+            queryset = queryset.order_by(f'-{field}', '-pk')
+        else:
+            queryset = queryset.order_by(field, 'pk')
+        return queryset[:pagination.page_size + 1], field, reverse
+
+    def build_page(self, results: list, pagination: Input, field: str, reverse: bool) -> dict:
+        page_size = pagination.page_size
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        has_next = reverse or has_more
+        has_previous = has_more if reverse else bool(pagination.cursor)
+
+        next_cursor = previous_cursor = None
+        if results and has_next:
+            next_cursor = encode_cursor(*cursor_key(results[-1], field))
+        if results and has_previous:
+            previous_cursor = encode_cursor(*cursor_key(results[0], field), reverse=True)
+
+        return {
+            'next': next_cursor,
+            'previous': previous_cursor,
+            'results': results,
+        }
+
+    def paginate_queryset(self, queryset: QuerySet, pagination: Input, **params: Any) -> Any:
+        queryset, field, reverse = self.filter_queryset(queryset, pagination)
+        return self.build_page(list(queryset), pagination, field, reverse)
+
+    async def apaginate_queryset(self, queryset: QuerySet, pagination: Input, **params: Any) -> Any:
+        queryset, field, reverse = self.filter_queryset(queryset, pagination)
+        # aiterator() also runs the prefetches of the queryset, with aprefetch_related_objects
+        results = [obj async for obj in queryset.aiterator()]
+        return self.build_page(results, pagination, field, reverse)
+
+
+class AsyncPaginatorOperation(PaginatorOperation):
+    """Like ninja_extra's, but awaits `apaginate_queryset` instead of running `paginate_queryset` in a thread."""
+
+    def get_view_function(self) -> Callable:
+        async def as_view(request_or_controller, *args: Any, **kw: Any) -> Any:
+            func_kwargs = dict(**kw)
+            pagination = func_kwargs.pop(self.paginator_kwargs_name)
+            items = await self.view_func(request_or_controller, *args, **func_kwargs)
+            return await self.paginator.apaginate_queryset(items, pagination)
+
+        return as_view
+
+
+def apaginate(pagination_class: Type[PaginationBase], **paginator_params: Any) -> Callable:
+    """`paginate` for async views whose pagination class implements `apaginate_queryset`."""
+
+    def wrapper(func: Callable) -> Callable:
+        operation = AsyncPaginatorOperation(paginator=pagination_class(**paginator_params), view_func=func)
+        return operation.as_view
+
+    return wrapper
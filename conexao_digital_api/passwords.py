@@ -0,0 +1,73 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_executor = None
+THREAD_NAME_PREFIX = 'password-hashing'
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Bounds how many hashes run at once, each Argon2 hash also holds PASSWORD_ARGON2_MEMORY_COST KiB
+        _executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHING_WORKERS,
+                                       thread_name_prefix=THREAD_NAME_PREFIX)
+    return _executor
+
+
+def _reset_executor():
+    # The threads of the pool don't survive a fork, a child process (import_profiles, seed_profiles) starts its own
+    global _executor
+    _executor = None
+
+
+os.register_at_fork(after_in_child=_reset_executor)
+
+
+def run_hashing(func, *args, **kwargs):
+    # Called from the pool itself by amake_password
+    if threading.current_thread().name.startswith(THREAD_NAME_PREFIX):
+        return func(*args, **kwargs)
+    return get_executor().submit(partial(func, *args, **kwargs)).result()
+
+
+async def amake_password(password: str) -> str:
+    # For async views, the event loop keeps serving while the pool hashes
+    return await asyncio.wrap_future(get_executor().submit(hashers.make_password, password))
+
+
+class PooledHasherMixin:
+    """Runs encode and verify on the bounded pool, for every caller: create_user, login, password changes."""
+
+    def encode(self, password, salt, *args, **kwargs):
+        return run_hashing(super().encode, password, salt, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return run_hashing(super().verify, password, encoded)
+
+
+# The costs come from the settings, the hashes made with other costs are updated on the next login
+class Argon2PasswordHasher(PooledHasherMixin, hashers.Argon2PasswordHasher):
+    time_cost = settings.PASSWORD_ARGON2_TIME_COST
+    memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+    parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class BCryptSHA256PasswordHasher(PooledHasherMixin, hashers.BCryptSHA256PasswordHasher):
+    rounds = settings.PASSWORD_BCRYPT_ROUNDS
+
+
+class ScryptPasswordHasher(PooledHasherMixin, hashers.ScryptPasswordHasher):
+    work_factor = settings.PASSWORD_SCRYPT_WORK_FACTOR
+    # Twice the memory scrypt needs, OpenSSL's default limit only fits the work factors up to 2 ** 14
+    maxmem = 256 * work_factor * hashers.ScryptPasswordHasher.block_size
+
+
+class PBKDF2PasswordHasher(PooledHasherMixin, hashers.PBKDF2PasswordHasher):
+    pass
+
@@ -0,0 +1,23 @@
+from ninja_extra.permissions import BasePermission
+
+
+def get_claim(request, name: str):
+    # The access token's claim, or the user's field for tokens minted without claims
+    claims = getattr(request, 'auth_claims', None)
+    if claims is not None:
+        return claims.get(name)
+    return getattr(request.user, name, None)
+
+
+class HasActiveClaim(BasePermission):
+    """IsAuthenticated without reading the user, the claims were checked against profile_version by the auth."""
+
+    def has_permission(self, request, controller) -> bool:
+        return bool(request.user and request.user.is_authenticated and get_claim(request, 'is_active'))
+
+
+class HasStaffClaim(BasePermission):
+    """IsAdminUser from the is_staff claim."""
+
+    def has_permission(self, request, controller) -> bool:
+        return bool(request.user and request.user.is_authenticated and get_claim(request, 'is_staff'))
@@ -0,0 +1,185 @@
+import hashlib
+import inspect
+import time
+from functools import wraps
+from typing import Callable, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse, HttpResponseNotModified
+from ninja.utils import contribute_operation_callback
+from ninja_extra.constants import ROUTE_FUNCTION
+from ninja_extra.controllers.route.context import RouteContext
+from ninja_extra.dependency_resolver import service_resolver
+
+# The responses embedding the members of the interests, bumped when a membership, an interest or a member's
+# nome/email changes
+GLOBAL_SCOPE = 'global'
+# The responses listing the profiles of any users, the talent search, bumped by every profile write
+PROFILES_SCOPE = 'profiles'
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def version_key(scope) -> str:
+    return f'api-cache:version:{scope}'
+
+
+def per_process_timeout(timeout: int) -> Optional[int]:
+    # A per-process cache (LocMemCache) never sees the bumps made by the other processes, its versions have to expire.
+    # Shared caches keep them until bumped
+    return timeout if isinstance(get_cache(), LocMemCache) else None
+
+
+def get_versions(scopes: Iterable, timeout: Optional[int] = None) -> list:
+    # A version lost by eviction or expired restarts from a new value, so it never matches entries cached before
+    if timeout is None:
+        timeout = per_process_timeout(settings.API_CACHE_VERSION_TIMEOUT)
+    cache = get_cache()
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=timeout)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(scope, timeout: Optional[int] = None):
+    if timeout is None:
+        timeout = per_process_timeout(settings.API_CACHE_VERSION_TIMEOUT)
+    cache = get_cache()
+    try:
+        cache.incr(version_key(scope))
+    except ValueError:
+        cache.add(version_key(scope), time.time_ns(), timeout=timeout)
+
+
+def invalidate_user(user_id: int):
+    # Drops the cached responses of this user and the profile lists, the other users' entries are kept
+    bump_version(user_id)
+    bump_version(PROFILES_SCOPE)
+
+
+def invalidate_users(user_ids: Iterable[int]):
+    for user_id in user_ids:
+        bump_version(user_id)
+    bump_version(PROFILES_SCOPE)
+
+
+def requester_scope(request, kwargs: dict):
+    return request.user.pk
+
+
+def path_user_scope(param: str = 'user_id') -> Callable:
+    # Read from the URL match, the factory routes receive the path params grouped in a model
+    return lambda request, kwargs: request.resolver_match.kwargs[param]
+
+
+def object_user_scope(model, param: str) -> Callable:
+    # The user owning the object of the URL, None once it's deleted
+    return lambda request, kwargs: model.objects.filter(pk=request.resolver_match.kwargs[param]).values_list(
+        'user_id', flat=True).first()
+
+
+def global_scope(request, kwargs: dict):
+    return GLOBAL_SCOPE
+
+
+def profiles_scope(request, kwargs: dict):
+    return PROFILES_SCOPE
+
+
+def etag_matches(request, etag: str) -> bool:
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def build_response(request, etag: str, content: bytes, content_type: str) -> HttpResponse:
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    # Clients revalidate every time, the 304 answer is cheap
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def cache_response(scope: Callable = requester_scope):
+    """
+    Caches the serialized response of a GET route, keyed on the path, query string and requesting user.
+
+    `scope(request, kwargs)` tells whose data the route returns. The entries live until that user's
+    version is bumped by `invalidate_user` (see signals.py) or API_CACHE_TIMEOUT expires. The permissions of the
+    controller are checked on the cached responses too. Works on
+    plain route handlers, below the route decorator, and on the routes built by ModelEndpointFactory.
+    """
+
+    def lookup(request, kwargs: dict) -> tuple:
+        scopes = [request.user.pk, scope(request, kwargs)]
+        raw_key = f'{request.get_full_path()}|{scopes}|{get_versions(scopes)}'
+        key = 'api-cache:response:' + hashlib.sha256(raw_key.encode()).hexdigest()
+        return key, get_cache().get(key)
+
+    def store(request, key: str, response: HttpResponse) -> HttpResponse:
+        if response.status_code != 200 or getattr(response, 'streaming', False):
+            return response
+        etag = '"%s"' % hashlib.sha256(response.content).hexdigest()
+        cached = (etag, response.content, response['Content-Type'])
+        get_cache().set(key, cached, timeout=settings.API_CACHE_TIMEOUT)
+        return build_response(request, *cached)
+
+    def contribute(operation):
+        view_func = operation.view_func
+        # The controller routes check their permissions inside the view, which a cached response skips
+        route_function = view_func.get_route_function() if hasattr(view_func, 'get_route_function') else None
+
+        def check_permissions():
+            if route_function:
+                with route_function._prep_controller_route_execution(service_resolver(RouteContext)) as ctx:
+                    ctx.controller_instance.check_permissions()
+
+        def to_response(request, result) -> HttpResponse:
+            temporal_response = operation.api.create_temporal_response(request)
+            return operation._result_to_response(request, result, temporal_response)
+
+        @wraps(view_func)
+        def cached_view(request, *args, **kwargs):
+            key, cached = lookup(request, kwargs)
+            if cached is not None:
+                check_permissions()
+                return build_response(request, *cached)
+            result = view_func(request, *args, **kwargs)
+            return store(request, key, to_response(request, result))
+
+        @wraps(view_func)
+        async def async_cached_view(request, *args, **kwargs):
+            # The cache backends are sync, Redis and the file based one block on I/O
+            key, cached = await sync_to_async(lookup)(request, kwargs)
+            if cached is not None:
+                await sync_to_async(check_permissions)()
+                return build_response(request, *cached)
+            result = await view_func(request, *args, **kwargs)
+            response = to_response(request, result)
+            if inspect.isawaitable(response):
+                # ninja_extra serializes the results of async operations in a thread
+                response = await response
+            return await sync_to_async(store)(request, key, response)
+
+        operation.view_func = async_cached_view if inspect.iscoroutinefunction(view_func) else cached_view
+
+    def decorator(func):
+        # Functions already turned into routes keep the view to register in their RouteFunction
+        route_function = getattr(func, ROUTE_FUNCTION, None)
+        contribute_operation_callback(route_function.as_view if route_function else func, contribute)
+        return func
+
+    return decorator
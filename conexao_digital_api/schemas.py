@@ -1,6 +1,10 @@
+from functools import lru_cache
+from django.conf import settings
 from ninja import ModelSchema, Schema, FilterSchema, Field
-from typing import List, Optional
-from .models import User, Interesse, FormacaoAcademica, ExperienciaProfissional, Habilidade, Projeto
+from typing import List, Optional, Tuple, Type
+from .avatars import avatar_urls
+from .pagination import encode_cursor
+from .models import User, Interesse, FormacaoAcademica, ExperienciaProfissional, Habilidade, Projeto, EmailJob
 
 
 class UserInteresseSchema(ModelSchema):
@@ -63,8 +67,19 @@ class UserProjetoSchema(ModelSchema):
         )
 
 
+class AvatarThumbnailSchema(Schema):
+    size: int
+    webp: str
+    jpg: str
+
+
+class AvatarSchema(Schema):
+    url: str
+    thumbnails: List[AvatarThumbnailSchema] = []
+
+
 class UserSchema(ModelSchema):
-    avatar: Optional[str] = None
+    avatar: Optional[AvatarSchema] = None
     interesses: List[UserInteresseSchema] = None
     habilidades: List[UserHabilidadeSchema] = None
     formacoes_academicas: List[UserFormacaoAcademicaSchema] = None
@@ -85,6 +100,31 @@ class UserSchema(ModelSchema):
             'avatar',
         )
 
+    @staticmethod
+    def resolve_avatar(obj):
+        return avatar_urls(obj.avatar.name if obj.avatar else None)
+
+
+@lru_cache(maxsize=None)
+def user_schema_subset(fields: Tuple[str, ...]) -> Type[Schema]:
+    """UserSchema with only `fields`, built once per combination."""
+    if set(fields) >= set(UserSchema.model_fields):
+        return UserSchema
+    namespace = {'__module__': __name__, '__annotations__': {}}
+    for name, field in UserSchema.model_fields.items():
+        if name in fields:
+            namespace['__annotations__'][name] = field.annotation
+            namespace[name] = field
+    if 'avatar' in fields:
+        namespace['resolve_avatar'] = staticmethod(UserSchema.resolve_avatar)
+    return type(f'UserSchema_{"_".join(fields)}', (Schema,), namespace)
+
+
+class ProfileFieldsSchema(Schema):
+    fields: Optional[str] = Field(None, description='Campos do usuário separados por vírgula, por exemplo nome,avatar.')
+    expand: Optional[str] = Field(None, description='Listas incluídas separadas por vírgula, por exemplo '
+                                                    'habilidades,projetos. Sem fields nem expand, o perfil completo.')
+
 
 class CreateUserSchema(ModelSchema):
     class Meta:
@@ -124,8 +164,18 @@ class RelationshipUserSchema(ModelSchema):
         )
 
 
+class InteresseUsersSchema(Schema):
+    # Counted up to INTERESSE_USERS_COUNT_LIMIT, count_limited tells there are more
+    count: int
+    count_limited: bool
+    # The first INTERESSE_USERS_PREVIEW_SIZE by nome, `next` is the cursor of the following ones on
+    # /admin/users/interesses/{id}/users
+    results: List[RelationshipUserSchema]
+    next: Optional[str] = None
+
+
 class InteresseSchema(ModelSchema):
-    users: List[RelationshipUserSchema] = None
+    users: InteresseUsersSchema = None
 
     class Meta:
         model = Interesse
@@ -134,6 +184,16 @@ class InteresseSchema(ModelSchema):
             'nome',
         )
 
+    @staticmethod
+    def resolve_users(obj):
+        count, preview = obj.get_users_preview()
+        return {
+            'count': min(count, settings.INTERESSE_USERS_COUNT_LIMIT),
+            'count_limited': count > settings.INTERESSE_USERS_COUNT_LIMIT,
+            'results': preview,
+            'next': encode_cursor(preview[-1].nome, preview[-1].pk) if preview and count > len(preview) else None,
+        }
+
 
 class CreateOrUpdateInteresseSchema(ModelSchema):
     class Meta:
@@ -164,6 +224,17 @@ class CreateOrUpdateHabilidadeSchema(ModelSchema):
         )
 
 
+class BulkHabilidadeSchema(ModelSchema):
+    # `id` is optional, items without it are created
+    class Meta:
+        model = Habilidade
+        fields = (
+            'id',
+            'nome',
+            'nivel',
+        )
+
+
 class FormacaoAcademicaSchema(ModelSchema):
     user: RelationshipUserSchema
 
@@ -191,6 +262,19 @@ class CreateOrUpdateFormacaoAcademicaSchema(ModelSchema):
         )
 
 
+class BulkFormacaoAcademicaSchema(ModelSchema):
+    class Meta:
+        model = FormacaoAcademica
+        fields = (
+            'id',
+            'curso',
+            'instituicao',
+            'ano_inicio',
+            'ano_conclusao',
+            'semestre',
+        )
+
+
 class ExperienciaProfissionalSchema(ModelSchema):
     user: RelationshipUserSchema
 
@@ -218,6 +302,19 @@ class CreateOrUpdateExperienciaProfissionalSchema(ModelSchema):
         )
 
 
+class BulkExperienciaProfissionalSchema(ModelSchema):
+    class Meta:
+        model = ExperienciaProfissional
+        fields = (
+            'id',
+            'cargo',
+            'empresa',
+            'ano_inicio',
+            'ano_fim',
+            'descricao',
+        )
+
+
 class ProjetoSchema(ModelSchema):
     user: RelationshipUserSchema
 
@@ -241,6 +338,59 @@ class CreateOrUpdateProjetoSchema(ModelSchema):
         )
 
 
+class BulkProjetoSchema(ModelSchema):
+    class Meta:
+        model = Projeto
+        fields = (
+            'id',
+            'nome',
+            'descricao',
+            'link',
+        )
+
+
+class ImportProfileSchema(CreateUserSchema):
+    # A row of import_profiles: the user of /create with the items of the profile routes
+    resumo: Optional[str] = None
+    interesses: List[CreateOrUpdateInteresseSchema] = []
+    habilidades: List[CreateOrUpdateHabilidadeSchema] = []
+    formacoes_academicas: List[CreateOrUpdateFormacaoAcademicaSchema] = []
+    experiencias_profissionais: List[CreateOrUpdateExperienciaProfissionalSchema] = []
+    projetos: List[CreateOrUpdateProjetoSchema] = []
+
+
+class ProfileImportErrorSchema(Schema):
+    line: int
+    messages: List[str]
+
+
+class ProfileImportReportSchema(Schema):
+    created: int
+    # The rows left out, by line of the file
+    errors: List[ProfileImportErrorSchema]
+
+
+class UpdateProfileSchema(ModelSchema):
+    # Relations left out are kept as they are, the ones sent replace the whole collection
+    interesses: List[UserInteresseSchema] = None
+    habilidades: List[BulkHabilidadeSchema] = None
+    formacoes_academicas: List[BulkFormacaoAcademicaSchema] = None
+    experiencias_profissionais: List[BulkExperienciaProfissionalSchema] = None
+    projetos: List[BulkProjetoSchema] = None
+
+    class Meta:
+        model = User
+        fields = (
+            'nome',
+            'email',
+            'idade',
+            'genero',
+            'telefone',
+            'deficiencia',
+            'resumo',
+        )
+
+
 class FilterEmailSchema(FilterSchema):
     genero: Optional[str] = Field(None, q='genero')
     is_active: Optional[bool] = Field(None, q='is_active')
@@ -274,3 +424,39 @@ class EmailRequestSchema(Schema):
     subject: str
     message: str
     emails: Optional[List[str]] = []
+
+
+class EmailJobSchema(ModelSchema):
+    class Meta:
+        model = EmailJob
+        fields = (
+            'id',
+            'status',
+            'recipients',
+            'sent',
+            'failed',
+            'error',
+            'created_at',
+            'finished_at',
+        )
+
+
+class RouteTimingSchema(Schema):
+    count: int
+    mean_ms: float
+    max_ms: float
+    # Upper bounds of the histogram buckets
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+class StatBreakdownSchema(Schema):
+    key: str
+    users: int
+    users_deficiencia: int
+
+
+class StatSchema(StatBreakdownSchema):
+    # Per nivel for the habilidades, per instituicao for the cursos, empty for the other dimensions
+    breakdown: List[StatBreakdownSchema]
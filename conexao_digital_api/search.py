@@ -0,0 +1,97 @@
+import re
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+from .models import (
+    User, Interesse, Habilidade, FormacaoAcademica, ExperienciaProfissional, Projeto, UserSearchDocument
+)
+
+FTS_TABLE = 'conexao_digital_api_usersearch_fts'
+
+
+def build_documents(user_ids: Iterable[int]) -> Dict[int, str]:
+    """Search documents of the existing users of `user_ids`, read with one values query per relation."""
+    users = User.objects.filter(pk__in=user_ids).values_list('id', 'resumo')
+    parts = {user_id: [resumo or ''] for user_id, resumo in users}
+    relations = (
+        Habilidade.objects.values_list('user_id', 'nome'),
+        Interesse.users.through.objects.order_by('interesse__nome').values_list('user_id', 'interesse__nome'),
+        FormacaoAcademica.objects.values_list('user_id', 'curso'),
+        ExperienciaProfissional.objects.values_list('user_id', 'cargo', 'empresa'),
+        Projeto.objects.values_list('user_id', 'nome', 'descricao'),
+    )
+    for queryset in relations:
+        for user_id, *values in queryset.filter(user_id__in=parts):
+            parts[user_id] += values
+    return {user_id: '\n'.join(part for part in user_parts if part) for user_id, user_parts in parts.items()}
+
+
+def update_search_documents(user_ids: Iterable[int]):
+    """Rebuilds the documents of `user_ids`, deleting the ones of missing users."""
+    user_ids = set(user_ids)
+    documents = [UserSearchDocument(user_id=user_id, document=document)
+                 for user_id, document in build_documents(user_ids).items()]
+    UserSearchDocument.objects.bulk_create(documents, update_conflicts=True, unique_fields=['user'],
+                                           update_fields=['document'])
+    found = [document.user_id for document in documents]
+    if connection.vendor == 'postgresql':
+        UserSearchDocument.objects.filter(pk__in=found).update(
+            vector=SearchVector('document', config=settings.SEARCH_CONFIG)
+        )
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [[user_id] for user_id in found])
+            cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, document) VALUES (%s, %s)',
+                               [[document.user_id, document.document] for document in documents])
+
+    for user_id in user_ids.difference(found):
+        delete_search_document(user_id)
+
+
+def update_search_document(user_id: int):
+    update_search_documents([user_id])
+
+
+def delete_search_document(user_id: int):
+    UserSearchDocument.objects.filter(pk=user_id).delete()
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [user_id])
+
+
+def fts_match_expression(query: str) -> str:
+    # Quotes every term so user input can't use the FTS5 query syntax, each term matches as a prefix
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', query))
+
+
+def search_users(query: str):
+    """
+    Users whose search document matches `query`, best match first and annotated with `rank`.
+
+    Each user appears once, the relations are flattened in the document instead of joined. Deactivated accounts
+    are left out.
+    """
+    users = User.objects.filter(is_active=True, is_superuser=False, is_staff=False)
+
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config=settings.SEARCH_CONFIG, search_type='websearch')
+        return users.filter(search_document__vector=search_query).annotate(
+            rank=SearchRank(F('search_document__vector'), search_query)
+        ).order_by('-rank', 'pk')
+
+    if connection.vendor == 'sqlite':
+        match = fts_match_expression(query)
+        if not match:
+            return users.none()
+        # bm25() is lower for better matches
+        rank = RawSQL(f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+                      f'WHERE {FTS_TABLE} MATCH %s AND rowid = {User._meta.db_table}.id', [match])
+        matches = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        return users.filter(pk__in=matches).annotate(rank=rank).order_by('-rank', 'pk')
+
+    return users.filter(search_document__document__icontains=query).order_by('pk')
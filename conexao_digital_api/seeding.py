@@ -0,0 +1,199 @@
+import multiprocessing
+import random
+from typing import Callable, List, Optional
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from .models import User, Interesse, Habilidade, FormacaoAcademica, ExperienciaProfissional, Projeto
+from .response_cache import GLOBAL_SCOPE, PROFILES_SCOPE, bump_version
+from .search import update_search_documents
+from .snapshots import rebuild_snapshots
+from .stats import update_user_stats
+
+# Password of every generated user, hashed once per run
+SEED_PASSWORD = 'senha-segura-123'
+
+PRIMEIROS_NOMES = (
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Hugo', 'Isabela', 'João', 'Karina', 'Lucas',
+    'Mariana', 'Nicolas', 'Olívia', 'Pedro', 'Rafaela', 'Samuel', 'Tatiana', 'Vinícius', 'Yasmin', 'Thiago',
+)
+SOBRENOMES = (
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes', 'Costa',
+    'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa', 'Marinho',
+)
+HABILIDADES = (
+    'Python', 'JavaScript', 'TypeScript', 'Java', 'C#', 'Go', 'SQL', 'Django', 'React', 'Node.js', 'Docker', 'Linux',
+    'Git', 'Excel', 'Power BI', 'Figma', 'Comunicação', 'Liderança', 'Inglês', 'Espanhol', 'Atendimento',
+    'Gestão de projetos', 'Scrum', 'Marketing digital', 'Redação', 'Libras', 'Análise de dados', 'Design gráfico',
+)
+CURSOS = (
+    'Ciência da Computação', 'Sistemas de Informação', 'Engenharia de Software',
+    'Análise e Desenvolvimento de Sistemas', 'Administração', 'Design', 'Engenharia Elétrica', 'Letras', 'Pedagogia',
+    'Publicidade', 'Psicologia', 'Direito',
+)
+INSTITUICOES = ('USP', 'UNICAMP', 'UFMG', 'UFRJ', 'UFPE', 'UFRGS', 'UnB', 'UFSC', 'UFBA', 'IFSP', 'FATEC', 'PUC-SP')
+CARGOS = (
+    'Desenvolvedor', 'Analista de Dados', 'Designer', 'Suporte Técnico', 'Estagiário', 'Assistente Administrativo',
+    'Analista de Sistemas', 'Gerente de Projetos', 'Professor', 'Atendente', 'Analista de Marketing',
+)
+EMPRESAS = ('ACME', 'Tech Brasil', 'Nuvem Ltda', 'Dados & Cia', 'Loja Central', 'Banco Popular', 'Escola Aberta')
+TEMAS = (
+    'Tecnologia', 'Educação', 'Saúde', 'Esportes', 'Música', 'Cinema', 'Leitura', 'Games', 'Viagens', 'Culinária',
+    'Fotografia', 'Voluntariado', 'Sustentabilidade', 'Empreendedorismo', 'Acessibilidade', 'Inteligência Artificial',
+    'Robótica', 'Finanças', 'Idiomas', 'Artes', 'Dança', 'Teatro', 'Astronomia', 'Política', 'História', 'Moda',
+    'Design', 'Marketing', 'Jardinagem', 'Xadrez', 'Ciclismo', 'Corrida', 'Yoga', 'Podcasts', 'Animes', 'Quadrinhos',
+    'Programação', 'Segurança', 'Dados', 'Inclusão',
+)
+# The first themes are the most popular, like the few interests most users share in the real data
+INTERESSES = tuple(f'{tema} {grupo}' if grupo else tema for grupo in range(5) for tema in TEMAS)
+INTERESSE_WEIGHTS = tuple(1 / (rank + 1) for rank in range(len(INTERESSES)))
+
+
+def seed_email(index: int) -> str:
+    return f'seed{index}@example.com'
+
+
+def fan_out(rng: random.Random, mean: float, limit: int) -> int:
+    # Most profiles have a few items, some have many
+    return min(int(rng.expovariate(1 / mean)), limit)
+
+
+def generate_profile(index: int, seed: int = 0) -> dict:
+    """
+    Fields and relations of the generated user `index`, plain values only.
+
+    The same (index, seed) always gives the same profile, however the users are split in chunks.
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    primeiro_nome, sobrenome = rng.choice(PRIMEIROS_NOMES), rng.choice(SOBRENOMES)
+    profile = {
+        'user': {
+            'email': seed_email(index),
+            # nome is unique
+            'nome': f'{primeiro_nome} {sobrenome} {index}',
+            'idade': int(rng.triangular(16, 70, 24)),
+            'genero': rng.choices('MFO', weights=(48, 48, 4))[0],
+            'telefone': f'{rng.randint(11, 99)}9{rng.randint(10000000, 99999999)}',
+            'deficiencia': rng.random() < 0.09,
+            'resumo': f'{primeiro_nome} trabalha com {rng.choice(HABILIDADES)} e gosta de {rng.choice(TEMAS)}.',
+        },
+        'interesses': sorted(set(rng.choices(INTERESSES, weights=INTERESSE_WEIGHTS, k=fan_out(rng, 4, 20)))),
+        'habilidades': [(nome, rng.randint(1, 3)) for nome in rng.sample(HABILIDADES, fan_out(rng, 4, 15))],
+        'formacoes_academicas': [],
+        'experiencias_profissionais': [],
+        'projetos': [],
+    }
+    for _ in range(rng.choices((0, 1, 2, 3), weights=(10, 55, 28, 7))[0]):
+        ano_inicio = rng.randint(2000, 2024)
+        profile['formacoes_academicas'].append((rng.choice(CURSOS), rng.choice(INSTITUICOES), ano_inicio,
+                                                ano_inicio + rng.randint(2, 6), rng.randint(1, 10)))
+    for _ in range(fan_out(rng, 2, 10)):
+        ano_inicio = rng.randint(2000, 2024)
+        cargo = rng.choice(CARGOS)
+        profile['experiencias_profissionais'].append((cargo, rng.choice(EMPRESAS), ano_inicio,
+                                                      ano_inicio + rng.randint(0, 6), f'Atuação como {cargo}.'))
+    for number in range(fan_out(rng, 1.5, 10)):
+        tema = rng.choice(TEMAS)
+        profile['projetos'].append((f'Projeto de {tema}', f'Um projeto sobre {tema}.',
+                                    f'https://example.com/seed{index}/projeto-{number}'))
+    return profile
+
+
+def create_interesses() -> dict:
+    Interesse.objects.bulk_create([Interesse(nome=nome) for nome in INTERESSES], ignore_conflicts=True)
+    return dict(Interesse.objects.filter(nome__in=INTERESSES).values_list('nome', 'id'))
+
+
+def insert_rows(model, fields: List[str], rows: List[tuple]):
+    # One prepared INSERT run with executemany, bulk_create spends most of its time building the SQL of each row
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})', rows)
+
+
+USER_FIELDS = ('email', 'nome', 'idade', 'genero', 'telefone', 'deficiencia', 'resumo')
+# Columns set by the model defaults, executemany skips them
+USER_DEFAULTS = {'password': None, 'is_staff': False, 'is_superuser': False, 'is_active': True, 'profile_version': 0}
+
+
+def insert_profiles(profiles: List[dict], password: str, interesse_ids: dict) -> List[int]:
+    """Writes generated profiles with one INSERT statement per table, returns the new user ids."""
+    last_id = User.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    defaults = {**USER_DEFAULTS, 'password': password}
+    insert_rows(User, [*USER_FIELDS, *defaults],
+                [(*(profile['user'][field] for field in USER_FIELDS), *defaults.values()) for profile in profiles])
+    # The ids come from the same sequence, the single writer gets them in insertion order
+    user_ids = dict(User.objects.filter(pk__gt=last_id).values_list('email', 'pk'))
+    ids = [user_ids[profile['user']['email']] for profile in profiles]
+
+    insert_rows(Interesse.users.through, ['user', 'interesse'],
+                [(user_id, interesse_ids[nome]) for user_id, profile in zip(ids, profiles)
+                 for nome in profile['interesses']])
+    insert_rows(Habilidade, ['user', 'nome', 'nivel'],
+                [(user_id, *habilidade) for user_id, profile in zip(ids, profiles)
+                 for habilidade in profile['habilidades']])
+    insert_rows(FormacaoAcademica, ['user', 'curso', 'instituicao', 'ano_inicio', 'ano_conclusao', 'semestre'],
+                [(user_id, *formacao) for user_id, profile in zip(ids, profiles)
+                 for formacao in profile['formacoes_academicas']])
+    insert_rows(ExperienciaProfissional, ['user', 'cargo', 'empresa', 'ano_inicio', 'ano_fim', 'descricao'],
+                [(user_id, *experiencia) for user_id, profile in zip(ids, profiles)
+                 for experiencia in profile['experiencias_profissionais']])
+    insert_rows(Projeto, ['user', 'nome', 'descricao', 'link'],
+                [(user_id, *projeto) for user_id, profile in zip(ids, profiles) for projeto in profile['projetos']])
+    return ids
+
+
+def generate_chunk(bounds: tuple) -> List[dict]:
+    # Runs on the worker processes of seed_profiles
+    start, stop, seed = bounds
+    return [generate_profile(index, seed) for index in range(start, stop)]
+
+
+def seed_profiles(users: int, seed: int = 0, start: int = 0, chunk_size: int = 1000, workers: int = 1,
+                  derived: bool = True, password_hash: Optional[str] = None,
+                  on_chunk: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Creates the generated users start..start + users - 1 with their relations, one transaction per chunk.
+
+    With `workers` > 1 the profiles are generated on that many processes while this one writes them. bulk_create
+    skips the signals, so the search documents, the snapshots and the stats are written here per chunk, unless
+    `derived` is False: the snapshots are then built on the first read, the search documents by rebuild_search_index
+    and the stats by reconcile_stats.
+    """
+    password_hash = password_hash or make_password(SEED_PASSWORD)
+    interesse_ids = create_interesses()
+    bounds = [(chunk_start, min(chunk_start + chunk_size, start + users), seed)
+              for chunk_start in range(start, start + users, chunk_size)]
+
+    pool = None
+    if workers > 1:
+        # django.setup for the spawned processes, the models module is imported by this one
+        pool = multiprocessing.Pool(workers, initializer=django.setup)
+        chunks = pool.imap(generate_chunk, bounds)
+    else:
+        chunks = map(generate_chunk, bounds)
+    try:
+        for profiles in chunks:
+            with transaction.atomic():
+                user_ids = insert_profiles(profiles, password_hash, interesse_ids)
+                if derived:
+                    update_search_documents(user_ids)
+                    rebuild_snapshots(user_ids)
+                    update_user_stats(user_ids)
+            if on_chunk:
+                on_chunk(len(user_ids))
+    finally:
+        if pool:
+            pool.terminate()
+
+    if users:
+        # Like import_profiles, the lists spanning several users: the interest members and the search
+        bump_version(GLOBAL_SCOPE)
+        bump_version(PROFILES_SCOPE)
+    return users
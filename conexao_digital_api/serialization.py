@@ -0,0 +1,158 @@
+import inspect
+from functools import wraps
+from typing import Dict, Iterable, List, Optional, Type
+
+import orjson
+from django.db.models import QuerySet
+from django.db.models.query import ValuesIterable
+from django.http import HttpResponse
+from ninja import Schema
+from ninja.parser import Parser
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+from .avatars import avatar_urls
+from .models import User, Interesse
+from .schemas import UserSchema
+from .services import PROFILE_RELATIONS, PROFILE_USER_FIELDS, ProfileSelection, selected_profiles
+
+# Types orjson doesn't know (Decimal, pydantic's Url, lazy translations...) go through ninja's encoder. The datetimes
+# too, so they keep the format of the json module's output
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+encoder = NinjaJSONEncoder()
+
+
+def dumps(data) -> bytes:
+    return orjson.dumps(data, default=encoder.default, option=ORJSON_OPTIONS)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+
+    def render(self, request, data, *, response_status: int) -> bytes:
+        return dumps(data)
+
+
+class ORJSONParser(Parser):
+    def parse_body(self, request):
+        return orjson.loads(request.body)
+
+
+def json_response(data, status: int = 200) -> HttpResponse:
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def trusted_response(func):
+    """
+    Renders the result of the route as it is, skipping the validation against its response schema.
+
+    Only for results built from our own values querysets (see schema_values and ProfileRows), already in the shape
+    of the schema. Goes below cache_response and above paginate.
+    """
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_view(*args, **kwargs):
+            return json_response(await func(*args, **kwargs))
+
+        return async_view
+
+    @wraps(func)
+    def view(*args, **kwargs):
+        return json_response(func(*args, **kwargs))
+
+    return view
+
+
+def schema_lookups(schema: Type[Schema], prefix: str = '') -> List[str]:
+    # The values() lookups of the schema's fields, the nested schemas of the foreign keys as user__id, user__nome...
+    lookups = []
+    for name, field in schema.model_fields.items():
+        if isinstance(field.annotation, type) and issubclass(field.annotation, Schema):
+            lookups += schema_lookups(field.annotation, f'{prefix}{name}__')
+        else:
+            lookups.append(prefix + name)
+    return lookups
+
+
+class NestedValuesIterable(ValuesIterable):
+    """values() rows with the user__nome keys nested as {'user': {'nome': ...}}."""
+
+    def __iter__(self):
+        for row in super().__iter__():
+            nested = {}
+            for key, value in row.items():
+                *path, name = key.split('__')
+                target = nested
+                for part in path:
+                    target = target.setdefault(part, {})
+                target[name] = value
+            yield nested
+
+
+def schema_values(queryset: QuerySet, schema: Type[Schema]) -> QuerySet:
+    """
+    The queryset as dicts in the shape of `schema`, read with a single values query.
+
+    The schema can nest the schemas of foreign keys, not lists. The rows go out through trusted_response.
+    """
+    queryset = queryset.values(*schema_lookups(schema))
+    queryset._iterable_class = NestedValuesIterable
+    return queryset
+
+
+def profile_values(user_ids: Iterable[int]) -> Dict[int, dict]:
+    """
+    The UserSchema dicts of the existing users of `user_ids`, with one values query per relation.
+
+    Equal to UserSchema.from_orm(user).model_dump(mode='json'), without the prefetches and the validation.
+    """
+    profiles = {}
+    for user in User.objects.filter(pk__in=user_ids).values(*PROFILE_USER_FIELDS):
+        user['avatar'] = avatar_urls(user['avatar'])
+        profiles[user['id']] = {name: user.get(name) for name in UserSchema.model_fields}
+        for related_name, *_ in PROFILE_RELATIONS:
+            profiles[user['id']][related_name] = []
+
+    for related_name, model, schema, fk in PROFILE_RELATIONS:
+        fields = list(schema.model_fields)
+        if fk:
+            queryset = model.objects.order_by(*model._meta.ordering, 'id').values_list('user_id', *fields)
+        else:
+            # The many to many interesses, through their table
+            through = Interesse.users.through.objects.order_by(
+                *(f'interesse__{field}' for field in Interesse._meta.ordering), 'interesse__id'
+            )
+            queryset = through.values_list('user_id', *(f'interesse__{field}' for field in fields))
+        for user_id, *values in queryset.filter(user_id__in=profiles):
+            profiles[user_id][related_name].append(dict(zip(fields, values)))
+    return profiles
+
+
+class ProfileRows:
+    """
+    A users queryset seen as a sequence of UserSchema dicts, for the paginators.
+
+    Slicing reads the ids of the page, in the queryset's order, then their profile_values, or their
+    selected_profiles for a `selection`.
+    """
+
+    def __init__(self, queryset: QuerySet, selection: Optional[ProfileSelection] = None):
+        self.queryset = queryset
+        self.selection = selection
+
+    def count(self) -> int:
+        return self.queryset.count()
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = list(self.queryset.values_list('pk', flat=True)[index])
+        if self.selection:
+            profiles = {profile['id']: profile
+                        for profile in selected_profiles(User.objects.filter(pk__in=ids), self.selection)}
+        else:
+            profiles = profile_values(ids)
+        return [profiles[user_id] for user_id in ids if user_id in profiles]
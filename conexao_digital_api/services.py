@@ -0,0 +1,116 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from ninja_extra import ModelService
+from ninja_extra.exceptions import NotFound, ParseError
+
+from .models import User, Interesse, Habilidade, FormacaoAcademica, ExperienciaProfissional, Projeto
+from .schemas import (
+    UserInteresseSchema, UserHabilidadeSchema, UserFormacaoAcademicaSchema,
+    UserExperienciaProfissionalSchema, UserProjetoSchema, UserSchema, ProfileFieldsSchema, user_schema_subset
+)
+
+# Relations nested in UserSchema: (related_name, model, nested schema, fk column needed by the prefetch join)
+PROFILE_RELATIONS = (
+    ('interesses', Interesse, UserInteresseSchema, None),
+    ('habilidades', Habilidade, UserHabilidadeSchema, 'user'),
+    ('formacoes_academicas', FormacaoAcademica, UserFormacaoAcademicaSchema, 'user'),
+    ('experiencias_profissionais', ExperienciaProfissional, UserExperienciaProfissionalSchema, 'user'),
+    ('projetos', Projeto, UserProjetoSchema, 'user'),
+)
+
+
+def profile_prefetches():
+    # Only load the columns the nested schemas serialize
+    prefetches = []
+    for related_name, model, schema, fk in PROFILE_RELATIONS:
+        fields = list(schema.model_fields)
+        if fk:
+            fields.append(fk)
+        prefetches.append(Prefetch(related_name, queryset=model.objects.only(*fields)))
+    return prefetches
+
+
+PROFILE_RELATION_NAMES = tuple(related_name for related_name, *_ in PROFILE_RELATIONS)
+PROFILE_USER_FIELDS = tuple(name for name in UserSchema.model_fields if name not in PROFILE_RELATION_NAMES)
+
+
+class ProfileSelection(NamedTuple):
+    # In the order of UserSchema, id always included
+    fields: Tuple[str, ...]
+    relations: Tuple[str, ...]
+
+
+def split_names(value: Optional[str]) -> List[str]:
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def profile_selection(query: ProfileFieldsSchema) -> Optional[ProfileSelection]:
+    """The ?fields= and ?expand= of a request, None when the whole profile was asked."""
+    if query.fields is None and query.expand is None:
+        return None
+    fields, expand = split_names(query.fields), split_names(query.expand)
+    unknown = set(fields + expand) - set(UserSchema.model_fields)
+    if unknown:
+        raise ParseError(f'Campos desconhecidos: {", ".join(sorted(unknown))}.')
+    # The lists can also be asked in fields
+    requested = set(fields or PROFILE_USER_FIELDS) | {'id'}
+    return ProfileSelection(
+        fields=tuple(name for name in PROFILE_USER_FIELDS if name in requested),
+        relations=tuple(name for name in PROFILE_RELATION_NAMES if name in requested or name in expand),
+    )
+
+
+def selected_profiles(queryset, selection: ProfileSelection) -> List[dict]:
+    """The users of `queryset` with only the selected columns and relations loaded and serialized."""
+    schema = user_schema_subset(selection.fields + selection.relations)
+    prefetches = [prefetch for prefetch in profile_prefetches() if prefetch.prefetch_to in selection.relations]
+    users = queryset.only(*selection.fields).prefetch_related(*prefetches)
+    return [schema.from_orm(user).model_dump(mode='json') for user in users]
+
+
+def profile_queryset(queryset=None):
+    if queryset is None:
+        queryset = User.objects.all()
+    return queryset.prefetch_related(*profile_prefetches())
+
+
+def load_profile(user: User) -> User:
+    # Fills the relation caches of an already loaded user (e.g. request.user)
+    prefetch_related_objects([user], *profile_prefetches())
+    return user
+
+
+class UserModelService(ModelService):
+    def get_user(self, pk: any) -> User:
+        try:
+            return User.objects.get(pk=pk)
+        except User.DoesNotExist:
+            raise NotFound()
+
+    def get_one(self, pk: any, **kwargs: any) -> User:
+        try:
+            return profile_queryset().get(pk=pk)
+        except User.DoesNotExist:
+            raise NotFound()
+
+    def get_all(self, **kwargs: any):
+        return profile_queryset()
+
+    def create(self, schema, **kwargs: any) -> User:
+        # The admin schemas come from ninja_schema, which turns the choices into Enums: dumped as JSON to save their
+        # values. create_user hashes the password
+        data = {**schema.model_dump(mode='json', by_alias=True), **kwargs}
+        return load_profile(User.objects.create_user(**data))
+
+    def update(self, instance, schema, **kwargs: any):
+        # Also used by the update routes of the profile items
+        data = {**schema.model_dump(mode='json', exclude_none=True), **kwargs}
+        password = data.pop('password', None)
+        for attr, value in data.items():
+            setattr(instance, attr, value)
+        if password:
+            instance.set_password(password)
+        instance.save()
+        return instance
@@ -0,0 +1,208 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .auth import invalidate_principal
+from .models import (
+    RELATIONSHIP_USER_FIELDS, User, Interesse, Habilidade, FormacaoAcademica, ExperienciaProfissional, Projeto
+)
+from .response_cache import GLOBAL_SCOPE, bump_version, invalidate_user, invalidate_users
+from .search import update_search_document, update_search_documents, delete_search_document
+from .snapshots import SNAPSHOT_USER_FIELDS, rebuild_snapshot, rebuild_snapshots
+from .stats import STAT_USER_FIELDS, update_user_stats
+from .tokens import set_current_profile_version
+from .utils import batched
+
+PROFILE_CHILD_MODELS = (Habilidade, FormacaoAcademica, ExperienciaProfissional, Projeto)
+# Changing one of these or the password revokes the user's tokens
+TOKEN_REVOKING_FIELDS = ('is_staff', 'is_superuser', 'is_active')
+# Shown in the member lists of the interests
+MEMBER_FIELDS = tuple(field for field in RELATIONSHIP_USER_FIELDS if field != 'id')
+
+_deferred_user_ids: ContextVar = ContextVar('deferred_profile_changes', default=None)
+
+
+@contextmanager
+def defer_profile_changes():
+    """
+    Collects the profile changes of the block and rebuilds the users once when it exits, in batches, for bulk writes.
+
+    bulk_create and bulk_update send no signals, the block should call `profile_changed` for the users it writes.
+    Nested blocks join the outermost one.
+    """
+    if _deferred_user_ids.get() is not None:
+        yield
+        return
+
+    user_ids = set()
+    token = _deferred_user_ids.set(user_ids)
+    try:
+        yield
+    finally:
+        _deferred_user_ids.reset(token)
+    profiles_changed(user_ids)
+
+
+def now_and_on_commit(func, *args):
+    # Invalidates now for the reads of this transaction and again once it commits: a concurrent read in between
+    # cached the old rows under the version bumped first
+    func(*args)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(func, *args))
+
+
+def profiles_changed(user_ids: Iterable[int]):
+    # profile_changed for many users, with the same queries per chunk whatever its size
+    for chunk in batched(user_ids, 500):
+        update_search_documents(chunk)
+        rebuild_snapshots(chunk)
+        update_user_stats(chunk)
+        now_and_on_commit(invalidate_users, chunk)
+
+
+def profile_changed(user_id: int):
+    # Everything derived from the profile relations
+    deferred = _deferred_user_ids.get()
+    if deferred is not None:
+        deferred.add(user_id)
+        return
+    update_search_document(user_id)
+    rebuild_snapshot(user_id)
+    update_user_stats([user_id])
+    now_and_on_commit(invalidate_user, user_id)
+
+
+def is_user_deletion(origin) -> bool:
+    # Rows cascading from a user delete need no rebuild, and rebuilding would recreate rows for the deleted user
+    if isinstance(origin, QuerySet):
+        return origin.model is User
+    return isinstance(origin, User)
+
+
+def interest_members_changed():
+    # The interests embed some of their users, in the responses of every user
+    now_and_on_commit(bump_version, GLOBAL_SCOPE)
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance: User, raw: bool = False, update_fields=None, **kwargs):
+    instance._revokes_tokens = False
+    instance._member_changed = False
+    if raw or instance._state.adding:
+        return
+    # Set by set_password, not by the rehash on login, which keeps the password
+    password_set = instance._password is not None and (update_fields is None or 'password' in update_fields)
+    fields = [field for field in (*TOKEN_REVOKING_FIELDS, *MEMBER_FIELDS)
+              if update_fields is None or field in update_fields]
+    old = dict(zip(fields, User.objects.filter(pk=instance.pk).values_list(*fields).first() or ())) if fields else {}
+    changed = {field for field, value in old.items() if value != getattr(instance, field)}
+    instance._revokes_tokens = password_set or bool(changed.intersection(TOKEN_REVOKING_FIELDS))
+    instance._member_changed = bool(changed.intersection(MEMBER_FIELDS))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance: User, raw: bool = False, update_fields=None, **kwargs):
+    # Skips fixture loading and saves that can't change the documents, like the last_login update on login
+    if raw:
+        return
+    if getattr(instance, '_revokes_tokens', False):
+        # Through update() so it's written whatever update_fields the save had
+        User.objects.filter(pk=instance.pk).update(profile_version=F('profile_version') + 1)
+        instance.profile_version = User.objects.filter(pk=instance.pk).values_list('profile_version', flat=True)[0]
+        now_and_on_commit(set_current_profile_version, instance.pk,
+                          instance.profile_version if instance.is_active else None)
+    if update_fields is None or 'resumo' in update_fields:
+        update_search_document(instance.pk)
+    if update_fields is None or SNAPSHOT_USER_FIELDS.intersection(update_fields):
+        rebuild_snapshot(instance.pk)
+    if update_fields is None or STAT_USER_FIELDS.intersection(update_fields):
+        update_user_stats([instance.pk])
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        # Also covers the permission flags, the cached responses were allowed for the old ones
+        now_and_on_commit(invalidate_user, instance.pk)
+        now_and_on_commit(invalidate_principal, instance.pk)
+    if getattr(instance, '_member_changed', False):
+        interest_members_changed()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance: User, **kwargs):
+    delete_search_document(instance.pk)
+    update_user_stats([instance.pk])
+    now_and_on_commit(invalidate_user, instance.pk)
+    now_and_on_commit(invalidate_principal, instance.pk)
+    now_and_on_commit(set_current_profile_version, instance.pk, None)
+    # Left the member lists of its interests
+    interest_members_changed()
+
+
+def profile_child_saved(sender, instance, raw: bool = False, **kwargs):
+    if instance.user_id and not raw:
+        profile_changed(instance.user_id)
+
+
+def profile_child_deleted(sender, instance, origin=None, **kwargs):
+    if instance.user_id and not is_user_deletion(origin):
+        profile_changed(instance.user_id)
+
+
+for model in PROFILE_CHILD_MODELS:
+    post_save.connect(profile_child_saved, sender=model, dispatch_uid=f'profile_{model.__name__}_saved')
+    post_delete.connect(profile_child_deleted, sender=model, dispatch_uid=f'profile_{model.__name__}_deleted')
+
+
+@receiver(pre_save, sender=Interesse)
+def interesse_saving(sender, instance: Interesse, **kwargs):
+    old_nome = Interesse.objects.filter(pk=instance.pk).values_list('nome', flat=True).first() if instance.pk else None
+    instance._renamed = old_nome is not None and old_nome != instance.nome
+
+
+@receiver(post_save, sender=Interesse)
+def interesse_saved(sender, instance: Interesse, **kwargs):
+    # A renamed interest changes the profile of every user that has it
+    if getattr(instance, '_renamed', False):
+        interest_members_changed()
+        with defer_profile_changes():
+            for user_id in instance.users.values_list('id', flat=True):
+                profile_changed(user_id)
+
+
+@receiver(pre_delete, sender=Interesse)
+def interesse_deleting(sender, instance: Interesse, **kwargs):
+    # The through rows are gone by post_delete
+    instance._deleted_user_ids = list(instance.users.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Interesse)
+def interesse_deleted(sender, instance: Interesse, **kwargs):
+    interest_members_changed()
+    with defer_profile_changes():
+        for user_id in getattr(instance, '_deleted_user_ids', []):
+            profile_changed(user_id)
+
+
+@receiver(m2m_changed, sender=Interesse.users.through)
+def interesse_users_changed(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        # The cleared users are only known before the clear
+        instance._cleared_user_ids = list(instance.users.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        user_ids = [instance.pk]
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_user_ids', [])
+    else:
+        user_ids = pk_set or []
+    if user_ids:
+        interest_members_changed()
+    for user_id in user_ids:
+        profile_changed(user_id)
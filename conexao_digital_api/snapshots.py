@@ -0,0 +1,77 @@
+import hashlib
+from typing import Iterable, Optional
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from ninja_extra.exceptions import NotFound
+
+from .models import User, UserProfileSnapshot
+from .schemas import UserSchema
+from .serialization import json_response, profile_values
+from .services import ProfileSelection, selected_profiles
+
+# User columns serialized by UserSchema, saves touching only other columns keep the snapshot
+SNAPSHOT_USER_FIELDS = frozenset(UserSchema.model_fields) & {field.attname for field in User._meta.concrete_fields}
+# Changes with the shape of UserSchema, the thumbnails of the avatar included
+SNAPSHOT_VERSION = hashlib.sha256(orjson.dumps(
+    [UserSchema.model_json_schema(), settings.AVATAR_THUMBNAIL_SIZES], option=orjson.OPT_SORT_KEYS
+)).hexdigest()[:16]
+
+
+def rebuild_snapshots(user_ids: Iterable[int]):
+    user_ids = set(user_ids)
+    snapshots = [UserProfileSnapshot(user_id=user_id, data=orjson.dumps(profile), schema_version=SNAPSHOT_VERSION)
+                 for user_id, profile in profile_values(user_ids).items()]
+    UserProfileSnapshot.objects.bulk_create(snapshots, update_conflicts=True, unique_fields=['user'],
+                                            update_fields=['data', 'schema_version', 'updated_at'])
+    missing = user_ids - {snapshot.user_id for snapshot in snapshots}
+    if missing:
+        UserProfileSnapshot.objects.filter(pk__in=missing).delete()
+
+
+def rebuild_snapshot(user_id: int):
+    rebuild_snapshots([user_id])
+
+
+def current_snapshots():
+    return UserProfileSnapshot.objects.filter(schema_version=SNAPSHOT_VERSION)
+
+
+def get_profile_bytes(user_id: int) -> Optional[bytes]:
+    data = current_snapshots().filter(pk=user_id).values_list('data', flat=True).first()
+    if data is None:
+        # Users created before the snapshots existed or snapshots of an older UserSchema, built on first read
+        rebuild_snapshot(user_id)
+        data = current_snapshots().filter(pk=user_id).values_list('data', flat=True).first()
+    return bytes(data) if data is not None else None
+
+
+def selected_profile_response(user_id: int, selection: ProfileSelection) -> HttpResponse:
+    # The snapshots hold whole profiles, the narrow ones are read from the tables
+    profiles = selected_profiles(User.objects.filter(pk=user_id), selection)
+    if not profiles:
+        raise NotFound()
+    return json_response(profiles[0])
+
+
+def profile_response(user_id: int, selection: Optional[ProfileSelection] = None) -> HttpResponse:
+    # Serves the stored JSON as is, without loading the relations or validating the schema
+    if selection:
+        return selected_profile_response(user_id, selection)
+    data = get_profile_bytes(user_id)
+    if data is None:
+        raise NotFound()
+    return HttpResponse(data, content_type='application/json')
+
+
+async def aprofile_response(user_id: int, selection: Optional[ProfileSelection] = None) -> HttpResponse:
+    if selection:
+        return await sync_to_async(selected_profile_response)(user_id, selection)
+    data = await current_snapshots().filter(pk=user_id).values_list('data', flat=True).afirst()
+    if data is None:
+        data = await sync_to_async(get_profile_bytes)(user_id)
+        if data is None:
+            raise NotFound()
+    return HttpResponse(bytes(data), content_type='application/json')
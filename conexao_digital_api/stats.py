@@ -0,0 +1,168 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import connection, transaction
+
+from .models import User, Interesse, Habilidade, FormacaoAcademica, StatRollup, UserStatKeys
+from .utils import batched
+
+# Ordered by key instead of by users
+AGE_BUCKETS = ((17, 'até 17'), (24, '18-24'), (34, '25-34'), (44, '35-44'), (59, '45-59'), (None, '60+'))
+ORDERED_DIMENSIONS = {
+    'idade': [label for _, label in AGE_BUCKETS],
+    'deficiencia': ['true', 'false'],
+}
+NUMERIC_DIMENSIONS = ('nivel', 'semestre')
+# The User fields stat_keys reads, saving others leaves the counts as they are
+STAT_USER_FIELDS = frozenset(('genero', 'deficiencia', 'idade', 'is_active', 'is_staff', 'is_superuser'))
+
+# The /admin/stats/{dimension} names of the StatRollup dimensions
+DIMENSIONS = {
+    'genero': 'genero',
+    'deficiencia': 'deficiencia',
+    'idade': 'idade',
+    'interesses': 'interesse',
+    'habilidades': 'habilidade',
+    'niveis': 'nivel',
+    'cursos': 'curso',
+    'instituicoes': 'instituicao',
+    'semestres': 'semestre',
+}
+
+
+def counted_users():
+    # The talent base, like the search: no staff nor deactivated accounts
+    return User.objects.filter(is_active=True, is_staff=False, is_superuser=False)
+
+
+def age_bucket(idade: Optional[int]) -> str:
+    for limit, label in AGE_BUCKETS:
+        if limit is None or (idade or 0) <= limit:
+            return label
+
+
+def stat_keys(user_ids: Iterable[int]) -> Dict[int, Tuple[bool, Set[tuple]]]:
+    """The deficiencia flag and the (dimension, key, subkey) rows of each counted user of `user_ids`."""
+    keys = {}
+    for user_id, genero, deficiencia, idade in counted_users().filter(pk__in=user_ids).values_list(
+            'id', 'genero', 'deficiencia', 'idade'):
+        keys[user_id] = (deficiencia, {
+            ('genero', genero or '', ''),
+            ('deficiencia', 'true' if deficiencia else 'false', ''),
+            ('idade', age_bucket(idade), ''),
+        })
+
+    for user_id, nome in Interesse.users.through.objects.filter(user_id__in=keys).values_list(
+            'user_id', 'interesse__nome'):
+        keys[user_id][1].add(('interesse', nome, ''))
+    for user_id, nome, nivel in Habilidade.objects.filter(user_id__in=keys).values_list('user_id', 'nome', 'nivel'):
+        keys[user_id][1].update({('habilidade', nome, ''), ('habilidade', nome, str(nivel)), ('nivel', str(nivel), '')})
+    for user_id, curso, instituicao, semestre in FormacaoAcademica.objects.filter(user_id__in=keys).values_list(
+            'user_id', 'curso', 'instituicao', 'semestre'):
+        keys[user_id][1].update({('curso', curso, ''), ('curso', curso, instituicao), ('instituicao', instituicao, ''),
+                                 ('semestre', str(semestre), '')})
+    return keys
+
+
+def apply_deltas(deltas: Dict[tuple, List[int]]):
+    # One upsert adding the deltas, the rows reaching 0 stay until the next reconcile
+    rows = [(*key, users, users_deficiencia) for key, (users, users_deficiencia) in deltas.items()
+            if users or users_deficiencia]
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(StatRollup._meta.db_table)
+    columns = [quote(StatRollup._meta.get_field(name).column)
+               for name in ('dimension', 'key', 'subkey', 'users', 'users_deficiencia')]
+    users, users_deficiencia = columns[3:]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} ({", ".join(columns)}) VALUES (%s, %s, %s, %s, %s) '
+            f'ON CONFLICT ({", ".join(columns[:3])}) DO UPDATE SET {users} = {table}.{users} + excluded.{users}, '
+            f'{users_deficiencia} = {table}.{users_deficiencia} + excluded.{users_deficiencia}',
+            rows,
+        )
+
+
+def update_user_stats(user_ids: Iterable[int]):
+    """Moves the counts of `user_ids` from the rows they were counted in to the rows of their current profile."""
+    user_ids = set(user_ids)
+    with transaction.atomic():
+        # Locked so concurrent updates of the same user apply their differences one after the other
+        stored = {row.user_id: row for row in UserStatKeys.objects.select_for_update().filter(user_id__in=user_ids)}
+        current = stat_keys(user_ids)
+
+        deltas = defaultdict(lambda: [0, 0])
+        for user_id in user_ids:
+            if user_id in stored:
+                for key in stored[user_id].keys:
+                    deltas[tuple(key)][0] -= 1
+                    deltas[tuple(key)][1] -= stored[user_id].deficiencia
+            deficiencia, keys = current.get(user_id, (False, ()))
+            for key in keys:
+                deltas[key][0] += 1
+                deltas[key][1] += deficiencia
+        apply_deltas(deltas)
+
+        UserStatKeys.objects.bulk_create(
+            [UserStatKeys(user_id=user_id, keys=sorted(keys), deficiencia=deficiencia)
+             for user_id, (deficiencia, keys) in current.items()],
+            update_conflicts=True, unique_fields=['user_id'], update_fields=['keys', 'deficiencia'],
+        )
+        UserStatKeys.objects.filter(user_id__in=user_ids - current.keys()).delete()
+
+
+def reconcile_stats(chunk_size: int = 1000) -> int:
+    """Recounts every rollup from the tables, returns how many rows were wrong."""
+    totals = defaultdict(lambda: [0, 0])
+    with transaction.atomic():
+        UserStatKeys.objects.all().delete()
+        user_ids = counted_users().order_by().values_list('id', flat=True).iterator(chunk_size=chunk_size)
+        for chunk in batched(user_ids, chunk_size):
+            current = stat_keys(chunk)
+            UserStatKeys.objects.bulk_create([UserStatKeys(user_id=user_id, keys=sorted(keys), deficiencia=deficiencia)
+                                              for user_id, (deficiencia, keys) in current.items()])
+            for deficiencia, keys in current.values():
+                for key in keys:
+                    totals[key][0] += 1
+                    totals[key][1] += deficiencia
+
+        old = {(dimension, key, subkey): [users, users_deficiencia]
+               for dimension, key, subkey, users, users_deficiencia in StatRollup.objects.values_list(
+                   'dimension', 'key', 'subkey', 'users', 'users_deficiencia') if users or users_deficiencia}
+        wrong = sum(old.get(key) != counts for key, counts in totals.items()) + len(old.keys() - totals.keys())
+        StatRollup.objects.all().delete()
+        StatRollup.objects.bulk_create([StatRollup(dimension=dimension, key=key, subkey=subkey, users=users,
+                                                   users_deficiencia=users_deficiencia)
+                                        for (dimension, key, subkey), (users, users_deficiencia) in totals.items()],
+                                       batch_size=chunk_size)
+    return wrong
+
+
+def sort_key(dimension: str):
+    if dimension in ORDERED_DIMENSIONS:
+        order = ORDERED_DIMENSIONS[dimension]
+        return lambda row: order.index(row['key']) if row['key'] in order else len(order)
+    if dimension in NUMERIC_DIMENSIONS:
+        return lambda row: int(row['key'])
+    return lambda row: (-row['users'], row['key'])
+
+
+def get_stats(dimension: str, limit: int) -> List[dict]:
+    """
+    The users per key of a StatRollup dimension, the most common `limit` keys first, or in the order of the
+    dimension (age buckets, niveis, semestres). Each key has its breakdown when the dimension has one.
+    """
+    rows = StatRollup.objects.filter(dimension=dimension, users__gt=0)
+    fields = ('key', 'users', 'users_deficiencia')
+    if dimension in ORDERED_DIMENSIONS or dimension in NUMERIC_DIMENSIONS:
+        top = sorted(rows.filter(subkey='').values(*fields), key=sort_key(dimension))[:limit]
+    else:
+        top = list(rows.filter(subkey='').order_by('-users', 'key').values(*fields)[:limit])
+
+    breakdowns = defaultdict(list)
+    for row in rows.filter(key__in=[row['key'] for row in top]).exclude(subkey='').values('subkey', *fields):
+        breakdowns[row.pop('key')].append({'key': row.pop('subkey'), **row})
+    for row in top:
+        row['breakdown'] = sorted(breakdowns[row['key']], key=lambda item: (-item['users'], item['key']))
+    return top
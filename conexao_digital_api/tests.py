@@ -1,3 +1,1593 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+
+from dj_ninja_auth.jwt.tokens import RefreshToken
+from ninja_extra import NinjaExtraAPI, api_controller
+from PIL import Image
+
+from .api import AsyncMeReadController
+from .auth import CachedJWTAuth, build_principal, principal_cache, principal_scope
+from .avatars import avatar_names, process_avatar
+from .benchmarks import CALLS, PROFILE_SERIALIZERS, compare, route_keys, run_benchmarks, run_serialization_benchmark
+from .emails import RateLimiter, send_bulk_email, process_queue
+from .imports import import_profiles
+from .management.commands.benchmark_hashers import CANDIDATES
+from .tokens import ClaimsAccessToken, ClaimsRefreshToken
+from .schemas import (
+    UserSchema, HabilitadeSchema, FormacaoAcademicaSchema, ExperienciaProfissionalSchema, ProjetoSchema,
+    user_schema_subset
+)
+from .search import search_users, update_search_document
+from .snapshots import SNAPSHOT_VERSION
+from .stats import reconcile_stats
+from .serialization import profile_values
+from .services import load_profile, profile_queryset
+from .seeding import generate_profile, seed_email, seed_profiles
+from .permissions import HasActiveClaim, HasStaffClaim
+from .response_cache import GLOBAL_SCOPE, PROFILES_SCOPE, get_versions
+from .serialization import ORJSONParser
+from .timing import RollingHistogram, TimedJSONRenderer, histogram
+from .models import (
+    User, Interesse, Habilidade, FormacaoAcademica, ExperienciaProfissional, Projeto, EmailBatch, UserProfileSnapshot,
+    EmailJob, StatRollup
+)
+
+
+def create_profile(index: int) -> User:
+    user = User.objects.create_user(
+        email=f'user{index}@example.com',
+        password='senha-segura-123',
+        nome=f'Usuário {index}',
+        idade=20 + index % 30,
+        genero='O',
+        telefone='11999999999',
+    )
+    interesse, _ = Interesse.objects.get_or_create(nome=f'Interesse {index % 3}')
+    interesse.users.add(user)
+    Habilidade.objects.create(nome='Python', nivel=2, user=user)
+    FormacaoAcademica.objects.create(curso='Computação', instituicao='USP', ano_inicio=2020,
+                                     ano_conclusao=2024, semestre=4, user=user)
+    ExperienciaProfissional.objects.create(cargo='Dev', empresa='ACME', ano_inicio=2021, ano_fim=2023, user=user)
+    Projeto.objects.create(nome='Portfolio', link='https://example.com', user=user)
+    return user
+
+
+def auth_header(user: User) -> dict:
+    return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+
+class ProfileQueryCountTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', password='senha-segura-123', nome='Admin', idade=30, genero='O',
+            telefone='11999999999',
+        )
+
+    def count_queries(self, url: str, user: User) -> int:
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, **auth_header(user))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_admin_list_query_count_is_constant(self):
+        for i in range(2):
+            create_profile(i)
+        few = self.count_queries('/api/v1/admin/users/', self.admin)
+
+        for i in range(2, 12):
+            create_profile(i)
+        many = self.count_queries('/api/v1/admin/users/', self.admin)
+
+        self.assertEqual(few, many)
+
+    def test_profile_payload_includes_relations(self):
+        user = create_profile(0)
+        response = self.client.get('/api/v1/me', **auth_header(user))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([h['nome'] for h in data['habilidades']], ['Python'])
+        self.assertEqual([i['nome'] for i in data['interesses']], ['Interesse 0'])
+        self.assertEqual(len(data['projetos']), 1)
+
+    def test_retrieve_query_count_does_not_grow_with_profile_size(self):
+        user = create_profile(0)
+        few = self.count_queries(f'/api/v1/admin/users/{user.id}', self.admin)
+
+        for i in range(10):
+            Habilidade.objects.create(nome=f'Habilidade {i}', nivel=1, user=user)
+            Projeto.objects.create(nome=f'Projeto {i}', link='https://example.com', user=user)
+        many = self.count_queries(f'/api/v1/admin/users/{user.id}', self.admin)
+
+        self.assertEqual(few, many)
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        self.user = create_profile(0)
+        for i in range(5):
+            Habilidade.objects.create(nome=f'Habilidade {i}', nivel=1, user=self.user)
+
+    def get_page(self, cursor: str = None) -> dict:
+        params = {'page_size': 2}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get('/api/v1/me/habilidades', params, **auth_header(self.user))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_walks_all_pages_in_order(self):
+        page = self.get_page()
+        self.assertIsNone(page['previous'])
+        names = [h['nome'] for h in page['results']]
+        while page['next']:
+            page = self.get_page(page['next'])
+            names += [h['nome'] for h in page['results']]
+        self.assertEqual(names, sorted(Habilidade.objects.filter(user=self.user).values_list('nome', flat=True)))
+
+    def test_pages_are_stable_under_inserts(self):
+        first = self.get_page()
+        # Sorts before every row already returned
+        Habilidade.objects.create(nome='AAA', nivel=1, user=self.user)
+        second = self.get_page(first['next'])
+        self.assertEqual([h['nome'] for h in second['results']], ['Habilidade 2', 'Habilidade 3'])
+
+    def test_previous_cursor_returns_previous_page(self):
+        first = self.get_page()
+        second = self.get_page(first['next'])
+        back = self.get_page(second['previous'])
+        self.assertEqual(back['results'], first['results'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/me/habilidades', {'cursor': 'invalido'}, **auth_header(self.user))
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_DISPATCH_WORKERS=0,
+                   EMAIL_DISPATCH_BATCH_SIZE=2, EMAIL_QUEUE_MAX_ATTEMPTS=2)
+class EmailQueueTest(TestCase):
+    def setUp(self):
+        for i in range(3):
+            create_profile(i)
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', password='senha-segura-123', nome='Admin', idade=30, genero='O',
+            telefone='11999999999',
+        )
+
+    def get_job(self, job_id: int) -> dict:
+        response = self.client.get(f'/api/v1/send-email/{job_id}', **auth_header(self.admin))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_sends_one_message_per_recipient_and_dedupes(self):
+        response = self.client.post(
+            '/api/v1/send-email',
+            {'subject': 'Oi', 'message': 'Mensagem', 'emails': ['user0@example.com', 'extra@example.com']},
+            content_type='application/json', **auth_header(self.admin),
+        )
+        self.assertEqual(response.status_code, 200)
+        job = response.json()
+        self.assertEqual(job['status'], 'pending')
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(process_queue(), 2)
+
+        job = self.get_job(job['id'])
+        self.assertEqual((job['status'], job['recipients'], job['sent'], job['failed']), ('finished', 4, 4, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         ['extra@example.com', 'user0@example.com', 'user1@example.com', 'user2@example.com'])
+
+    def test_only_staff_send_and_follow_jobs(self):
+        user = User.objects.get(email='user0@example.com')
+        response = self.client.post('/api/v1/send-email', {'subject': 'Oi', 'message': 'Mensagem'},
+                                    content_type='application/json', **auth_header(user))
+        self.assertEqual(response.status_code, 403)
+        job = send_bulk_email('Oi', 'Mensagem')
+        self.assertEqual(self.client.get(f'/api/v1/send-email/{job.pk}', **auth_header(user)).status_code, 403)
+        self.assertEqual(EmailJob.objects.count(), 1)
+
+    def test_filters_are_applied_by_the_worker(self):
+        job = send_bulk_email('Oi', 'Mensagem', filters={'idade_menor_que': 20})
+        process_queue()
+        self.assertEqual([m.to for m in mail.outbox], [['user0@example.com']])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'finished')
+
+    @override_settings(EMAIL_DISPATCH_MODE='bcc')
+    def test_bcc_mode_batches_recipients(self):
+        user_ids = list(User.objects.filter(is_staff=False).values_list('pk', flat=True))
+        send_bulk_email('Oi', 'Mensagem', user_ids=user_ids)
+        process_queue()
+        self.assertEqual(sorted(len(m.bcc) for m in mail.outbox), [1, 2])
+
+    def test_failed_batches_are_retried_with_backoff(self):
+        job = send_bulk_email('Oi', 'Mensagem', extra_emails=['a@example.com'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            process_queue()
+        batch = EmailBatch.objects.get(job=job)
+        self.assertEqual((batch.status, batch.attempts), ('pending', 1))
+        self.assertGreater(batch.run_after, timezone.now())
+
+        # Not due yet
+        self.assertEqual(process_queue(), 0)
+
+        EmailBatch.objects.filter(pk=batch.pk).update(run_after=timezone.now())
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            process_queue()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.failed, job.sent), ('failed', 1, 0))
+
+    def test_job_with_failed_batches_is_partial(self):
+        # Batches of 2: the 3 users, then a@example.com
+        job = send_bulk_email('Oi', 'Mensagem', filters={}, extra_emails=['a@example.com'])
+        real_send = mail.backends.locmem.EmailBackend.send_messages
+
+        def send_messages(backend, messages):
+            if any(message.to == ['a@example.com'] for message in messages):
+                raise OSError('down')
+            return real_send(backend, messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', send_messages):
+            process_queue()
+            EmailBatch.objects.filter(job=job, status='pending').update(run_after=timezone.now())
+            process_queue()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.failed, job.sent), ('partial', 2, 2))
+
+    @override_settings(EMAIL_DISPATCH_MODE='bcc')
+    def test_rate_limit_counts_recipients(self):
+        rate_limiter = mock.Mock()
+        send_bulk_email('Oi', 'Mensagem', extra_emails=['a@example.com', 'b@example.com'])
+        process_queue(rate_limiter)
+        self.assertEqual(sorted(call.args[0] for call in rate_limiter.acquire.call_args_list), [2])
+
+    def test_rate_limiter_charges_batches_larger_than_the_limit(self):
+        clock = [0.0]
+        with mock.patch('conexao_digital_api.emails.time') as fake_time:
+            fake_time.monotonic.side_effect = lambda: clock[0]
+            fake_time.sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+            rate_limiter = RateLimiter(60)
+            rate_limiter.acquire(100)
+            # The first 60 were in the bucket, the other 40 take 40 s to refill
+            self.assertAlmostEqual(clock[0], 40)
+            rate_limiter.acquire(60)
+            self.assertAlmostEqual(clock[0], 100)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_DISPATCH_WORKERS=0,
+                   EMAIL_DISPATCH_BATCH_SIZE=2)
+class EmailWorkerCommandTest(TransactionTestCase):
+    # The worker threads use their own connections, so the jobs must be committed. The shared-cache
+    # in-memory SQLite test database locks whole tables, hence a single thread.
+
+    def test_drains_queue(self):
+        send_bulk_email('Oi', 'Mensagem', extra_emails=['a@example.com', 'b@example.com', 'c@example.com'])
+        call_command('email_worker', '--once', '--concurrency', '1', stdout=StringIO())
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['a@example.com', 'b@example.com', 'c@example.com'])
+
+
+class TalentSearchTest(TestCase):
+    def setUp(self):
+        self.python_dev = create_profile(0)
+        self.other = create_profile(1)
+        Habilidade.objects.filter(user=self.other).update(nome='Design')
+        # update() skips the signals
+        update_search_document(self.other.pk)
+        self.recruiter = create_profile(2)
+        self.recruiter.is_staff = True
+        self.recruiter.save()
+
+    def search(self, q: str) -> list:
+        response = self.client.get('/api/v1/search/users', {'q': q}, **auth_header(self.recruiter))
+        self.assertEqual(response.status_code, 200)
+        return [user['id'] for user in response.json()['results']]
+
+    def test_only_staff_search_active_users(self):
+        response = self.client.get('/api/v1/search/users', {'q': 'python'}, **auth_header(self.python_dev))
+        self.assertEqual(response.status_code, 403)
+        self.other.is_active = False
+        self.other.save()
+        self.assertEqual(self.search('Computação'), [self.python_dev.pk])
+
+    def test_matches_relations_once_per_user(self):
+        Habilidade.objects.create(nome='Python avançado', nivel=3, user=self.python_dev)
+        self.assertEqual(self.search('python'), [self.python_dev.pk])
+        self.assertCountEqual(self.search('Computação'), [self.python_dev.pk, self.other.pk])
+
+    def test_ranks_better_matches_first(self):
+        for i in range(3):
+            Projeto.objects.create(nome=f'Design {i}', link='https://example.com', user=self.python_dev)
+        self.assertEqual(self.search('design'), [self.python_dev.pk, self.other.pk])
+
+    def test_document_follows_changes(self):
+        projeto = Projeto.objects.create(nome='Robótica', link='https://example.com', user=self.other)
+        self.assertEqual(self.search('robótica'), [self.other.pk])
+
+        projeto.delete()
+        self.assertEqual(self.search('robótica'), [])
+
+        interesse = Interesse.objects.create(nome='Astronomia')
+        interesse.users.add(self.python_dev)
+        self.assertEqual(self.search('astronomia'), [self.python_dev.pk])
+
+        interesse.nome = 'Música'
+        interesse.save()
+        self.assertEqual(self.search('astronomia'), [])
+        self.assertEqual(self.search('música'), [self.python_dev.pk])
+
+        self.python_dev.interesses.remove(interesse)
+        self.assertEqual(self.search('música'), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('python "'), [self.python_dev.pk])
+        self.assertEqual(self.search('***'), [])
+
+
+class ProfileSnapshotTest(TestCase):
+    def setUp(self):
+        self.user = create_profile(0)
+
+    def get_me(self) -> dict:
+        response = self.client.get('/api/v1/me', **auth_header(self.user))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_read_is_served_from_snapshot(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.get_me()
+        # two auth queries + snapshot
+        self.assertEqual(len(ctx), 3)
+        self.assertEqual(data['email'], self.user.email)
+        self.assertEqual([p['nome'] for p in data['projetos']], ['Portfolio'])
+
+    def test_snapshot_follows_profile_changes(self):
+        habilidade = Habilidade.objects.create(nome='Django', nivel=3, user=self.user)
+        self.assertEqual([h['nome'] for h in self.get_me()['habilidades']], ['Django', 'Python'])
+
+        habilidade.delete()
+        interesse = Interesse.objects.create(nome='Xadrez')
+        self.user.interesses.add(interesse)
+        data = self.get_me()
+        self.assertEqual([h['nome'] for h in data['habilidades']], ['Python'])
+        self.assertIn('Xadrez', [i['nome'] for i in data['interesses']])
+
+        payload = {'nome': self.user.nome, 'email': self.user.email, 'idade': 30, 'genero': 'O',
+                   'telefone': self.user.telefone, 'deficiencia': False, 'resumo': 'Novo resumo'}
+        response = self.client.put('/api/v1/me', payload, content_type='application/json', **auth_header(self.user))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_me()['resumo'], 'Novo resumo')
+
+    def test_missing_snapshot_is_built_on_read(self):
+        UserProfileSnapshot.objects.all().delete()
+        self.assertEqual(self.get_me()['id'], self.user.pk)
+        self.assertTrue(UserProfileSnapshot.objects.filter(pk=self.user.pk).exists())
+
+    def test_snapshot_of_another_schema_version_is_rebuilt(self):
+        expected = self.get_me()
+        UserProfileSnapshot.objects.update(data=b'{"avatar": "antigo"}', schema_version='antigo')
+        # Past the cached response
+        caches['api'].clear()
+        self.assertEqual(self.get_me(), expected)
+        self.assertEqual(UserProfileSnapshot.objects.get().schema_version, SNAPSHOT_VERSION)
+
+        UserProfileSnapshot.objects.update(schema_version='antigo')
+        out = StringIO()
+        call_command('rebuild_profiles', '--workers', '1', '--stale', stdout=out)
+        self.assertEqual(out.getvalue().strip(), '1 perfis reconstruídos.')
+        call_command('rebuild_profiles', '--workers', '1', '--stale', stdout=out)
+        self.assertIn('0 perfis reconstruídos.', out.getvalue())
+
+    def test_interest_rename_rebuilds_members_in_batch(self):
+        interesse = Interesse.objects.get(nome='Interesse 0')
+        create_profile(3)
+        interesse.nome = 'Renomeado'
+        with CaptureQueriesContext(connection) as few:
+            interesse.save()
+        for i in range(6, 16, 3):
+            create_profile(i)
+        interesse.nome = 'Renomeado de novo'
+        with CaptureQueriesContext(connection) as many:
+            interesse.save()
+        self.assertEqual(len(many), len(few))
+        self.assertEqual([item['nome'] for item in self.get_me()['interesses']], ['Renomeado de novo'])
+
+    def test_user_delete_removes_snapshot(self):
+        response = self.client.delete('/api/v1/me', **auth_header(self.user))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserProfileSnapshot.objects.exists())
+
+    def test_rebuild_command(self):
+        UserProfileSnapshot.objects.all().delete()
+        call_command('rebuild_profiles', '--workers', '1', stdout=StringIO())
+        self.assertTrue(UserProfileSnapshot.objects.filter(pk=self.user.pk).exists())
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        self.user = create_profile(1)
+        self.other = create_profile(2)
+
+    def get(self, url: str, user: User, **headers):
+        return self.client.get(url, **auth_header(user), **headers)
+
+    def test_etag_and_not_modified_without_queries(self):
+        response = self.get('/api/v1/me/habilidades', self.user)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get('/api/v1/me/habilidades', self.user, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # only the auth queries
+        self.assertEqual(len(ctx), 2)
+
+    def test_write_invalidates_only_the_affected_user(self):
+        etag = self.get('/api/v1/me', self.user)['ETag']
+        other_etag = self.get('/api/v1/me', self.other)['ETag']
+        self.assertNotEqual(etag, other_etag)
+
+        Habilidade.objects.create(nome='Django', nivel=3, user=self.user)
+
+        response = self.get('/api/v1/me', self.user, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Django', [h['nome'] for h in response.json()['habilidades']])
+        self.assertEqual(self.get('/api/v1/me', self.other, HTTP_IF_NONE_MATCH=other_etag).status_code, 304)
+
+    def test_query_params_are_part_of_the_key(self):
+        Habilidade.objects.create(nome='Django', nivel=3, user=self.user)
+        self.assertEqual(len(self.get('/api/v1/me/habilidades', self.user).json()['results']), 2)
+        self.assertEqual(len(self.get('/api/v1/me/habilidades?page_size=1', self.user).json()['results']), 1)
+
+    def test_admin_routes_are_scoped_to_the_path_user(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', password='senha-segura-123', nome='Admin', idade=30, genero='O',
+            telefone='11999999999',
+        )
+        url = f'/api/v1/admin/users/{self.user.pk}/habilidades'
+        etag = self.get(url, admin)['ETag']
+        Habilidade.objects.create(nome='Django', nivel=3, user=self.other)
+        self.assertEqual(self.get(url, admin, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Habilidade.objects.create(nome='Django', nivel=3, user=self.user)
+        response = self.get(url, admin, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+    def test_shared_entries_follow_only_the_users_they_show(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', password='senha-segura-123', nome='Admin', idade=30, genero='O',
+            telefone='11999999999',
+        )
+        # Shares Interesse 1 with self.user
+        member = create_profile(4)
+        etag = self.get('/api/v1/me/interesses', self.user)['ETag']
+        habilidade = Habilidade.objects.get(user=self.other)
+        item_url = f'/api/v1/admin/users/habilidades/{habilidade.pk}'
+        item_etag = self.get(item_url, admin)['ETag']
+
+        Habilidade.objects.create(nome='Django', nivel=3, user=member)
+        self.assertEqual(self.get('/api/v1/me/interesses', self.user, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.get(item_url, admin, HTTP_IF_NONE_MATCH=item_etag).status_code, 304)
+
+        habilidade.nivel = 5
+        habilidade.save()
+        self.assertEqual(self.get(item_url, admin, HTTP_IF_NONE_MATCH=item_etag).json()['nivel'], 5)
+        member.nome = 'Outro Nome'
+        member.save()
+        response = self.get('/api/v1/me/interesses', self.user, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Outro Nome', [user['nome'] for user in response.json()['results'][0]['users']['results']])
+
+    def test_writes_in_a_transaction_invalidate_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Habilidade.objects.create(nome='Django', nivel=3, user=self.user)
+            self.other.is_staff = True
+            self.other.nome = 'Novo Nome'
+            self.other.save()
+            # What a concurrent read before the commit would have cached the old rows under
+            scopes = [self.user.pk, principal_scope(self.other.pk), GLOBAL_SCOPE]
+            versions = get_versions(scopes)
+        self.assertTrue(all(new != old for new, old in zip(get_versions(scopes), versions)))
+
+    def test_cached_responses_check_the_permissions(self):
+        admin = create_profile(3)
+        admin.is_staff = True
+        admin.save()
+        url = f'/api/v1/admin/users/{self.user.pk}'
+        self.assertEqual(self.get(url, admin).status_code, 200)
+        with mock.patch.object(HasStaffClaim, 'has_permission', return_value=False):
+            self.assertEqual(self.get(url, admin).status_code, 403)
+
+    def test_write_by_another_process_expires(self):
+        etag = self.get('/api/v1/me/habilidades', self.user)['ETag']
+        # bulk_create sends no signals, like a write whose bump only reached another process's cache
+        Habilidade.objects.bulk_create([Habilidade(nome='Django', nivel=3, user=self.user)])
+        self.assertEqual(self.get('/api/v1/me/habilidades', self.user, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with mock.patch('time.time', return_value=time.time() + settings.API_CACHE_VERSION_TIMEOUT + 1):
+            response = self.get('/api/v1/me/habilidades', self.user, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class BulkProfileItemsTest(TestCase):
+    def setUp(self):
+        self.user = create_profile(1)
+
+    def send(self, method: str, path: str, payload):
+        return getattr(self.client, method)(f'/api/v1/me/{path}/bulk', payload, content_type='application/json',
+                                            **auth_header(self.user))
+
+    def test_bulk_create_takes_constant_queries(self):
+        payload = [{'nome': f'Projeto {i}', 'descricao': '', 'link': 'https://example.com'} for i in range(30)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.send('post', 'projetos', payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 30)
+        self.assertTrue(all(item['id'] for item in response.json()))
+        self.assertEqual(Projeto.objects.filter(user=self.user).count(), 31)
+        self.assertLess(len(ctx), 30)
+
+    def test_replace_diffs_against_existing_rows(self):
+        python = Habilidade.objects.get(user=self.user)
+        response = self.send('put', 'habilidades', [{'nome': 'Python', 'nivel': 2}, {'nome': 'Django', 'nivel': 3}])
+        self.assertEqual(response.status_code, 200)
+        ids = [item['id'] for item in response.json()]
+        self.assertEqual(ids[0], python.pk)
+
+        response = self.send('put', 'habilidades', [{'id': ids[1], 'nome': 'Django', 'nivel': 1}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(Habilidade.objects.filter(user=self.user).values_list('id', 'nivel')), [(ids[1], 1)])
+        data = self.client.get('/api/v1/me', **auth_header(self.user)).json()
+        self.assertEqual(data['habilidades'], [{'id': ids[1], 'nome': 'Django', 'nivel': 1}])
+
+    def test_unknown_id_writes_nothing(self):
+        other = Habilidade.objects.get(user=create_profile(2))
+        payload = [{'nome': 'Go', 'nivel': 1}, {'id': other.pk, 'nome': 'X', 'nivel': 1}]
+        response = self.send('post', 'habilidades', payload)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Habilidade.objects.filter(nome='Go').exists())
+        other.refresh_from_db()
+        self.assertEqual(other.nome, 'Python')
+
+
+class ProfileUpsertTest(TestCase):
+    def setUp(self):
+        self.user = create_profile(1)
+
+    def document(self, size: int) -> dict:
+        return {
+            'nome': self.user.nome, 'email': self.user.email, 'idade': 40, 'genero': 'O',
+            'telefone': self.user.telefone, 'deficiencia': False, 'resumo': 'Dev backend',
+            'interesses': [{'nome': f'Tema {i}'} for i in range(size)],
+            'habilidades': [{'nome': f'Habilidade {i}', 'nivel': 1} for i in range(size)],
+            'formacoes_academicas': [{'curso': f'Curso {i}', 'instituicao': 'USP', 'ano_inicio': 2020,
+                                      'ano_conclusao': 2024, 'semestre': 1} for i in range(size)],
+            'experiencias_profissionais': [{'cargo': f'Cargo {i}', 'empresa': 'ACME', 'ano_inicio': 2020,
+                                            'ano_fim': 2021, 'descricao': ''} for i in range(size)],
+            'projetos': [{'nome': f'Projeto {i}', 'descricao': '', 'link': 'https://example.com'}
+                         for i in range(size)],
+        }
+
+    def put(self, document: dict):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.put('/api/v1/me/profile', document, content_type='application/json',
+                                       **auth_header(self.user))
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx)
+
+    def test_applies_document(self):
+        data, _ = self.put(self.document(2))
+        self.assertEqual(data['idade'], 40)
+        self.assertEqual(data['resumo'], 'Dev backend')
+        self.assertEqual(sorted(i['nome'] for i in data['interesses']), ['Tema 0', 'Tema 1'])
+        self.assertEqual(sorted(h['nome'] for h in data['habilidades']), ['Habilidade 0', 'Habilidade 1'])
+        self.assertEqual(Projeto.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(Interesse.objects.filter(nome='Interesse 1').exists())
+        self.assertFalse(self.user.interesses.filter(nome='Interesse 1').exists())
+
+    def test_query_count_does_not_grow_with_profile_size(self):
+        _, few = self.put(self.document(2))
+        other = create_profile(2)
+        self.user = other
+        _, many = self.put(self.document(20))
+        self.assertEqual(few, many)
+
+    def test_unchanged_document_writes_nothing(self):
+        document = self.put(self.document(2))[0]
+        with mock.patch('conexao_digital_api.signals.update_search_document') as update:
+            data, _ = self.put(document)
+        update.assert_not_called()
+        self.assertEqual(data, document)
+
+
+class AttachInteressesTest(TestCase):
+    def setUp(self):
+        self.user = create_profile(1)
+
+    def attach(self, nomes: list):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/v1/me/interesses/bulk', [{'nome': nome} for nome in nomes],
+                                        content_type='application/json', **auth_header(self.user))
+        self.assertEqual(response.status_code, 200)
+        return response.json(), ctx.captured_queries
+
+    def test_creates_missing_and_links_existing(self):
+        Interesse.objects.create(nome='Existente')
+        data, _ = self.attach(['Existente', 'Novo', 'Novo', 'Interesse 1'])
+        self.assertEqual(sorted(i['nome'] for i in data), ['Existente', 'Interesse 1', 'Novo'])
+        self.assertEqual(Interesse.objects.filter(nome='Novo').count(), 1)
+        self.assertCountEqual(self.user.interesses.values_list('nome', flat=True), ['Existente', 'Interesse 1', 'Novo'])
+
+    def test_returns_the_payload_order(self):
+        Interesse.objects.create(nome='Banco de dados')
+        data, _ = self.attach(['Zig', 'Banco de dados', 'Arduino', 'Zig'])
+        self.assertEqual([i['nome'] for i in data], ['Zig', 'Banco de dados', 'Arduino'])
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        _, few = self.attach([f'Tema {i}' for i in range(2)])
+        _, many = self.attach([f'Tema {i}' for i in range(2, 40)])
+        self.assertEqual(len(few), len(many))
+
+    def test_reattach_is_idempotent(self):
+        self.attach(['Go', 'Rust'])
+        data, _ = self.attach(['Go', 'Rust'])
+        self.assertEqual(len(data), 2)
+        self.assertEqual(self.user.interesses.filter(nome__in=['Go', 'Rust']).count(), 2)
+        profile = self.client.get('/api/v1/me', **auth_header(self.user)).json()
+        self.assertIn('Rust', [i['nome'] for i in profile['interesses']])
+
+
+class AvatarTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, AVATAR_THUMBNAIL_SIZES=[64, 256])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = create_profile(1)
+
+    def image(self, color: str = 'red', size: tuple = (800, 600)) -> bytes:
+        exif = Image.Exif()
+        exif[0x010F] = 'Câmera'  # Make
+        output = BytesIO()
+        Image.new('RGB', size, color).save(output, 'JPEG', exif=exif)
+        return output.getvalue()
+
+    def upload(self, data: bytes, user: User = None):
+        upload = SimpleUploadedFile('foto.jpg', data, content_type='image/jpeg')
+        return self.client.post('/api/v1/me/avatar', {'file': upload}, **auth_header(user or self.user))
+
+    def test_upload_writes_thumbnails_without_metadata(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload(self.image())
+        self.assertEqual(response.status_code, 200)
+        avatar = response.json()['avatar']
+        self.assertEqual([t['size'] for t in avatar['thumbnails']], [64, 256])
+        self.assertTrue(avatar['thumbnails'][0]['webp'].endswith('-64.webp'))
+
+        self.user.refresh_from_db()
+        with default_storage.open(self.user.avatar.name) as original:
+            self.assertEqual(dict(Image.open(original).getexif()), {})
+        with default_storage.open(self.user.avatar.name.replace('.jpg', '-256.webp')) as thumbnail:
+            image = Image.open(thumbnail)
+            self.assertEqual((image.format, image.size), ('WEBP', (256, 256)))
+        # The list and profile reads expose the same URLs
+        self.assertEqual(self.client.get('/api/v1/me', **auth_header(self.user)).json()['avatar'], avatar)
+
+    def test_replacing_deletes_unshared_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(self.image('red'))
+            self.upload(self.image('red'), create_profile(2))
+            self.user.refresh_from_db()
+            shared = self.user.avatar.name
+            self.upload(self.image('blue'))
+        # Still the avatar of the second user
+        self.assertTrue(default_storage.exists(shared))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.refresh_from_db()
+            old = self.user.avatar.name
+            response = self.client.delete('/api/v1/me/avatar', **auth_header(self.user))
+        self.assertIsNone(response.json()['avatar'])
+        self.assertFalse(default_storage.exists(old))
+        self.assertFalse(default_storage.exists(old.replace('.jpg', '-64.webp')))
+
+    def test_concurrent_upload_of_the_same_image_keeps_one_copy(self):
+        data = self.image()
+        name = process_avatar(data)
+        # Another upload checked the files before this one wrote them
+        storage = mock.Mock(wraps=default_storage, **{'exists.return_value': False})
+        with mock.patch('conexao_digital_api.avatars.default_storage', storage):
+            self.assertEqual(process_avatar(data), name)
+        _, files = default_storage.listdir('avatars')
+        self.assertEqual(sorted(files), sorted(file_name.split('/')[1] for file_name in avatar_names(name)))
+
+    def test_rejects_invalid_images(self):
+        self.assertEqual(self.upload(b'not an image').status_code, 400)
+        with override_settings(AVATAR_MAX_PIXELS=1000):
+            self.assertEqual(self.upload(self.image()).status_code, 400)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+
+
+class MediaServingTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.avatar = default_storage.save('avatars/0123456789abcdef0123456789abcdef-64.webp',
+                                           ContentFile(bytes(range(256)) * 4))
+        self.document = default_storage.save('docs/termos.txt', ContentFile('termos de uso ' * 200))
+
+    def test_hashed_names_are_immutable_and_revalidate(self):
+        response = self.client.get(f'/media/{self.avatar}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(256)) * 4)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(self.client.get(f'/media/{self.document}')['Cache-Control'], 'public, no-cache')
+        # A long hex name outside the avatars isn't a content hash
+        other = default_storage.save('docs/0123456789abcdef0123.txt', ContentFile('v1'))
+        self.assertEqual(self.client.get(f'/media/{other}')['Cache-Control'], 'public, no-cache')
+
+        response = self.client.get(f'/media/{self.avatar}', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_range_requests(self):
+        response = self.client.get(f'/media/{self.avatar}', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+        response = self.client.get(f'/media/{self.avatar}', HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(252, 256)))
+        self.assertEqual(self.client.get(f'/media/{self.avatar}', HTTP_RANGE='bytes=2000-').status_code, 416)
+        # An invalid range is ignored
+        response = self.client.get(f'/media/{self.avatar}', HTTP_RANGE='bytes=5-3')
+        self.assertEqual((response.status_code, len(b''.join(response.streaming_content))), (200, 1024))
+        # A stale If-Range gets the whole file
+        response = self.client.get(f'/media/{self.avatar}', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"outro"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_precompressed_sidecars(self):
+        call_command('compress_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(self.document + '.gz'))
+        self.assertFalse(default_storage.exists(self.avatar + '.gz'))
+
+        response = self.client.get(f'/media/{self.document}', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertNotIn('Content-Encoding', self.client.get(f'/media/{self.document}'))
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='x-accel-redirect')
+    def test_accel_redirect_offload(self):
+        response = self.client.get(f'/media/{self.avatar}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.avatar}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_paths_outside_media_root(self):
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/avatars/').status_code, 404)
+
+
+class PrincipalCacheTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        principal_cache.clear()
+        self.user = create_profile(1)
+        # Clients reuse the token until it expires
+        self.headers = auth_header(self.user)
+
+    def test_cached_token_skips_the_users_table(self):
+        etag = self.client.get('/api/v1/me/habilidades', **self.headers)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/me/habilidades', HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx), 0)
+
+    def test_deactivation_and_deletion_drop_the_entry(self):
+        self.assertEqual(self.client.get('/api/v1/me', **self.headers).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/v1/me', **self.headers).status_code, 401)
+
+        other = create_profile(2)
+        headers = auth_header(other)
+        self.assertEqual(self.client.get('/api/v1/me', **headers).status_code, 200)
+        other.delete()
+        self.assertEqual(self.client.get('/api/v1/me', **headers).status_code, 401)
+
+    def test_principal_loads_the_other_columns_once(self):
+        principal = build_principal((self.user.pk, False, False, True))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(principal.nome, self.user.nome)
+            self.assertEqual(principal.idade, self.user.idade)
+        self.assertEqual(len(ctx), 1)
+
+        self.client.get('/api/v1/me', **self.headers)
+        payload = {'nome': 'Novo Nome', 'email': 'user1@example.com', 'idade': 30, 'genero': 'O',
+                   'telefone': '11999999999', 'deficiencia': False, 'resumo': None}
+        response = self.client.put('/api/v1/me', payload, content_type='application/json', **self.headers)
+        self.assertEqual(response.json()['nome'], 'Novo Nome')
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.nome, self.user.idade), ('Novo Nome', 30))
+        self.assertTrue(self.user.check_password('senha-segura-123'))
+
+    def test_deactivation_by_another_process_expires(self):
+        self.assertEqual(self.client.get('/api/v1/me', **self.headers).status_code, 200)
+        # Saved by another process, its bump never reaches this process's cache
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/v1/me', **self.headers).status_code, 200)
+        with mock.patch('time.time', return_value=time.time() + settings.AUTH_REVOCATION_TIMEOUT + 1):
+            self.assertEqual(self.client.get('/api/v1/me', **self.headers).status_code, 401)
+
+    @override_settings(AUTH_TOKEN_CACHE_SIZE=1)
+    def test_cache_is_bounded(self):
+        other_headers = auth_header(create_profile(2))
+        self.client.get('/api/v1/me', **self.headers)
+        self.client.get('/api/v1/me', **other_headers)
+        self.assertEqual(len(principal_cache.entries), 1)
+
+
+class ClaimsTokenTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        principal_cache.clear()
+        self.user = create_profile(1)
+
+    def login(self, email: str = 'user1@example.com') -> dict:
+        response = self.client.post('/api/v1/auth/login', {'username': email, 'password': 'senha-segura-123'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def bearer(self, access: str) -> dict:
+        return {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+
+    def test_claims_authorize_without_queries(self):
+        tokens = self.login()
+        payload = ClaimsAccessToken(tokens['access']).payload
+        self.assertEqual((payload['is_staff'], payload['is_active'], payload['profile_version']), (False, True, 0))
+
+        etag = self.client.get('/api/v1/me/habilidades', **self.bearer(tokens['access']))['ETag']
+        # A token this process never saw, only the api cache is read
+        access = self.client.post('/api/v1/auth/refresh', {'refresh': tokens['refresh']},
+                                  content_type='application/json').json()['access']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/me/habilidades', HTTP_IF_NONE_MATCH=etag, **self.bearer(access))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx), 0)
+        self.assertEqual(self.client.get('/api/v1/admin/users/', **self.bearer(access)).status_code, 403)
+
+    def test_permission_changes_revoke_tokens(self):
+        tokens = self.login()
+        self.assertEqual(self.client.get('/api/v1/me', **self.bearer(tokens['access'])).status_code, 200)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/v1/me', **self.bearer(tokens['access'])).status_code, 401)
+        response = self.client.post('/api/v1/auth/refresh', {'refresh': tokens['refresh']},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+        access = self.login()['access']
+        self.assertEqual(self.client.get('/api/v1/admin/users/', **self.bearer(access)).status_code, 200)
+
+    def test_revocation_by_another_process_expires(self):
+        access = self.login()['access']
+        self.assertEqual(self.client.get('/api/v1/me', **self.bearer(access)).status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(profile_version=F('profile_version') + 1)
+        self.assertEqual(self.client.get('/api/v1/me', **self.bearer(access)).status_code, 200)
+        with mock.patch('time.time', return_value=time.time() + settings.AUTH_REVOCATION_TIMEOUT + 1):
+            self.assertEqual(self.client.get('/api/v1/me', **self.bearer(access)).status_code, 401)
+
+    def test_other_saves_keep_tokens(self):
+        access = self.login()['access']
+        self.user.resumo = 'Novo resumo'
+        self.user.save()
+        self.assertEqual(User.objects.get(pk=self.user.pk).profile_version, 0)
+        self.assertEqual(self.client.get('/api/v1/me', **self.bearer(access)).status_code, 200)
+
+        self.user.set_password('outra-senha-456')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/v1/me', **self.bearer(access)).status_code, 401)
+
+
+class PasswordHashingTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        self.user = create_profile(1)
+
+    def test_create_hashes_with_the_configured_hasher(self):
+        response = self.client.post('/api/v1/create', {
+            'nome': 'Nova Pessoa', 'password': 'senha-segura-123', 'email': 'nova@example.com', 'idade': 25,
+            'genero': 'F', 'telefone': '11999999999', 'deficiencia': False,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['habilidades'], [])
+        user = User.objects.get(email='nova@example.com')
+        self.assertTrue(user.password.startswith('argon2$argon2id$'))
+        self.assertTrue(user.check_password('senha-segura-123'))
+
+    def test_login_rehashes_legacy_hashes_without_revoking_tokens(self):
+        User.objects.filter(pk=self.user.pk).update(
+            password=make_password('senha-segura-123', hasher='pbkdf2_sha256'))
+        response = self.client.post('/api/v1/auth/login', {'username': 'user1@example.com',
+                                                           'password': 'senha-segura-123'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.password.startswith('argon2$'))
+        self.assertEqual(user.profile_version, 0)
+        access = response.json()['access']
+        self.assertEqual(self.client.get('/api/v1/me', HTTP_AUTHORIZATION=f'Bearer {access}').status_code, 200)
+
+    def test_benchmark_recommends_parameters(self):
+        candidates = {'bcrypt': (CANDIDATES['bcrypt'][0], [{'rounds': 4}, {'rounds': 5}], CANDIDATES['bcrypt'][2])}
+        out = StringIO()
+        with mock.patch.dict(CANDIDATES, candidates, clear=True):
+            call_command('benchmark_hashers', '--target-ms', '1000', '--samples', '1', stdout=out)
+        self.assertIn('PASSWORD_HASHER=bcrypt PASSWORD_BCRYPT_ROUNDS=5', out.getvalue())
+
+
+class QueryPlanTest(TestCase):
+    def setUp(self):
+        self.user = create_profile(1)
+
+    def plan(self, queryset) -> str:
+        with connection.cursor() as cursor:
+            # Planner statistics, as after the migration on a populated database
+            cursor.execute('ANALYZE')
+        return queryset.explain()
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plan text of SQLite')
+    def test_child_pages_use_the_user_ordering_index(self):
+        for model, index in ((Habilidade, 'habilidade_user_nome_idx'), (FormacaoAcademica, 'formacao_user_curso_idx'),
+                             (ExperienciaProfissional, 'experiencia_user_cargo_idx'),
+                             (Projeto, 'projeto_user_nome_idx')):
+            ordering = model._meta.ordering[0]
+            plan = self.plan(model.objects.filter(user=self.user).order_by(ordering, 'id')[:11])
+            self.assertIn(index, plan)
+            # Read in index order, no sort step
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plan text of SQLite')
+    def test_regular_users_use_the_partial_index(self):
+        plan = self.plan(User.objects.filter(is_superuser=False, is_staff=False).order_by('nome', 'id')[:20])
+        self.assertIn('user_regular_nome_idx', plan)
+        plan = self.plan(User.objects.filter(is_superuser=False, is_staff=False, idade=30))
+        self.assertIn('user_regular_idade_idx', plan)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Trigram indexes only exist on PostgreSQL')
+    def test_icontains_uses_the_trigram_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        plan = FormacaoAcademica.objects.filter(curso__icontains='comput').explain()
+        self.assertIn('formacaoacademica_curso_trgm', plan)
+
+
+class AdminUserWriteTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', password='senha-segura-123', nome='Admin', idade=30, genero='O',
+            telefone='11999999999',
+        )
+
+    def test_create_hashes_the_password_and_saves_choice_values(self):
+        response = self.client.post('/api/v1/admin/users/', {
+            'nome': 'Nova', 'email': 'nova@example.com', 'password': 'senha-segura-123', 'idade': 22, 'genero': 'F',
+            'telefone': '11999999999', 'deficiencia': False,
+        }, content_type='application/json', **auth_header(self.admin))
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(email='nova@example.com')
+        self.assertEqual(user.genero, 'F')
+        self.assertTrue(user.check_password('senha-segura-123'))
+
+    def test_patch_saves_choice_values(self):
+        user = create_profile(1)
+        response = self.client.patch(f'/api/v1/admin/users/{user.pk}', {'genero': 'M'},
+                                     content_type='application/json', **auth_header(self.admin))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['genero'], 'M')
+        user.refresh_from_db()
+        self.assertEqual(user.genero, 'M')
+
+    def test_patch_hashes_the_password(self):
+        user = create_profile(1)
+        response = self.client.patch(f'/api/v1/admin/users/{user.pk}', {'password': 'outra-senha-456'},
+                                     content_type='application/json', **auth_header(self.admin))
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('outra-senha-456'))
+
+    def test_create_superuser(self):
+        response = self.client.post('/api/v1/admin/users/superuser', {
+            'nome': 'Root', 'email': 'root@example.com', 'password': 'senha-segura-123', 'idade': 40,
+            'genero': 'O', 'telefone': '11999999999', 'deficiencia': False,
+        }, content_type='application/json', **auth_header(self.admin))
+        self.assertEqual(response.status_code, 201, response.content)
+        user = User.objects.get(email='root@example.com')
+        self.assertEqual((user.genero, user.is_superuser, user.is_staff), ('O', True, True))
+        self.assertTrue(user.check_password('senha-segura-123'))
+
+
+class SeedProfilesTest(TestCase):
+    def test_profiles_are_the_same_for_any_chunking(self):
+        seed_profiles(7, seed=3, chunk_size=3)
+        for index in range(7):
+            profile = generate_profile(index, seed=3)
+            user = User.objects.get(email=seed_email(index))
+            self.assertEqual(user.nome, profile['user']['nome'])
+            self.assertEqual(sorted(user.habilidades.values_list('nome', 'nivel')), sorted(profile['habilidades']))
+            self.assertEqual(sorted(user.interesses.values_list('nome', flat=True)), profile['interesses'])
+            self.assertEqual(user.projetos.count(), len(profile['projetos']))
+            self.assertTrue(user.check_password('senha-segura-123'))
+        self.assertNotEqual(generate_profile(0, seed=3), generate_profile(0, seed=4))
+
+    def test_derived_data_is_written(self):
+        versions = get_versions([GLOBAL_SCOPE, PROFILES_SCOPE])
+        seed_profiles(4)
+        # The cached interest lists and searches see the new users
+        self.assertTrue(all(new != old for new, old in zip(get_versions([GLOBAL_SCOPE, PROFILES_SCOPE]), versions)))
+        self.assertEqual(UserProfileSnapshot.objects.count(), 4)
+        habilidade = Habilidade.objects.first()
+        self.assertIn(habilidade.user_id, [found.pk for found in search_users(habilidade.nome)])
+
+    def test_command_continues_after_the_generated_users(self):
+        call_command('seed_profiles', users=3, workers=1, stdout=StringIO())
+        call_command('seed_profiles', users=2, workers=2, chunk_size=1, no_derived=True, stdout=StringIO())
+        self.assertEqual(sorted(User.objects.values_list('email', flat=True)), sorted(seed_email(i) for i in range(5)))
+        self.assertFalse(UserProfileSnapshot.objects.filter(user__email=seed_email(4)).exists())
+
+
+class BenchmarkSuiteTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        principal_cache.clear()
+
+    def test_every_route_is_benchmarked(self):
+        self.assertEqual(sorted(CALLS), sorted(route_keys()))
+
+    def test_routes_succeed_on_seeded_data(self):
+        seed_profiles(20)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root, EMAIL_DISPATCH_WORKERS=0):
+            results = run_benchmarks(repeat=1)
+
+        self.assertEqual({key: result['errors'] for key, result in results.items() if result['errors']}, {})
+        self.assertLessEqual(results['GET /me']['queries'], 3)
+        self.assertGreater(results['GET /search/users']['memory_kib'], 0)
+
+    def test_compare_reports_regressions(self):
+        baseline = {
+            'GET /me': {'queries': 2, 'p95_ms': 4.0, 'memory_kib': 80, 'errors': []},
+            'GET /me/projetos': {'queries': 2, 'p95_ms': 40.0, 'memory_kib': 1000, 'errors': []},
+        }
+        results = {
+            # Noise under the absolute floors
+            'GET /me': {'queries': 2, 'p95_ms': 4.9, 'memory_kib': 120, 'errors': []},
+            'GET /me/projetos': {'queries': 3, 'p95_ms': 60.0, 'memory_kib': 1100, 'errors': [500]},
+            'GET /me/habilidades': {'queries': 9, 'p95_ms': 9.0, 'memory_kib': 90, 'errors': []},
+        }
+        regressions = compare(baseline, results, threshold=0.25)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(all(regression.startswith('GET /me/projetos:') for regression in regressions))
+
+
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        principal_cache.clear()
+        histogram.clear()
+        self.user = create_profile(1)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1, REQUEST_TIMING_HEADER=True)
+    def test_sampled_request_is_timed(self):
+        with CaptureQueriesContext(connection) as queries, \
+                self.assertLogs('conexao_digital_api.timing', 'INFO') as logs:
+            response = self.client.get('/api/v1/me/habilidades', **auth_header(self.user))
+
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+        self.assertIn(f'queries={len(queries)}', logs.output[0])
+        self.assertIn('status=200', logs.output[0])
+        self.assertEqual(logs.records[0].timing['queries'], len(queries))
+
+        route = logs.records[0].timing['route']
+        self.assertTrue(route.endswith('.get_habilidades'), route)
+        self.assertEqual(histogram.snapshot()[route]['count'], 1)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_not_timed(self):
+        response = self.client.get('/api/v1/me/habilidades', **auth_header(self.user))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(histogram.snapshot(), {})
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_timings_route(self):
+        admin = create_profile(2)
+        admin.is_staff = True
+        admin.save()
+        self.client.get('/api/v1/me/habilidades', **auth_header(self.user))
+        response = self.client.get('/api/v1/admin/timings', **auth_header(admin))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        timings = response.json()
+        route = next(route for route in timings if route.endswith('.get_habilidades'))
+        self.assertEqual(timings[route]['count'], 1)
+        self.assertLessEqual(timings[route]['p50_ms'], timings[route]['max_ms'])
+        self.assertEqual(self.client.get('/api/v1/admin/timings', **auth_header(self.user)).status_code, 403)
+
+    def test_histogram_drops_old_slots(self):
+        rolling = RollingHistogram(window=60, slots=6)
+        for duration in (3, 7, 40, 400, 9000):
+            rolling.observe('route', duration, now=0)
+        rolling.observe('route', 20, now=30)
+
+        stats = rolling.snapshot(now=30)['route']
+        self.assertEqual(stats['count'], 6)
+        self.assertEqual(stats['p50_ms'], 25)
+        self.assertEqual(stats['p99_ms'], 9000)
+        self.assertEqual(rolling.snapshot(now=60)['route']['count'], 1)
+        self.assertEqual(rolling.snapshot(now=120), {})
+
+
+class SerializationTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        principal_cache.clear()
+
+    def test_profile_values_match_schema(self):
+        seed_profiles(15)
+        create_profile(1)
+        users = list(profile_queryset())
+        profiles = profile_values([user.pk for user in users])
+
+        self.assertEqual(len(profiles), len(users))
+        for user in users:
+            self.assertEqual(profiles[user.pk], UserSchema.from_orm(user).model_dump(mode='json'))
+
+    def test_trusted_routes_match_schema(self):
+        user = create_profile(1)
+        Habilidade.objects.create(nome='Django', nivel=3, user=user)
+        routes = (
+            ('habilidades', Habilidade, HabilitadeSchema),
+            ('formacoes-academicas', FormacaoAcademica, FormacaoAcademicaSchema),
+            ('experiencias-profissionais', ExperienciaProfissional, ExperienciaProfissionalSchema),
+            ('projetos', Projeto, ProjetoSchema),
+        )
+        for segment, model, schema in routes:
+            with self.subTest(segment):
+                response = self.client.get(f'/api/v1/me/{segment}', **auth_header(user))
+                self.assertEqual(response.status_code, 200)
+                expected = [schema.from_orm(item).model_dump(mode='json')
+                            for item in model.objects.filter(user=user).order_by(*model._meta.ordering, 'pk')]
+                self.assertEqual(response.json()['results'], expected)
+
+    def test_search_returns_full_profiles(self):
+        user = create_profile(1)
+        admin = create_profile(2)
+        admin.is_staff = True
+        admin.save()
+        update_search_document(user.pk)
+        response = self.client.get('/api/v1/search/users', {'q': 'Python'}, **auth_header(admin))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(response.json()['results'], [UserSchema.from_orm(load_profile(user)).model_dump(mode='json')])
+
+    def test_invalid_json_body(self):
+        user = create_profile(1)
+        response = self.client.post('/api/v1/me/habilidades', b'{"nome": ', content_type='application/json',
+                                    **auth_header(user))
+        self.assertEqual(response.status_code, 400)
+
+    def test_serialization_benchmark(self):
+        seed_profiles(10)
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        outputs = [json.loads(serialize(user_ids)) for serialize in PROFILE_SERIALIZERS.values()]
+        self.assertTrue(all(output == outputs[0] for output in outputs))
+        self.assertEqual(len(outputs[0]), 10)
+
+        results = run_serialization_benchmark(user_ids, repeat=1)
+        self.assertEqual(list(results), list(PROFILE_SERIALIZERS))
+        self.assertEqual(next(iter(results.values()))['speedup'], 1)
+
+
+class ProfileFieldsTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        principal_cache.clear()
+        self.user = create_profile(1)
+        self.full = UserSchema.from_orm(load_profile(self.user)).model_dump(mode='json')
+
+    def get(self, path: str, params: dict, user: User = None):
+        response = self.client.get(path, params, **auth_header(user or self.user))
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_fields_narrow_the_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            profile = self.get('/api/v1/me', {'fields': 'nome,avatar'})
+        self.assertEqual(profile, {'id': self.user.pk, 'nome': self.full['nome'], 'avatar': None})
+        # After the authentication, the user only, read with the selected columns
+        self.assertIn('"avatar" FROM "conexao_digital_api_user"', queries[-1]['sql'])
+        self.assertNotIn('"telefone"', queries[-1]['sql'])
+
+    def test_expand_adds_only_the_asked_relations(self):
+        profile = self.get('/api/v1/me', {'fields': 'nome', 'expand': 'habilidades,projetos'})
+        self.assertEqual(profile, {'id': self.user.pk, 'nome': self.full['nome'],
+                                   'habilidades': self.full['habilidades'], 'projetos': self.full['projetos']})
+
+        profile = self.get('/api/v1/me', {'expand': 'interesses'})
+        self.assertEqual(profile, {key: value for key, value in self.full.items()
+                                   if key in ('interesses',) or not isinstance(value, list)})
+
+    def test_without_parameters_the_whole_profile(self):
+        self.assertEqual(self.get('/api/v1/me', {}), self.full)
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/v1/me', {'fields': 'nome,password'}, **auth_header(self.user))
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_and_search_routes(self):
+        admin = create_profile(2)
+        admin.is_staff = True
+        admin.save()
+        self.assertEqual(self.get(f'/api/v1/admin/users/{self.user.pk}', {'fields': 'email'}, admin),
+                         {'id': self.user.pk, 'email': self.user.email})
+
+        update_search_document(self.user.pk)
+        page = self.get('/api/v1/search/users', {'q': 'Python', 'fields': 'nome', 'expand': 'habilidades'}, admin)
+        self.assertEqual(page['results'], [{'id': self.user.pk, 'nome': self.full['nome'],
+                                            'habilidades': self.full['habilidades']}])
+
+    def test_schema_subsets_are_cached(self):
+        self.assertIs(user_schema_subset(('id', 'nome')), user_schema_subset(('id', 'nome')))
+        self.assertIs(user_schema_subset(tuple(UserSchema.model_fields)), UserSchema)
+
+
+@override_settings(INTERESSE_USERS_PREVIEW_SIZE=2, INTERESSE_USERS_COUNT_LIMIT=4)
+class InteresseUsersTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        principal_cache.clear()
+        self.admin = create_profile(0)
+        self.admin.is_staff = True
+        self.admin.save()
+        self.interesse = Interesse.objects.create(nome='Popular')
+        self.users = [create_profile(i) for i in range(1, 7)]
+        self.interesse.users.add(*self.users)
+
+    def test_embedded_users_are_capped(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/v1/admin/users/interesses/{self.interesse.pk}',
+                                       **auth_header(self.admin))
+        self.assertEqual(response.status_code, 200)
+        users = response.json()['users']
+        self.assertEqual((users['count'], users['count_limited']), (4, True))
+        first = sorted(self.users, key=lambda user: user.nome)[:2]
+        self.assertEqual(users['results'], [{'id': user.pk, 'nome': user.nome, 'email': user.email} for user in first])
+        self.assertIsNotNone(users['next'])
+        # Authentication, the interest with its capped count and the preview, whatever the number of users
+        self.assertLessEqual(len(queries), 4)
+
+    def test_next_cursor_pages_the_users(self):
+        users = self.client.get(f'/api/v1/admin/users/interesses/{self.interesse.pk}',
+                                **auth_header(self.admin)).json()['users']
+        names = [user['nome'] for user in users['results']]
+        cursor = users['next']
+        while cursor:
+            page = self.client.get(f'/api/v1/admin/users/interesses/{self.interesse.pk}/users',
+                                   {'cursor': cursor, 'page_size': 3}, **auth_header(self.admin)).json()
+            names += [user['nome'] for user in page['results']]
+            cursor = page['next']
+        self.assertEqual(names, sorted(user.nome for user in self.users))
+
+    def test_list_of_interests(self):
+        user = self.users[0]
+        response = self.client.get('/api/v1/me/interesses', **auth_header(user))
+        self.assertEqual(response.status_code, 200)
+        counts = {interesse['nome']: interesse['users']['count'] for interesse in response.json()['results']}
+        self.assertEqual(counts, {'Popular': 4, 'Interesse 1': 2})
+
+    def test_cached_interests_follow_other_members(self):
+        user = self.users[0]
+        reads = (('/api/v1/me/interesses', user), (f'/api/v1/admin/users/{user.pk}/interesses', self.admin))
+
+        def popular_count(path: str, reader: User) -> int:
+            results = self.client.get(path, **auth_header(reader)).json()['results']
+            return {interesse['nome']: interesse['users']['count'] for interesse in results}['Popular']
+
+        for path, reader in reads:
+            self.assertEqual(popular_count(path, reader), 4)
+        # Other members leave, below the count limit
+        self.interesse.users.remove(*self.users[1:4])
+        for path, reader in reads:
+            self.assertEqual(popular_count(path, reader), 3, path)
+
+    def test_interest_without_the_annotations(self):
+        response = self.client.post('/api/v1/me/interesses', {'nome': 'Popular'}, content_type='application/json',
+                                    **auth_header(self.admin))
+        self.assertEqual(response.status_code, 200)
+        users = response.json()['users']
+        self.assertEqual((users['count'], users['count_limited'], len(users['results'])), (4, True, 2))
+
+
+class StatsTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        principal_cache.clear()
+        self.admin = create_profile(0)
+        self.admin.is_staff = True
+        self.admin.save()
+        self.users = [create_profile(i) for i in range(1, 5)]
+
+    def rollups(self) -> dict:
+        return {(row.dimension, row.key, row.subkey): (row.users, row.users_deficiencia)
+                for row in StatRollup.objects.all() if row.users or row.users_deficiencia}
+
+    def assertReconciled(self):
+        counts = self.rollups()
+        self.assertEqual(reconcile_stats(), 0)
+        self.assertEqual(self.rollups(), counts)
+
+    def test_counts_follow_the_profiles(self):
+        counts = self.rollups()
+        # The staff user is left out
+        self.assertEqual(counts[('habilidade', 'Python', '')], (4, 0))
+        self.assertEqual(counts[('habilidade', 'Python', '2')], (4, 0))
+        self.assertEqual(counts[('curso', 'Computação', 'USP')], (4, 0))
+        self.assertEqual(counts[('interesse', 'Interesse 1', '')], (2, 0))
+        self.assertReconciled()
+
+        user = self.users[0]
+        user.deficiencia = True
+        user.save()
+        Habilidade.objects.create(nome='Django', nivel=3, user=user)
+        Habilidade.objects.filter(user=self.users[1]).delete()
+        interesse = Interesse.objects.get(nome='Interesse 2')
+        interesse.nome = 'Dados'
+        interesse.save()
+        self.users[3].delete()
+
+        counts = self.rollups()
+        self.assertEqual(counts[('habilidade', 'Python', '')], (2, 1))
+        self.assertEqual(counts[('habilidade', 'Django', '3')], (1, 1))
+        self.assertEqual(counts[('deficiencia', 'true', '')], (1, 1))
+        self.assertEqual(counts[('interesse', 'Dados', '')], (1, 0))
+        self.assertNotIn(('interesse', 'Interesse 2', ''), counts)
+        self.assertReconciled()
+
+    def test_deactivated_users_are_removed(self):
+        self.users[0].is_active = False
+        self.users[0].save(update_fields=['is_active'])
+        self.assertEqual(self.rollups()[('genero', 'O', '')], (3, 0))
+        self.assertReconciled()
+
+    def test_reconcile_fixes_the_counts(self):
+        StatRollup.objects.filter(dimension='habilidade', subkey='').update(users=10)
+        StatRollup.objects.create(dimension='curso', key='Letras', users=3)
+        out = StringIO()
+        call_command('reconcile_stats', stdout=out)
+        self.assertEqual(out.getvalue().strip(), '2 contadores corrigidos.')
+        self.assertEqual(self.rollups()[('habilidade', 'Python', '')], (4, 0))
+        self.assertNotIn(('curso', 'Letras', ''), self.rollups())
+
+    def test_stats_endpoint(self):
+        Habilidade.objects.create(nome='Django', nivel=1, user=self.users[0])
+        response = self.client.get('/api/v1/admin/stats/habilidades', {'limit': 1}, **auth_header(self.admin))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{
+            'key': 'Python', 'users': 4, 'users_deficiencia': 0,
+            'breakdown': [{'key': '2', 'users': 4, 'users_deficiencia': 0}],
+        }])
+
+        response = self.client.get('/api/v1/admin/stats/niveis', **auth_header(self.admin))
+        self.assertEqual([(row['key'], row['users']) for row in response.json()], [('1', 1), ('2', 4)])
+        response = self.client.get('/api/v1/admin/stats/idade', **auth_header(self.admin))
+        self.assertEqual([(row['key'], row['users']) for row in response.json()], [('18-24', 4)])
+
+        self.assertEqual(self.client.get('/api/v1/admin/stats/senhas', **auth_header(self.admin)).status_code, 422)
+        self.assertEqual(self.client.get('/api/v1/admin/stats/genero', **auth_header(self.users[0])).status_code, 403)
+
+
+class ImportProfilesTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        principal_cache.clear()
+        self.admin = create_profile(0)
+        self.admin.is_staff = True
+        self.admin.save()
+
+    def row(self, index: int, **fields) -> dict:
+        return {'email': f'import{index}@example.com', 'nome': f'Importado {index}', 'password': 'senha-segura-123',
+                'idade': 30, 'genero': 'F', 'telefone': '11999999999', **fields}
+
+    def jsonl(self, *rows) -> bytes:
+        return b''.join(json.dumps(row).encode() + b'\n' for row in rows)
+
+    def test_jsonl_rows_are_imported_and_errors_reported(self):
+        lines = BytesIO(self.jsonl(
+            self.row(1, interesses=[{'nome': 'Interesse 0'}, {'nome': 'Dados'}],
+                     habilidades=[{'nome': 'Python', 'nivel': 3}],
+                     projetos=[{'nome': 'Site', 'descricao': '', 'link': 'https://example.com'}]),
+            self.row(2, idade='trinta'),
+            self.row(3, email='user0@example.com'),
+            self.row(4, email='import1@example.com'),
+            self.row(5, genero='Z', projetos=[{'nome': 'Site', 'link': 'não é link'}]),
+            self.row(6),
+        ) + b'{"email": \n')
+        report = import_profiles(lines, 'jsonl', chunk_size=2)
+
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([error['line'] for error in report['errors']], [2, 3, 4, 5, 7])
+        errors = {error['line']: error['messages'] for error in report['errors']}
+        self.assertTrue(errors[2][0].startswith('idade: '))
+        self.assertEqual(errors[3], ['email: Já existe um usuário com este email.'])
+        self.assertEqual(errors[4], ['email: Repetido no arquivo.'])
+        self.assertEqual([message.split(':')[0] for message in errors[5]], ['genero', 'projetos.0.link'])
+
+        user = User.objects.get(email='import1@example.com')
+        self.assertTrue(user.check_password('senha-segura-123'))
+        self.assertEqual(set(user.interesses.values_list('nome', flat=True)), {'Interesse 0', 'Dados'})
+        self.assertEqual(list(user.habilidades.values_list('nome', 'nivel')), [('Python', 3)])
+        self.assertEqual(search_users('Python').filter(pk=user.pk).count(), 1)
+        self.assertEqual(reconcile_stats(), 0)
+
+    def test_csv_with_json_list_columns(self):
+        lines = BytesIO(
+            'email,nome,password,idade,genero,telefone,deficiencia,habilidades\n'
+            'import1@example.com,Importado 1,senha-segura-123,30,F,11999999999,true,"[{""nome"": ""Libras"", '
+            '""nivel"": 1}]"\n'
+            'import2@example.com,Importado 2,senha-segura-123,30,M,11999999999,,[{\n'
+            'import3@example.com,Importado 3\n'.encode()
+        )
+        report = import_profiles(lines, 'csv', workers=2)
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['errors'][0], {'line': 3, 'messages': ['habilidades: JSON inválido.']})
+        self.assertEqual(report['errors'][1]['line'], 4)
+        user = User.objects.get(email='import1@example.com')
+        self.assertTrue(user.deficiencia)
+        self.assertTrue(user.check_password('senha-segura-123'))
+        self.assertEqual(list(user.habilidades.values_list('nome', flat=True)), ['Libras'])
+
+    @override_settings(PASSWORD_HASHING_WORKERS=2)
+    def test_hashes_in_slices_of_the_login_pool(self):
+        executor = mock.Mock()
+        executor.map.side_effect = lambda func, passwords: [f'hash:{password}' for password in passwords]
+        with mock.patch('conexao_digital_api.imports.get_hashing_executor', return_value=executor):
+            report = import_profiles(BytesIO(self.jsonl(self.row(1), self.row(2), self.row(3))), 'jsonl')
+        self.assertEqual(report['created'], 3)
+        # Logins submitted while a slice hashes wait for that slice only
+        self.assertEqual([len(call.args[1]) for call in executor.map.call_args_list], [2, 1])
+
+    def test_upload_endpoint_and_command(self):
+        upload = SimpleUploadedFile('perfis.jsonl', self.jsonl(self.row(1), self.row(2, idade=None)))
+        # The web worker hashes on its threads, it never forks a process pool
+        with mock.patch('multiprocessing.Pool') as pool:
+            response = self.client.post('/api/v1/admin/users/import', {'file': upload}, **auth_header(self.admin))
+        pool.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['errors'][0]['line'], 2)
+        self.assertTrue(User.objects.get(email='import1@example.com').check_password('senha-segura-123'))
+
+        upload = SimpleUploadedFile('perfis.xlsx', b'')
+        response = self.client.post('/api/v1/admin/users/import', {'file': upload}, **auth_header(self.admin))
+        self.assertEqual(response.status_code, 400)
+        upload = SimpleUploadedFile('perfis.jsonl', b'')
+        user = User.objects.get(email='import1@example.com')
+        self.assertEqual(self.client.post('/api/v1/admin/users/import', {'file': upload},
+                                          **auth_header(user)).status_code, 403)
+
+        with tempfile.NamedTemporaryFile(suffix='.jsonl') as file:
+            file.write(self.jsonl(self.row(2), self.row(3, nome='Importado 2')))
+            file.flush()
+            out, err = StringIO(), StringIO()
+            call_command('import_profiles', file.name, workers=1, stdout=out, stderr=err)
+        self.assertIn('1 perfis importados, 1 linhas com erro', out.getvalue())
+        self.assertEqual(err.getvalue(), 'linha 2: nome: Repetido no arquivo.\n')
+
+
+# The views are picked when api.py is imported, so the async /me reads are served here, whatever API_ASYNC_READS is
+async_api = NinjaExtraAPI(urls_namespace='async-reads-test', auth=[CachedJWTAuth()], renderer=TimedJSONRenderer(),
+                          parser=ORJSONParser())
+
+
+@api_controller('/me', permissions=[HasActiveClaim])
+class AsyncMeTestController(AsyncMeReadController):
+    pass
+
+
+async_api.register_controllers(AsyncMeTestController)
+urlpatterns = [path('api/v1/', async_api.urls)]
+
+
+@override_settings(ROOT_URLCONF=__name__, API_ASYNC_READS=True)
+class AsyncReadsTest(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        principal_cache.clear()
+        self.user = create_profile(0)
+        for i in range(4):
+            Habilidade.objects.create(nome=f'Habilidade {i}', nivel=1, user=self.user)
+        self.headers = {'Authorization': auth_header(self.user)['HTTP_AUTHORIZATION']}
+
+    async def get(self, path: str, data: dict = None, **headers):
+        return await self.async_client.get(path, data or {}, headers={**self.headers, **headers})
+
+    async def test_profile_matches_the_sync_one(self):
+        response = await self.get('/api/v1/me')
+        self.assertEqual(response.status_code, 200)
+        profile = await sync_to_async(profile_values)([self.user.pk])
+        self.assertEqual(response.json(), profile[self.user.pk])
+
+        # The async branch of cache_response
+        cached = await self.get('/api/v1/me', **{'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        with mock.patch.object(HasActiveClaim, 'has_permission', return_value=False):
+            self.assertEqual((await self.get('/api/v1/me')).status_code, 403)
+
+        narrow = await self.get('/api/v1/me', {'fields': 'nome'})
+        self.assertEqual(narrow.json(), {'id': self.user.pk, 'nome': self.user.nome})
+
+    async def test_apaginate_pages_with_cursors(self):
+        names, cursor = [], None
+        while True:
+            params = {'page_size': 2, **({'cursor': cursor} if cursor else {})}
+            page = (await self.get('/api/v1/me/habilidades', params)).json()
+            names += [habilidade['nome'] for habilidade in page['results']]
+            cursor = page['next']
+            if not cursor:
+                break
+        self.assertEqual(sorted(names), ['Habilidade 0', 'Habilidade 1', 'Habilidade 2', 'Habilidade 3', 'Python'])
+
+        interesses = (await self.get('/api/v1/me/interesses')).json()['results']
+        self.assertEqual([interesse['nome'] for interesse in interesses], ['Interesse 0'])
+
+    async def test_async_auth(self):
+        self.headers = {}
+        self.assertEqual((await self.get('/api/v1/me/projetos')).status_code, 401)
+
+        access = await sync_to_async(lambda: str(ClaimsRefreshToken.for_user(self.user).access_token))()
+        self.headers = {'Authorization': f'Bearer {access}'}
+        self.assertEqual((await self.get('/api/v1/me/projetos')).status_code, 200)
+        # Revokes the tokens minted before
+        self.user.set_password('outra-senha-123')
+        await self.user.asave()
+        self.assertEqual((await self.get('/api/v1/me/projetos')).status_code, 401)
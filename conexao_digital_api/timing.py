@@ -0,0 +1,227 @@
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .serialization import ORJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets, in ms
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+
+class RequestTimings:
+    """What a sampled request spent on the database and on rendering its response."""
+    __slots__ = ('start', 'queries', 'db', 'serialize')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+
+
+# Set by the middleware for the sampled requests only, copied to the sync_to_async threads of the async views
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar('current_timings', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - start
+        timings.queries += 1
+
+
+def install_query_timer(sender, connection, **kw: any):
+    # connection_created receiver, the wrappers outlive the reconnections of the same DatabaseWrapper
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class TimedJSONRenderer(ORJSONRenderer):
+    """The api's renderer, adds the rendering time to the sampled requests."""
+
+    def render(self, request, data, *, response_status: int):
+        timings = current_timings.get()
+        if timings is None:
+            return super().render(request, data, response_status=response_status)
+        start = time.perf_counter()
+        try:
+            return super().render(request, data, response_status=response_status)
+        finally:
+            timings.serialize += time.perf_counter() - start
+
+
+class RollingHistogram:
+    """
+    Request durations per route over the last `window` seconds, in BUCKETS_MS buckets, per process.
+
+    The window is split in `slots` time slots, the oldest slot is dropped as a new one starts.
+    """
+
+    def __init__(self, window: int, slots: int = 10):
+        self.slots = slots
+        self.slot_seconds = max(window, 1) / slots
+        self.routes: Dict[str, deque] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, route: str, duration_ms: float, now: Optional[float] = None):
+        slot = int((time.monotonic() if now is None else now) // self.slot_seconds)
+        with self.lock:
+            slots = self.routes.get(route)
+            if slots is None:
+                slots = self.routes[route] = deque(maxlen=self.slots)
+            if not slots or slots[-1][0] != slot:
+                # slot, bucket counts, sum and max of the durations
+                slots.append([slot, [0] * len(BUCKETS_MS), 0.0, 0.0])
+            current = slots[-1]
+            current[1][bisect_left(BUCKETS_MS, duration_ms)] += 1
+            current[2] += duration_ms
+            current[3] = max(current[3], duration_ms)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, dict]:
+        """Count, mean, max and the p50/p95/p99 (the upper bound of their bucket) of each route."""
+        oldest = int((time.monotonic() if now is None else now) // self.slot_seconds) - self.slots + 1
+        result = {}
+        with self.lock:
+            for route, slots in self.routes.items():
+                counts, total, maximum = [0] * len(BUCKETS_MS), 0.0, 0.0
+                for slot, slot_counts, slot_total, slot_max in slots:
+                    if slot >= oldest:
+                        counts = [count + slot_count for count, slot_count in zip(counts, slot_counts)]
+                        total += slot_total
+                        maximum = max(maximum, slot_max)
+                count = sum(counts)
+                if count:
+                    result[route] = {
+                        'count': count,
+                        'mean_ms': round(total / count, 2),
+                        'max_ms': round(maximum, 2),
+                        **{f'p{percent}_ms': bucket_percentile(counts, count, percent, maximum)
+                           for percent in (50, 95, 99)},
+                    }
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+
+
+def bucket_percentile(counts: list, count: int, percent: int, maximum: float) -> float:
+    rank, seen = count * percent / 100, 0
+    for bound, bucket_count in zip(BUCKETS_MS, counts):
+        seen += bucket_count
+        if seen >= rank:
+            return min(bound, round(maximum, 2))
+    return round(maximum, 2)
+
+
+histogram = RollingHistogram(settings.REQUEST_TIMING_WINDOW)
+
+
+@lru_cache(maxsize=None)
+def operation_name(operation) -> str:
+    view_func = operation.view_func
+    if hasattr(view_func, 'get_route_function'):
+        controller = view_func.get_route_function().get_api_controller().controller_class
+        return f'{controller.__name__}.{view_func.__name__}'
+    return view_func.__name__
+
+
+def route_name(request) -> str:
+    """The controller and method of the ninja_extra route that handled the request, else the url pattern."""
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    path_view = getattr(match.func, '__self__', None)
+    for operation in getattr(path_view, 'operations', ()):
+        if request.method in operation.methods:
+            return operation_name(operation)
+    return match.view_name or match.route
+
+
+def sampled() -> bool:
+    rate = settings.REQUEST_TIMING_SAMPLE_RATE
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+def record(request, response, timings: RequestTimings):
+    total = (time.perf_counter() - timings.start) * 1000
+    db, serialize = timings.db * 1000, timings.serialize * 1000
+    route = route_name(request)
+    histogram.observe(route, total)
+    if settings.REQUEST_TIMING_HEADER:
+        response['Server-Timing'] = (
+            f'db;dur={db:.1f};desc="{timings.queries} queries", serialize;dur={serialize:.1f}, '
+            f'app;dur={max(total - db - serialize, 0):.1f}, total;dur={total:.1f}'
+        )
+    if logger.isEnabledFor(logging.INFO):
+        fields = {
+            'route': route,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total, 2),
+            'db_ms': round(db, 2),
+            'queries': timings.queries,
+            'serialize_ms': round(serialize, 2),
+        }
+        # key=value for the plain log files, the dict for the JSON formatters
+        logger.info(' '.join(f'{key}={value}' for key, value in fields.items()), extra={'timing': fields})
+
+
+class ServerTimingMiddleware:
+    """
+    Times a REQUEST_TIMING_SAMPLE_RATE fraction of the requests: database queries, rendering and total time.
+
+    Each sampled request gets an INFO log line, a sample in the route's histogram and, with REQUEST_TIMING_HEADER, a
+    Server-Timing header. The requests left out only pay for the random draw.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not sampled():
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        record(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        if not sampled():
+            return await self.get_response(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        record(request, response, timings)
+        return response
@@ -0,0 +1,111 @@
+from typing import Dict, Optional, Type
+
+from dj_ninja_auth.jwt import app_settings
+from dj_ninja_auth.jwt.exceptions import TokenError
+from dj_ninja_auth.jwt.schema import TokenPairInputSchema, TokenRefreshInputSchema, TokenRefreshOutputSchema
+from dj_ninja_auth.jwt.tokens import AccessToken, RefreshToken
+from dj_ninja_auth.jwt.utils import token_error
+from django.conf import settings
+from ninja import Schema
+from pydantic import model_validator
+
+from .models import User
+from .response_cache import get_cache, per_process_timeout
+
+# Claims minted in the tokens besides the user id, read by the permission classes in permissions.py
+CLAIM_FIELDS = ('is_staff', 'is_superuser', 'is_active', 'profile_version')
+
+
+def revocation_timeout() -> Optional[int]:
+    return per_process_timeout(settings.AUTH_REVOCATION_TIMEOUT)
+
+
+def profile_version_key(user_id) -> str:
+    return f'api-cache:profile-version:{user_id}'
+
+
+def set_current_profile_version(user_id: int, version: Optional[int]):
+    # None for deleted users
+    cache = get_cache()
+    if version is None:
+        cache.delete(profile_version_key(user_id))
+    else:
+        cache.set(profile_version_key(user_id), version, timeout=revocation_timeout())
+
+
+def get_current_profile_version(user_id: int) -> Optional[int]:
+    """User.profile_version of an active user, from the api cache, None when the user is gone or inactive."""
+    version = get_cache().get(profile_version_key(user_id))
+    if version is None:
+        version = User.objects.filter(pk=user_id, is_active=True).values_list('profile_version', flat=True).first()
+        if version is not None:
+            set_current_profile_version(user_id, version)
+    return version
+
+
+def add_claims(token, user: User):
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    return token
+
+
+class ClaimsAccessToken(AccessToken):
+    """
+    Access token carrying CLAIM_FIELDS.
+
+    Skips the is_active query of the base verify() when the claims are present, the authentication compares the
+    profile_version claim instead (see auth.py). Tokens minted before the claims existed keep the query.
+    """
+
+    @classmethod
+    def for_user(cls, user: User) -> 'ClaimsAccessToken':
+        return add_claims(super().for_user(user), user)
+
+    def verify(self):
+        if 'profile_version' not in self.payload:
+            return super().verify()
+        self.check_exp()
+        if app_settings.JTI_CLAIM not in self.payload:
+            raise TokenError('Token has no id')
+        self.verify_token_type()
+
+
+class ClaimsRefreshToken(RefreshToken):
+    access_token_class = ClaimsAccessToken
+
+    @classmethod
+    def for_user(cls, user: User) -> 'ClaimsRefreshToken':
+        # Copied to the access tokens made from it
+        return add_claims(super().for_user(user), user)
+
+
+class ClaimsTokenPairInputSchema(TokenPairInputSchema):
+    # AUTH_JWT_PAIR_SCHEMA, used by /auth/login
+    @classmethod
+    def get_token(cls, user: User) -> Dict:
+        refresh = ClaimsRefreshToken.for_user(user)
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
+
+
+class ClaimsTokenRefreshOutputSchema(TokenRefreshOutputSchema):
+    @model_validator(mode='after')
+    @token_error
+    def validate_schema(self):
+        refresh = RefreshToken(self.refresh)
+        user = User.objects.filter(pk=refresh[app_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise TokenError('User is inactive')
+        if refresh.get('profile_version', user.profile_version) != user.profile_version:
+            raise TokenError('Token has been revoked')
+        # The claims come from the user, the refresh tokens minted before them get claims too
+        access = ClaimsAccessToken.for_user(user)
+        access.set_exp(from_time=refresh.current_time)
+        self.access = str(access)
+        return self
+
+
+class ClaimsTokenRefreshInputSchema(TokenRefreshInputSchema):
+    # AUTH_JWT_REFRESH_SCHEMA, used by /auth/refresh
+    @classmethod
+    def get_response_schema(cls) -> Type[Schema]:
+        return ClaimsTokenRefreshOutputSchema
@@ -0,0 +1,9 @@
+from itertools import islice
+from typing import Iterable, Iterator
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    # itertools.batched from Python 3.12, with lists
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -1,3 +1,158 @@
-from django.shortcuts import render
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
 
-# Create your views here.
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from whitenoise.compress import Compressor
+
+from .avatars import AVATAR_FILE
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Sidecars written by compress_media, preferred in this order
+SIDECARS = (('br', '.br'), ('gzip', '.gz'))
+
+compressor = Compressor(quiet=True)
+
+
+def cache_control(path: str) -> str:
+    # Only the names avatars.py derives from the content, other files may be replaced under the same name
+    if AVATAR_FILE.match(path):
+        return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable'
+    return 'public, no-cache'
+
+
+def pick_sidecar(request, full_path: str, stat: os.stat_result) -> Tuple[str, Optional[str], os.stat_result]:
+    # The precompressed copy the client accepts, when it's as recent as the file
+    accepted = {value.split(';')[0].strip() for value in request.headers.get('Accept-Encoding', '').split(',')}
+    for encoding, suffix in SIDECARS:
+        if encoding in accepted:
+            try:
+                sidecar_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            if sidecar_stat.st_mtime >= stat.st_mtime:
+                return full_path + suffix, encoding, sidecar_stat
+    return full_path, None, stat
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    The (start, end) of a single `bytes=` range, inclusive, or None to send the whole file.
+
+    Multiple and invalid ranges, like bytes=5-3, are answered with the whole file, which the RFC allows. Raises
+    ValueError when unsatisfiable.
+    """
+    match = RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-500 is the last 500 bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        if end and int(end) < int(start):
+            return None
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def read_range(path: str, start: int, length: int):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(FileResponse.block_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path: str):
+    """
+    Serves a file of MEDIA_ROOT with validators, long lived caching for hashed names and range requests.
+
+    With MEDIA_SENDFILE_BACKEND the web server sends the file and the worker only answers the headers. Without it the
+    worker reads and sends every byte, which is for development and small deployments.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404()
+    if not os.path.isfile(full_path):
+        raise Http404()
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    file_path, encoding, file_stat = full_path, None, stat
+    compressible = not settings.MEDIA_SENDFILE_BACKEND and compressor.should_compress(full_path)
+    if compressible:
+        file_path, encoding, file_stat = pick_sidecar(request, full_path, stat)
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control(path),
+        'Accept-Ranges': 'none' if encoding else 'bytes',
+    }
+    if compressible:
+        headers['Vary'] = 'Accept-Encoding'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    if settings.MEDIA_SENDFILE_BACKEND == 'x-accel-redirect':
+        # nginx answers the ranges itself from the internal location
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+    elif settings.MEDIA_SENDFILE_BACKEND == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+    else:
+        response = file_response(request, file_path, file_stat.st_size, content_type, etag, stat.st_mtime,
+                                 ranges=not encoding)
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def file_response(request, path: str, size: int, content_type: str, etag: str, mtime: float, ranges: bool):
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if ranges and range_header and (not if_range or if_range in (etag, http_date(mtime))):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(read_range(path, start, end - start + 1), status=206,
+                                             content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+            return response
+
+    # Read in chunks by the worker: the ASGI servers (uvicorn, as in render.yaml) have no wsgi.file_wrapper, so no
+    # sendfile either. MEDIA_SENDFILE_BACKEND hands the file to the web server instead
+    response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Content-Length'] = size
+    return response